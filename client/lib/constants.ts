@@ -20,6 +20,10 @@ export const BOOKS_TABLE_NAME = IS_PROD ? "books" : "books_dev";
 export const FEED_TABLE_NAME = IS_PROD ? "feed" : "feed_dev";
 export const CHALLENGES_TABLE_NAME = IS_PROD ? "reading_challenges" : "reading_challenges_dev";
 export const METADATA_TABLE_NAME = IS_PROD ? 'metadata' : 'metadata_dev';
+export const DASHBOARD_TABLE_NAME = IS_PROD ? 'dashboard_aggregates' : 'dashboard_aggregates_dev';
+
+// Must match AGGREGATES_VERSION in src/dashboard.py, other versions are ignored
+export const DASHBOARD_AGGREGATES_VERSION = 1;
 
 export const ACTION_WANTS_TO_READ = "wants_to_read";
 export const ACTION_STARTED_READING = "started_reading";
@@ -1,9 +1,20 @@
 import { BOOKS_TABLE_NAME } from '../constants';
 import { supabase } from '../supabase';
-import { DashboardData, Book, LibrarySummary } from '@/types';
+import { getDashboardAggregates } from './dashboardQueries';
+import { DashboardData, Book, BookAggregates, LibrarySummary } from '@/types';
+
+// Months shown on the reading and pages charts, the most recent ones
+const MONTHLY_READING_MONTHS = 8;
+const MONTHLY_PAGES_MONTHS = 6;
 
 export async function getDashboardData(userId?: string): Promise<DashboardData> {
-  // Fetch all books from Supabase
+  // Use what the scraper precomputed if there is anything
+  const aggregates = await getDashboardAggregates(userId);
+  if (aggregates) {
+    return fromAggregates(aggregates.books);
+  }
+
+  // Otherwise fetch all books from Supabase
   let query = supabase.from(BOOKS_TABLE_NAME).select('*');
 
   if (userId) {
@@ -67,6 +78,19 @@ export async function getDashboardData(userId?: string): Promise<DashboardData>
   };
 }
 
+function fromAggregates(books: BookAggregates): DashboardData {
+  const shelves = books.shelfCounts;
+  return {
+    monthlyReading: formatMonthlyReading(books.monthlyReading),
+    monthlyPages: formatMonthlyPages(books.monthlyPages),
+    readingTimeData: books.readingTimeData,
+    shelfComposition: buildShelfComposition(shelves.read, shelves.to_read, shelves.currently_reading, shelves.other),
+    topAuthors: books.topAuthors,
+    ratingHeatmap: books.ratingHeatmap,
+    summary: books.summary
+  };
+}
+
 // Helper functions with actual implementation logic
 function calculateMonthlyReading(books: Book[]) {
   // Map to store counts: key "YYYY-MM", value: count
@@ -85,9 +109,14 @@ function calculateMonthlyReading(books: Book[]) {
     }
   }
 
-  const sortedData = Array.from(monthMap.entries()).slice(0, 8).sort((a, b) =>
+  return formatMonthlyReading(Array.from(monthMap.entries()));
+}
+
+// Chart points for the most recent months of ["YYYY-MM", count] entries
+function formatMonthlyReading(entries: [string, number][]) {
+  const sortedData = [...entries].sort((a, b) =>
     a[0].localeCompare(b[0])
-  );
+  ).slice(-MONTHLY_READING_MONTHS);
 
   return sortedData.map(([key, count]) => {
     const date = new Date(`${key}-01T12:00:00Z`);
@@ -121,10 +150,15 @@ function calculateMonthlyPages(books: Book[]) {
     }
   }
 
-  // Get entries, sort by key (YYYY-MM)
-  const sortedData = Array.from(pageMap.entries()).slice(0, 6).sort((a, b) =>
+  return formatMonthlyPages(Array.from(pageMap.entries()));
+}
+
+// Line series for the most recent months of ["YYYY-MM", pages] entries
+function formatMonthlyPages(entries: [string, number][]) {
+  // Sort by key (YYYY-MM)
+  const sortedData = [...entries].sort((a, b) =>
     a[0].localeCompare(b[0])
-  );
+  ).slice(-MONTHLY_PAGES_MONTHS);
 
   const lineData = sortedData.map(([key, pages]) => {
     const date = new Date(`${key}-01T12:00:00Z`);
@@ -195,7 +229,6 @@ function calculateShelfComposition(books: Book[]) {
   shelfMap.set('to-read', 0);
   shelfMap.set('currently-reading', 0);
   let other = 0;
-  const otherName = 'Other'; // In case you want to group multiple other shelves
 
   for (const book of books) {
     if (book.shelf === 'read') {
@@ -209,10 +242,18 @@ function calculateShelfComposition(books: Book[]) {
     }
   }
 
+  return buildShelfComposition(
+    shelfMap.get('read')!, shelfMap.get('to-read')!, shelfMap.get('currently-reading')!, other
+  );
+}
+
+function buildShelfComposition(read: number, toRead: number, currentlyReading: number, other: number) {
+  const otherName = 'Other'; // In case you want to group multiple other shelves
+
   const childrenData = [
-    { name: 'Read', loc: shelfMap.get('read')! },
-    { name: 'To Be Read', loc: shelfMap.get('to-read')! },
-    { name: 'Currently Reading', loc: shelfMap.get('currently-reading')! },
+    { name: 'Read', loc: read },
+    { name: 'To Be Read', loc: toRead },
+    { name: 'Currently Reading', loc: currentlyReading },
   ];
 
   if (other > 0) {
@@ -0,0 +1,31 @@
+import { cache } from "react";
+import { DashboardAggregates } from "@/types";
+import { DASHBOARD_AGGREGATES_VERSION, DASHBOARD_TABLE_NAME } from "../constants";
+import { supabase } from "../supabase";
+
+/**
+ * The aggregates the scraper precomputed for the dashboard, or null if there
+ * are none in a version this build understands. Without a userId the most
+ * recently updated row is used. Cached per request, both the books and the
+ * feed queries read it.
+ */
+export const getDashboardAggregates = cache(async (userId?: string): Promise<DashboardAggregates | null> => {
+    let query = supabase.from(DASHBOARD_TABLE_NAME).select('version, data');
+
+    if (userId) {
+        query = query.eq('user_id', userId);
+    }
+
+    const { data, error } = await query.order('updated_at', { ascending: false }).limit(1);
+
+    if (error) {
+        console.warn('Error fetching dashboard aggregates, computing them from the tables:', error);
+        return null;
+    }
+
+    const row = data?.[0];
+    if (!row || row.version !== DASHBOARD_AGGREGATES_VERSION) {
+        return null;
+    }
+    return row.data as DashboardAggregates;
+});
@@ -1,8 +1,15 @@
-import { ActionBreakdown, ActivityStream, CalendarDay, Feed, FeedData } from "@/types";
+import { ActionBreakdown, ActivityStream, CalendarDay, Feed, FeedAggregates, FeedData } from "@/types";
 import { supabase } from "../supabase";
 import { ALL_POSSIBLE_ACTIONS, FEED_TABLE_NAME } from "../constants";
+import { getDashboardAggregates } from "./dashboardQueries";
 
 export async function getFeedData(userId?: string): Promise<FeedData> {
+    // Use what the scraper precomputed if there is anything
+    const aggregates = await getDashboardAggregates(userId);
+    if (aggregates?.feed) {
+        return fromAggregates(aggregates.feed);
+    }
+
     const { data: feed, error } = await supabase
         .from(FEED_TABLE_NAME)
         .select('action, book_title, timestamp')
@@ -59,6 +66,30 @@ export async function getFeedData(userId?: string): Promise<FeedData> {
     };
 }
 
+function fromAggregates(feed: FeedAggregates): FeedData {
+    const allActionsForCharts = Array.from(new Set([
+        ...ALL_POSSIBLE_ACTIONS,
+        ...feed.actionBreakdown.map((row) => row.action),
+    ]));
+
+    // Every charted action gets a value in every month, 0 if there was none
+    const networkActivity = feed.networkActivity.map(({ month, counts }) => {
+        const streamItem: ActivityStream = { month };
+        for (const action of allActionsForCharts) {
+            streamItem[action] = counts[action] || 0;
+        }
+        return streamItem;
+    });
+
+    return {
+        actionBreakdown: feed.actionBreakdown,
+        calendarData: feed.calendarData,
+        networkActivity,
+        top10BookTitles: feed.top10BookTitles,
+        feedMessageList: feed.feedMessageList
+    };
+}
+
 /**
  * Helper to get the top 10 most frequent book titles
  */
@@ -120,4 +120,29 @@ export interface LibrarySummary {
   tbrCount: number;
   currentlyReading: Book | null;
   lastRead: Book | null;
-}
\ No newline at end of file
+}
+
+// Precomputed by the scraper, see src/dashboard.py
+export interface BookAggregates {
+  monthlyReading: [string, number][]; // ["YYYY-MM", books], oldest first
+  monthlyPages: [string, number][]; // ["YYYY-MM", pages], oldest first
+  readingTimeData: ReadingTime[];
+  shelfCounts: { read: number; to_read: number; currently_reading: number; other: number; };
+  topAuthors: AuthorCount[];
+  ratingHeatmap: RatingCell[];
+  summary: LibrarySummary;
+}
+
+export interface FeedAggregates {
+  actionBreakdown: ActionBreakdown[];
+  calendarData: CalendarDay[];
+  networkActivity: { month: string; counts: { [action: string]: number }; }[];
+  top10BookTitles: string[];
+  feedMessageList: Feed[];
+}
+
+export interface DashboardAggregates {
+  version: number;
+  books: BookAggregates;
+  feed?: FeedAggregates;
+}
@@ -0,0 +1,225 @@
+"""
+Generates the anonymized Goodreads fixtures in this directory: shelf list
+pages, the rendered home feed, the profile page and the reading challenge
+API response.
+
+The markup mirrors what Goodreads serves for a logged-in user, with every
+title, author, review and id replaced by deterministic fake values. Run
+`python fixtures/generate.py` to rebuild the fixtures after changing it.
+"""
+import json
+import os
+import random
+
+FIXTURES_DIR = os.path.dirname(os.path.abspath(__file__))
+USER_ID = '1000001'
+
+MONTHS = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
+FULL_MONTHS = ['January', 'February', 'March', 'April', 'May', 'June', 'July',
+               'August', 'September', 'October', 'November', 'December']
+
+# Shelf name -> number of pages at 100 rows per page
+SHELF_PAGES = {'read': 2, 'currently-reading': 1, 'to-read': 2}
+# Keeps fake ids unique across shelves
+SHELF_ID_OFFSETS = {'read': 0, 'currently-reading': 200000, 'to-read': 400000}
+# Items on the rendered home feed, as many as a scroll back to the high-water mark loads
+FEED_ITEMS = 200
+FEED_ACTIONS = ['wants to read', 'is currently reading', 'started reading', 'finished reading', 'has read',
+                'rated', 'reviewed', 'added', 'made progress on', 'liked a quote']
+
+def fake_date(rng: random.Random) -> str:
+    """A date in one of the formats Goodreads uses across shelf columns."""
+    year = rng.randint(2012, 2025)
+    month = rng.randint(0, 11)
+    day = rng.randint(1, 28)
+    return rng.choice([
+        f"{MONTHS[month]} {day:02d}, {year}",
+        f"{MONTHS[month]} {day:02d}, {year}",
+        f"{FULL_MONTHS[month]} {day}, {year}",
+        f"{MONTHS[month]} {year}",
+        f"{FULL_MONTHS[month]} {year}",
+        f"{year}",
+        f"{day}, {year}",
+        f"Mon, {MONTHS[month]} {day:02d}, {year} 10:15AM",
+        "not set",
+        "unknown",
+    ])
+
+def shelf_row(rng: random.Random, number: int, shelf: str) -> str:
+    review_id = 5000000 + number
+    book_id = 9000000 + number
+    title = rng.choice([f"Fake Title {number}", f"Fake &amp; Title {number}", f"Fake Title {number} "
+                        f'<span class="darkGreyText">(Series, #{number % 7 + 1})</span>'])
+    pages = rng.choice(['', '87', '320', '1,024'])
+    isbn = rng.choice([f"978{rng.randint(10 ** 9, 10 ** 10 - 1)}", '—', ''])
+    review = ''
+    if rng.random() < 0.3:
+        review = (f'<span id="freeText{review_id}" style="display:none">Fake review {number}. '
+                  + 'lorem ipsum ' * rng.randint(1, 80) + '</span>')
+
+    date_read = rng.choice([
+        f'<span class="date_read_value">{fake_date(rng)}</span>',
+        f'<span title="{fake_date(rng)}">{fake_date(rng)}</span>',
+        'not set',
+    ])
+    date_added = rng.choice([
+        f'<span title="{fake_date(rng)}">{fake_date(rng)}</span>',
+        f'<span class="date_added_value">{fake_date(rng)}</span>',
+        f'\n  {fake_date(rng)}\n',
+    ])
+
+    cells = [
+        '<td class="field checkbox"><label>checkbox</label><div class="value"><input type="checkbox"></div></td>',
+        f'<td class="field position"><label>position</label><div class="value">{number}</div></td>',
+        f'<td class="field cover"><label>cover</label><div class="value"><div class="js-tooltipTrigger tooltipTrigger">'
+        f'<a href="/book/show/{book_id}"><img alt="Fake cover" src="https://i.example.com/{book_id}.jpg"></a></div></div></td>',
+        f'<td class="field title"><label>title</label><div class="value">\n<a title="Fake Title {number}" '
+        f'href="/book/show/{book_id}-fake-title-{number}">\n      {title}\n</a></div></td>',
+        f'<td class="field author"><label>author</label><div class="value">\n<a href="/author/show/{number % 97}.Fake_Author">'
+        f'Author{number % 97}, Fake</a>\n<!-- secondary authors omitted -->\n</div></td>',
+        f'<td class="field isbn" style="display: none"><label>isbn</label><div class="value">\n  {isbn[3:]}\n</div></td>',
+        f'<td class="field isbn13" style="display: none"><label>isbn13</label><div class="value">\n  {isbn}\n</div></td>',
+        '<td class="field num_pages"><label>num pages</label><div class="value">'
+        + (f'<nobr>\n  {pages}\n  <span class="greyText">pp</span>\n</nobr>' if pages else '<span class="greyText">unknown</span>')
+        + '</div></td>',
+        f'<td class="field avg_rating"><label>avg rating</label><div class="value">\n  '
+        f'{rng.choice(["3.95", "4.21", "2.5", "0.00", "n/a"])}\n</div></td>',
+        f'<td class="field num_ratings" style="display: none"><label>num ratings</label><div class="value">\n  '
+        f'{rng.randint(0, 99999):,}\n</div></td>',
+        f'<td class="field date_pub"><label>date pub</label><div class="value">\n  {fake_date(rng)}\n</div></td>',
+        f'<td class="field rating"><label>Reader&#39;s rating</label><div class="value">'
+        f'<div class="stars" data-rating="{rng.randint(0, 5)}" data-resource-id="{book_id}" data-user-id="0">'
+        '<a class="star off" href="#" title="did not like it">1 of 5 stars</a></div></div></td>',
+        f'<td class="field review"><label>review</label><div class="value">'
+        f'<span id="freeTextContainer{review_id}">Fake review teaser</span>{review}</div></td>',
+        f'<td class="field date_started"><label>date started</label><div class="value"><div class="date_row">'
+        f'<span class="date_started_value">{fake_date(rng)}</span></div></div></td>',
+        f'<td class="field date_read"><label>date read</label><div class="value"><div class="date_row">{date_read}</div></div></td>',
+        f'<td class="field date_added"><label>date added</label><div class="value">{date_added}</div></td>',
+        '<td class="field actions"><label>actions</label><div class="value"><a class="actionLinkLite" href="#">edit</a></div></td>',
+    ]
+    return (f'<tr id="review_{review_id}" class="bookalike review">\n'
+            + '\n'.join(cells) + '\n</tr>\n')
+
+def shelf_page(shelf: str, page: int, last_page: int, rows_per_page: int = 100) -> str:
+    rng = random.Random(f"{shelf}-{page}")
+    row_count = rows_per_page if page < last_page else rows_per_page // 2 + 7
+    rows = ''.join(shelf_row(rng, SHELF_ID_OFFSETS[shelf] + page * 1000 + i, shelf) for i in range(row_count))
+
+    pagination = ''
+    if last_page > 1:
+        links = ' '.join(
+            f'<em class="current">{p}</em>' if p == page else
+            f'<a href="/review/list/{USER_ID}?page={p}&amp;shelf={shelf}">{p}</a>'
+            for p in range(1, last_page + 1)
+        )
+        if page < last_page:
+            next_link = f'<a class="next_page" rel="next" href="/review/list/{USER_ID}?page={page + 1}&amp;shelf={shelf}">next »</a>'
+        else:
+            next_link = '<span class="next_page disabled">next »</span>'
+        pagination = f'<div id="reviewPagination">{links} {next_link}</div>'
+
+    nav = ''.join(f'<li><a href="/genres/fake-{i}">Genre {i}</a></li>' for i in range(150))
+    sidebar = ''.join(f'<div class="userShelf"><a href="/review/list/{USER_ID}?shelf=fake-{i}">fake-{i} ({i})</a></div>'
+                      for i in range(60))
+    return (
+        '<!DOCTYPE html>\n<html><head><meta charset="utf-8"><title>Fake Reader’s books on Goodreads</title>\n'
+        '<script type="text/javascript">var rows = "<tr class=\\"bookalike review\\"></tr>";</script>\n'
+        '<link rel="stylesheet" href="https://s.example.com/assets/site.css"></head>\n<body>\n'
+        f'<div class="siteHeader"><ul class="siteHeader__menuList">{nav}</ul></div>\n'
+        '<div class="mainContentContainer"><div id="leftCol">\n'
+        f'<div id="shelvesSection">{sidebar}</div></div>\n<div id="rightCol">\n'
+        '<table id="books" class="table stacked" border="0"><thead><tr id="booksHeader" class="tableList">'
+        '<th class="header field title">title</th><th class="header field author">author</th></tr></thead>\n'
+        f'<tbody id="booksBody">\n{rows}</tbody></table>\n{pagination}\n</div></div>\n'
+        '<div class="siteFooter">' + '<p>footer</p>' * 100 + '</div>\n'
+        '<script>window.fakeTracking = {};</script>\n</body></html>\n'
+    )
+
+def feed_item(rng: random.Random, number: int) -> str:
+    """One item of the rendered home feed, in any of the shapes the feed parsers handle."""
+    action = rng.choice(FEED_ACTIONS)
+    # The profile link sometimes holds the action instead of the name
+    user_text = rng.choice([f"Fake Reader {number % 40}", action])
+    user_url = rng.choice([f"/user/show/{number % 40}-fake-reader", f"/user/show/{number % 40}"])
+    day = 28 - number * 27 // FEED_ITEMS
+    timestamp = rng.choice([
+        f'<small class="gr-newsfeedItem__headerTimestamp"><time datetime="2025-03-{day:02d}T{number % 24:02d}:15:00Z">'
+        f' {number % 6 + 1} days ago </time></small>',
+        f'<small class="gr-newsfeedItem__headerTimestamp" datetime="2025-03-{day:02d}T08:00:00Z"> Mar {day} </small>',
+        '<small class="gr-newsfeedItem__headerTimestamp"> <span>5</span> <span>hours ago</span></small>',
+    ])
+    parts = [
+        '<div class="gr-newsfeedItem gr-mediaFlexbox">',
+        f'<a class="gr-user__profileLink" href="{user_url}">\n {user_text} </a>',
+        f'<div class="gr-newsfeedItem__header"><span><a href="{user_url}">Fake Reader {number % 40}</a>\n {action} '
+        f'<!-- action --> <a href="/book/show/{9000000 + number % 60}">a book</a></span>{timestamp}</div>',
+    ]
+    if rng.random() < 0.5:
+        parts.append(f'<div class="communityRating__stars" style="width: {rng.randint(0, 100)}%"></div>')
+    parts.append(f'<a class="gr-book__titleLink" href="/book/show/{9000000 + number % 60}"> Fake Title {number % 60} </a>')
+    parts.append(f'<a class="gr-book__authorLink" href="/author/show/{number % 97}.Fake_Author">Fake Author{number % 97}</a>')
+    if rng.random() < 0.7:
+        parts.append(f'<div class="gr-book__description"><span>Fake description {number}. '
+                     + 'lorem ipsum ' * rng.randint(5, 60) + '</span> <a>Continue reading</a></div>')
+    parts.append('</div>')
+    return ''.join(parts)
+
+def feed_page(item_count: int = FEED_ITEMS) -> str:
+    rng = random.Random('feed')
+    items = '\n'.join(feed_item(rng, i) for i in range(item_count))
+    return (
+        '<!DOCTYPE html>\n<html><head><meta charset="utf-8"><title>Recent updates | Goodreads</title></head>\n<body>\n'
+        '<div class="siteHeader">' + '<a href="/genres/fake">Genre</a>' * 150 + '</div>\n'
+        f'<div class="gr-newsfeed">\n{items}\n</div>\n'
+        '<div class="siteFooter">' + '<p>footer</p>' * 100 + '</div>\n</body></html>\n'
+    )
+
+def profile_page() -> str:
+    shelves = ''.join(
+        f'<a class="actionLinkLite userShowPageShelfListItem" href="/review/list/{USER_ID}?shelf={shelf}">{shelf} ({count})</a>\n'
+        for shelf, count in [('read', 157), ('currently-reading', 57), ('to-read', 157), ('fake-favorites', 12)]
+    )
+    return (
+        '<!DOCTYPE html>\n<html><head><meta charset="utf-8"><title>Fake Reader | Goodreads</title></head>\n<body>\n'
+        '<div class="siteHeader">' + '<a href="/genres/fake">Genre</a>' * 150 + '</div>\n'
+        '<div class="mainContentContainer"><div class="leftContainer">\n'
+        '<h1 class="userProfileName">\n  Fake Reader\n</h1>\n'
+        '<div class="profilePageUserStatsInfo"><a href="#">1,024 ratings</a> <a href="#">371 books</a>'
+        ' <a href="#">42 friends</a> <a href="#">7 following</a> <a href="#">13 followers</a></div>\n'
+        f'<a href="/user/edit">Edit profile</a>\n'
+        '<div class="infoBoxRowTitle">Activity</div><div class="infoBoxRowItem">\n  Joined in March 2015, '
+        'last active this month\n</div>\n<div class="infoBoxRowItem">member since January 2015</div>\n'
+        '<div class="challengePic"><a href="/challenges/11634">2025 Reading Challenge</a>'
+        '<div>Fake Reader has read 12 of 50 books.</div></div>\n'
+        f'<div id="shelvesSection">\n{shelves}</div>\n'
+        + '<div class="updateText">Fake update</div>\n' * 80 +
+        '</div></div>\n<div class="siteFooter">' + '<p>footer</p>' * 100 + '</div>\n</body></html>\n'
+    )
+
+def challenge_data() -> dict:
+    """The reading challenge API response. booksRead is a Python-literal list in a string."""
+    rng = random.Random('challenge')
+    return {
+        'readingGoal': 50,
+        'booksRead': repr([9000000 + rng.randint(0, 199) for _ in range(31)]),
+        'readingProgress': 62,
+    }
+
+def write(relative_path: str, content: str):
+    path = os.path.join(FIXTURES_DIR, relative_path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(content)
+    print(f"Wrote {relative_path}")
+
+def main():
+    for shelf, last_page in SHELF_PAGES.items():
+        for page in range(1, last_page + 1):
+            write(os.path.join('shelves', f'{shelf}_page{page}.html'), shelf_page(shelf, page, last_page))
+    write(os.path.join('feed', 'home.html'), feed_page())
+    write(os.path.join('profile', 'user_show.html'), profile_page())
+    write(os.path.join('challenge', 'goals_data.json'), json.dumps(challenge_data(), indent=2) + '\n')
+
+if __name__ == '__main__':
+    main()
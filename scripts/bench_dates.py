@@ -0,0 +1,146 @@
+"""
+Differential check and benchmark for the date normalization.
+
+Compares dates.normalize_date, and the memoized DateNormalizer in front of
+it, with the Katalog._parse_date it replaced, kept below as the reference.
+The corpus is every date string on the shelf pages in fixtures/shelves,
+a generated set covering each shape the reference handles (month names
+and abbreviations in any case, impossible days, weekday prefixes, times,
+partial dates, unknown and unset dates, stray whitespace, non-ASCII
+digits) and random mutations of both. Exits with 1 on any mismatch,
+then times the reference against both over the fixture dates.
+
+    python scripts/bench_dates.py [--random N] [--repeat N]
+"""
+import argparse
+import glob
+import os
+import random
+import re
+import sys
+import time
+from datetime import datetime
+from typing import Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'src'))
+
+from dates import DateNormalizer, normalize_date
+from parsers import PARSERS
+
+def reference_parse_date(date_str: str) -> Optional[str]:
+    """Katalog._parse_date before dates.py, unchanged."""
+    if not date_str: return None
+    date_str = date_str.strip()
+    if 'unknown' in date_str.lower() or 'not set' in date_str.lower(): return None
+    date_str = re.sub(r'^\w+,\s*', '', date_str).strip()
+    date_str = re.sub(r'\s+\d+:\d+(AM|PM)?$', '', date_str).strip()
+    try:
+        if re.match(r'^\d{1,2},\s*\d{4}$', date_str):
+            year = date_str.split(',')[-1].strip()
+            return year if len(year) == 4 and year.isdigit() else None
+        if re.match(r'^[A-Za-z]{3,}\s+\d{1,2},\s+\d{4}$', date_str):
+            try: date_obj = datetime.strptime(date_str, "%b %d, %Y")
+            except ValueError: date_obj = datetime.strptime(date_str, "%B %d, %Y")
+            return date_obj.strftime("%Y-%m-%d")
+        if re.match(r'^[A-Za-z]{3,}\s+\d{4}$', date_str):
+            try: date_obj = datetime.strptime(date_str, "%b %Y")
+            except ValueError: date_obj = datetime.strptime(date_str, "%B %Y")
+            return date_obj.strftime("%Y-%m")
+        if len(date_str) == 4 and date_str.isdigit():
+            return date_str
+        return date_str
+    except Exception:
+        return date_str
+
+def fixture_dates():
+    """Every raw date the shelf parser reads from fixtures/shelves."""
+    values = []
+    def record(batch):
+        values.extend(batch)
+        return batch
+    parser = PARSERS['bs4']('https://www.goodreads.com', record)
+    for path in sorted(glob.glob(os.path.join(ROOT, 'fixtures', 'shelves', '*.html'))):
+        with open(path, 'rb') as f:
+            parser.parse(f.read(), os.path.basename(path).split('_page')[0])
+    return values
+
+MONTHS = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec',
+          'January', 'February', 'March', 'April', 'June', 'July', 'August', 'September',
+          'October', 'November', 'December', 'Sept', 'Febr', 'Foo']
+
+def generated_dates():
+    values = [None, '', ' ', 'unknown', 'Unknown', 'not set', 'Not Set', 'date unknown', '2020',
+              '20', '20200', '2020-01', '2020-01-02', '0000', '9999', '12, 2020', '1,2020', 'Mon, 12, 2020',
+              '٢٠٢٠', 'Dec ٥, ٢٠٢٠', 'Dec ١٢, 2020', 'Dec 2020\n', '\tDec 5, 2020 ', 'Dec 5 2020', 'Dec, 2020',
+              'Dec 5,2020', 'Dec  5,   2020', 'Dec 5, 20', 'Dec 5, 02020', 'Dec 05, 2020', 'Dec 0, 2020',
+              'Dec 00, 2020', 'Dec 32, 2020', 'Feb 29, 2020', 'Feb 29, 2021', 'Feb 30, 2020', 'Dec 5, 0999',
+              'Dec 0999', 'Dec 0000', 'Dec 5, 0000', 'é 2020', 'Déc 2020', 'Dec 5, 2020 10:30', 'Dec 5, 2020 10:30AM',
+              'Dec 5, 2020 10:30PM', 'Dec 5, 2020  7:05 pm', 'Sat, Dec 5, 2020', 'Saturday, Dec 5, 2020 10:30PM',
+              'Sat,Dec 5, 2020', 'Dec 5, 2020,', 'read: Dec 2020', 'Added Dec 5, 2020']
+    for month in MONTHS:
+        for name in (month, month.lower(), month.upper()):
+            values += [f'{name} {day}, 2019' for day in (1, 9, 10, 28, 29, 30, 31)]
+            values += [f'{name} 2019', f'{name} 1', f'{name}  2019']
+    return values
+
+def mutated(value: str, rng: random.Random) -> str:
+    """`value` with a few random edits from characters dates are made of."""
+    alphabet = ' ,:0123456789APMadn\t' + 'JFMASOND'
+    chars = list(value)
+    for _ in range(rng.randint(1, 3)):
+        position = rng.randint(0, len(chars))
+        edit = rng.random()
+        if edit < 0.4:
+            chars.insert(position, rng.choice(alphabet))
+        elif edit < 0.7 and chars:
+            del chars[min(position, len(chars) - 1)]
+        elif chars:
+            chars[min(position, len(chars) - 1)] = rng.choice(alphabet)
+    return ''.join(chars)
+
+def timed(func, values, repeat: int) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        started_at = time.perf_counter()
+        func(values)
+        best = min(best, time.perf_counter() - started_at)
+    return best
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--random', type=int, default=20000, help="random mutations to check")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=5, help="timing repetitions, the best one is reported")
+    args = parser.parse_args(argv)
+
+    fixtures = fixture_dates()
+    corpus = fixtures + generated_dates()
+    rng = random.Random(args.seed)
+    seeds = [value for value in corpus if value]
+    corpus += [mutated(rng.choice(seeds), rng) for _ in range(args.random)]
+
+    normalizer = DateNormalizer(max_entries=256)
+    mismatches = 0
+    # Twice through the memo, so cached answers are checked too
+    for value in corpus + corpus:
+        expected = reference_parse_date(value)
+        for name, actual in (('normalize_date', normalize_date(value)), ('DateNormalizer', normalizer(value))):
+            if actual != expected:
+                mismatches += 1
+                if mismatches <= 20:
+                    print(f"MISMATCH {name}({value!r}): {actual!r}, reference {expected!r}")
+    batch = normalizer.normalize_many(corpus)
+    mismatches += sum(actual != reference_parse_date(value) for value, actual in zip(corpus, batch))
+    print(f"{len(set(corpus))} distinct dates: {'all match' if not mismatches else f'{mismatches} MISMATCHES'}")
+
+    reference_time = timed(lambda values: [reference_parse_date(value) for value in values], fixtures, args.repeat)
+    engine_time = timed(lambda values: [normalize_date(value) for value in values], fixtures, args.repeat)
+    memo_time = timed(DateNormalizer().normalize_many, fixtures, args.repeat)
+    print(f"{len(fixtures)} fixture dates ({len(set(fixtures))} distinct): reference {reference_time * 1000:.2f} ms, "
+          f"normalize_date {engine_time * 1000:.2f} ms ({reference_time / engine_time:.1f}x), "
+          f"DateNormalizer.normalize_many {memo_time * 1000:.2f} ms ({reference_time / memo_time:.1f}x)")
+    return 1 if mismatches else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,95 @@
+"""
+Peak memory of parsing one shelf page, per shelf parser.
+
+Each page of fixtures/shelves is parsed in a fresh interpreter per parser,
+so every measurement starts from the same baseline, and the growth of the
+process's peak RSS over the parse is reported. Unlike tracemalloc, RSS
+includes lxml's own C buffers. Streaming parsers read the page from disk
+in chunks, the way the scraper reads a response, the others get the
+whole body, as from `response.content`. `--pad KIB` appends navigation
+and script markup to every page first, to stand in for the heavier
+pages Goodreads serves. RSS moves in allocator-sized steps, so small
+differences between runs are noise.
+
+    python scripts/bench_shelf_memory.py [--pad KIB] [--chunk BYTES]
+"""
+import argparse
+import glob
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'src'))
+
+# Run in the child interpreter: prints the peak RSS growth in KiB and the row count
+CHILD = """
+import json, resource, sys
+sys.path.insert(0, {src!r})
+from dates import DateNormalizer
+from parsers import get_shelf_parser
+parser = get_shelf_parser({parser!r}, 'https://www.goodreads.com', DateNormalizer().normalize_many)
+parser.parse(b'<html><body><table id="books"></table></body></html>', 'read') # warm-up
+def chunks():
+    with open({path!r}, 'rb') as f:
+        while True:
+            chunk = f.read({chunk})
+            if not chunk:
+                return
+            yield chunk
+before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+if parser.streaming:
+    result = parser.parse_stream(chunks(), {shelf!r})
+else:
+    with open({path!r}, 'rb') as f:
+        result = parser.parse(f.read(), {shelf!r})
+after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(json.dumps({{'growth_kib': after - before, 'rows': len(result['books'])}}))
+"""
+
+PADDING = (
+    '<div class="siteHeader"><nav><ul>' + '<li><a href="/genres/fiction">Fiction</a></li>' * 20 + '</ul></nav></div>'
+    '<div class="sidebar"><div class="bigBoxBody">' + '<p class="review">A friend rated a book <a href="/book/show/1">Title</a></p>' * 20 + '</div></div>'
+    '<script type="text/javascript">var data = ' + json.dumps(['x' * 40] * 40) + ';</script>'
+)
+
+def measure(parser: str, path: str, shelf: str, chunk: int) -> dict:
+    code = CHILD.format(src=os.path.join(ROOT, 'src'), parser=parser, path=path, shelf=shelf, chunk=chunk)
+    output = subprocess.run([sys.executable, '-c', code], check=True, capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def main(argv=None) -> int:
+    from parsers import PARSERS, lxml_html
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pad', type=int, default=0, help="KiB of extra page markup to append to every page")
+    parser.add_argument('--chunk', type=int, default=64 * 1024, help="bytes per read for streaming parsers")
+    args = parser.parse_args(argv)
+
+    names = [name for name in PARSERS if lxml_html is not None or not name.startswith('lxml')]
+    with tempfile.TemporaryDirectory() as tmp:
+        pages = []
+        for path in sorted(glob.glob(os.path.join(ROOT, 'fixtures', 'shelves', '*.html'))):
+            with open(path, 'rb') as f:
+                content = f.read()
+            if args.pad:
+                padding = (PADDING * (args.pad * 1024 // len(PADDING) + 1)).encode('utf-8')
+                content = content.replace(b'</body>', padding + b'</body>', 1)
+                path = os.path.join(tmp, os.path.basename(path))
+                with open(path, 'wb') as f:
+                    f.write(content)
+            pages.append((path, os.path.basename(path).split('_page')[0], len(content)))
+
+        print(f"{'page':36} {'KiB':>7} " + ' '.join(f"{name:>12}" for name in names) + "   (peak RSS growth, KiB)")
+        for path, shelf, size in pages:
+            results = {name: measure(name, path, shelf, args.chunk) for name in names}
+            rows = {result['rows'] for result in results.values()}
+            print(f"{os.path.basename(path):36} {size / 1024:>7,.0f} "
+                  + ' '.join(f"{results[name]['growth_kib']:>12,}" for name in names)
+                  + ('' if len(rows) == 1 else f"   ROW COUNTS DIFFER {rows}"))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
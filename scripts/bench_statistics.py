@@ -0,0 +1,164 @@
+"""
+Benchmark and differential check for the reading statistics.
+
+Compares reading_stats.StatisticsAggregator with the pandas implementation
+it replaced, kept below as the reference. The books from fixtures/shelves
+are checked as-is, then a randomized library with messy dates (mixed date
+shapes, invalid days, negative reading times, missing values) is checked
+over several seeds, and finally both are timed on a library of
+--books books, along with the import cost of each. Exits with 1 on any
+mismatch. Needs pandas.
+
+    python scripts/bench_statistics.py [--books N] [--seeds N] [--repeat N]
+"""
+import argparse
+import glob
+import os
+import random
+import subprocess
+import sys
+import time
+import warnings
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'src'))
+
+import pandas as pd
+
+from katalog import Katalog
+from reading_stats import calculate_statistics
+from schemas import Book
+
+# pandas warns every time a messy date column falls back to per-value parsing
+warnings.filterwarnings('ignore', message='Could not infer format')
+
+def pandas_statistics(books):
+    """The pandas implementation of Katalog.calculate_statistics, unchanged."""
+    stats = {
+        'books_per_month': {}, 'books_per_year': {}, 'books_read_per_month': {},
+        'books_read_per_year': {}, 'overall_stats': {}, 'status_change_frequency': {},
+        'shelf_additions_per_month': {}, 'shelf_additions_per_year': {}, 'reading_pace': {}
+    }
+    if not books: return stats
+    df = pd.DataFrame([book.model_dump() for book in books])
+    date_columns = ['date_added', 'date_read', 'date_started']
+    for col in date_columns:
+        if col in df.columns:
+            df[col] = pd.to_datetime(df[col], errors='coerce')
+    read_valid = df[(df['shelf'] == 'read') & (df['date_read'].notna())]
+    if not read_valid.empty:
+        monthly_read = read_valid.groupby(read_valid['date_read'].dt.to_period('M')).size()
+        yearly_read = read_valid.groupby(read_valid['date_read'].dt.year).size()
+        stats['books_read_per_month'] = {str(k): int(v) for k, v in monthly_read.to_dict().items()}
+        stats['books_read_per_year'] = {int(k): int(v) for k, v in yearly_read.to_dict().items() if pd.notna(k)}
+    added_valid = df[df['date_added'].notna()]
+    if not added_valid.empty:
+        monthly_added = added_valid.groupby(added_valid['date_added'].dt.to_period('M')).size()
+        yearly_added = added_valid.groupby(added_valid['date_added'].dt.year).size()
+        stats['books_per_month'] = {str(k): int(v) for k, v in monthly_added.to_dict().items()}
+        stats['books_per_year'] = {int(k): int(v) for k, v in yearly_added.to_dict().items() if pd.notna(k)}
+    stats['overall_stats'] = {
+        'total_books': len(df), 'read': len(df[df['shelf'] == 'read']),
+        'currently_reading': len(df[df['shelf'] == 'currently_reading']),
+        'want_to_read': len(df[df['shelf'] == 'to_read']),
+        'average_rating': round(df['rating'].mean(), 2) if 'rating' in df.columns and df['rating'].notna().any() else None,
+        'total_pages_read': int(df[df['shelf'] == 'read']['num_pages'].sum()) if 'num_pages' in df.columns else None,
+        'average_pages_per_book': round(df['num_pages'].mean(), 1) if 'num_pages' in df.columns and df['num_pages'].notna().any() else None
+    }
+    for shelf in ['read', 'currently_reading', 'to_read']:
+        shelf_valid = df[(df['shelf'] == shelf) & (df['date_added'].notna())]
+        if not shelf_valid.empty:
+            monthly_shelf = shelf_valid.groupby(shelf_valid['date_added'].dt.to_period('M')).size()
+            yearly_shelf = shelf_valid.groupby(shelf_valid['date_added'].dt.year).size()
+            stats['shelf_additions_per_month'][shelf] = {str(k): int(v) for k, v in monthly_shelf.to_dict().items()}
+            stats['shelf_additions_per_year'][shelf] = {int(k): int(v) for k, v in yearly_shelf.to_dict().items() if pd.notna(k)}
+    if 'date_read' in df.columns and 'date_added' in df.columns:
+        valid_days = df[(df['shelf'] == 'read') & df['date_read'].notna() & df['date_added'].notna()]
+        if not valid_days.empty:
+            valid_days = valid_days.copy()
+            valid_days['days_to_read'] = (valid_days['date_read'] - valid_days['date_added']).dt.days
+            valid_days = valid_days[valid_days['days_to_read'] >= 0]
+            if not valid_days.empty:
+                stats['status_change_frequency']['avg_days_to_read'] = round(valid_days['days_to_read'].mean(), 1)
+                stats['status_change_frequency']['median_days_to_read'] = round(valid_days['days_to_read'].median(), 1)
+    return stats
+
+def fixture_books():
+    """Every book on the recorded shelf pages in fixtures/shelves."""
+    katalog = Katalog('', 'fixture')
+    books = []
+    for path in sorted(glob.glob(os.path.join(ROOT, 'fixtures', 'shelves', '*.html'))):
+        shelf = os.path.basename(path).split('_page')[0]
+        with open(path, 'rb') as f:
+            books.extend(katalog.shelf_parser.parse(f.read(), shelf)['books'])
+    return books
+
+def random_date(rng: random.Random, messy: bool):
+    year, month, day = rng.randint(2005, 2025), rng.randint(1, 12), rng.randint(1, 28)
+    shapes = [f'{year}-{month:02d}-{day:02d}'] * 8
+    if messy:
+        shapes += [f'{year}-{month:02d}', f'{year}', f'{year}-02-30', '', None]
+    return rng.choice(shapes + [None, None])
+
+def random_books(count: int, seed: int, messy: bool = True):
+    rng = random.Random(seed)
+    books = []
+    for i in range(count):
+        books.append(Book(
+            title=f'Book {i}', book_url=f'https://www.goodreads.com/book/show/{i}',
+            shelf=rng.choice(['read', 'read', 'currently_reading', 'to_read', 'to_read']),
+            rating=rng.choice([None, 0, 1, 2, 3, 4, 5]),
+            num_pages=rng.choice([None, rng.randint(40, 1200)]),
+            date_added=random_date(rng, messy), date_read=random_date(rng, messy),
+            date_started=random_date(rng, messy)
+        ))
+    return books
+
+def check(name, books) -> bool:
+    expected, actual = pandas_statistics(books), calculate_statistics(books)
+    if expected == actual:
+        return True
+    print(f"MISMATCH on {name}:")
+    for key in expected:
+        if expected[key] != actual.get(key):
+            print(f"  {key}:\n    pandas:     {expected[key]}\n    aggregator: {actual.get(key)}")
+    return False
+
+def timed(func, books, repeat: int) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        started_at = time.perf_counter()
+        func(books)
+        best = min(best, time.perf_counter() - started_at)
+    return best
+
+def import_time(module: str) -> float:
+    """Wall time of a fresh interpreter importing `module`, startup included."""
+    started_at = time.perf_counter()
+    subprocess.run([sys.executable, '-c', f'import {module}'], cwd=os.path.join(ROOT, 'src'), check=True)
+    return time.perf_counter() - started_at
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--books', type=int, default=5000, help="library size for the timing run")
+    parser.add_argument('--seeds', type=int, default=50, help="randomized libraries to check")
+    parser.add_argument('--repeat', type=int, default=5, help="timing repetitions, the best one is reported")
+    args = parser.parse_args(argv)
+
+    ok = check('fixtures/shelves', fixture_books())
+    for seed in range(args.seeds):
+        books = random_books(random.Random(seed).randint(0, 400), seed, messy=seed % 2 == 0)
+        ok = check(f'random library (seed {seed})', books) and ok
+    print(f"Statistics {'match' if ok else 'DIFFER'} on the fixtures and {args.seeds} random libraries")
+
+    books = random_books(args.books, seed=0, messy=False)
+    pandas_time = timed(pandas_statistics, books, args.repeat)
+    aggregator_time = timed(calculate_statistics, books, args.repeat)
+    print(f"{len(books)} books: pandas {pandas_time * 1000:.1f} ms, "
+          f"aggregator {aggregator_time * 1000:.1f} ms ({pandas_time / aggregator_time:.1f}x)")
+    print(f"Fresh interpreter importing: pandas {import_time('pandas') * 1000:.0f} ms, "
+          f"reading_stats {import_time('reading_stats') * 1000:.0f} ms")
+    return 0 if ok else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,293 @@
+"""
+Offline benchmark suite for the scraper's parsing paths.
+
+Runs the parsing code against the checked-in fixtures (fixtures/shelves,
+fixtures/feed, fixtures/profile, fixtures/challenge) and reports the
+throughput and peak memory of each benchmark. get_books_data runs end to
+end, with the shelf pages served from the fixtures by a requests transport
+adapter instead of the network. Nothing leaves the machine.
+
+Results are compared with scripts/bench_baselines.json. Each timed sample
+also runs a fixed pure-Python reference workload, right before the
+benchmark, and a benchmark is scored by the units it gets through in
+the time the reference takes once, the median over the samples. Load
+from other processes and CPU frequency changes slow both down alike,
+and samples are timed in the process's CPU time, so scores hold steady
+where raw throughput does not. A benchmark fails when its score drops
+more than --tolerance below its baseline in two measurements in a row,
+or its peak memory grows more than --memory-tolerance above it. Peak
+memory is what tracemalloc sees, i.e. Python allocations; lxml's own C
+buffers are not included. Scores still differ somewhat between
+machines, so re-record all the baselines in one run with --update after
+changing what a benchmark measures.
+
+    python scripts/benchmark.py [--repeat N] [--only NAME] [--update]
+"""
+import argparse
+import asyncio
+import glob
+import io
+import json
+import logging
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+from urllib.parse import parse_qs, urlparse
+
+import requests
+from requests.adapters import BaseAdapter
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'src'))
+
+from dates import normalize_date
+from katalog import Katalog
+from parsers import PARSERS, lxml_html
+from rate_limiter import AdaptiveRateLimiter
+from schemas import Book, FeedActivity, dump_many, same_content, validate_many
+
+FIXTURES_DIR = os.path.join(ROOT, 'fixtures')
+BASELINES_FILE = os.path.join(ROOT, 'scripts', 'bench_baselines.json')
+# Loop iterations of one run of the reference workload, a few milliseconds
+REFERENCE_ITERATIONS = 20_000
+USER_ID = '1000001'
+
+def read_fixture(*parts) -> bytes:
+    with open(os.path.join(FIXTURES_DIR, *parts), 'rb') as f:
+        return f.read()
+
+# What Goodreads serves for a page past the end of a shelf
+EMPTY_SHELF_PAGE = b'<html><body><table id="books"><tbody id="booksBody"></tbody></table></body></html>'
+
+class FixtureAdapter(BaseAdapter):
+    """
+    Serves shelf list requests from fixtures/shelves, with an empty page past
+    the recorded ones. Anything else is a 404. Streamed requests get the
+    body as a raw stream, the way a real adapter hands it over.
+    """
+
+    def send(self, request, **kwargs):
+        response = requests.Response()
+        response.request = request
+        response.url = request.url
+        url = urlparse(request.url)
+        query = parse_qs(url.query)
+        path = os.path.join(FIXTURES_DIR, 'shelves', f"{query.get('shelf', [''])[0]}_page{query.get('page', ['1'])[0]}.html")
+        content = b''
+        if url.path.startswith('/review/list/'):
+            response.status_code = 200
+            content = EMPTY_SHELF_PAGE
+            if os.path.exists(path):
+                with open(path, 'rb') as f:
+                    content = f.read()
+        else:
+            response.status_code = 404
+        if kwargs.get('stream'):
+            response.raw = io.BytesIO(content)
+        else:
+            response._content = content
+        return response
+
+    def close(self):
+        pass
+
+def offline_katalog(shelf_parser: str = 'auto') -> Katalog:
+    # Unthrottled: the limiter would otherwise dominate the timings
+    limiter = AdaptiveRateLimiter(rate=1e9, max_rate=1e9, burst=1e9)
+    katalog = Katalog('', USER_ID, max_concurrency=8, rate_limiter=limiter, shelf_parser=shelf_parser)
+    katalog.session.mount('https://', FixtureAdapter())
+    katalog.session.mount('http://', FixtureAdapter())
+    return katalog
+
+def shelf_pages():
+    pages = []
+    for path in sorted(glob.glob(os.path.join(FIXTURES_DIR, 'shelves', '*.html'))):
+        with open(path, 'rb') as f:
+            pages.append((os.path.basename(path).split('_page')[0], f.read()))
+    return pages
+
+def build_benchmarks():
+    """name -> (unit, function returning the number of units it processed)"""
+    katalog = offline_katalog()
+    pages = shelf_pages()
+    feed_html = read_fixture('feed', 'home.html').decode('utf-8')
+    profile = read_fixture('profile', 'user_show.html')
+    challenge = json.loads(read_fixture('challenge', 'goals_data.json'))
+
+    # The raw feed fields the in-browser extraction hands to _build_feed_activities
+    from bs4 import BeautifulSoup
+    raw_feed_items = [katalog._extract_feed_item(item) for item in
+                      BeautifulSoup(feed_html, 'html.parser').find_all('div', class_='gr-newsfeedItem')]
+
+    # Every date string the shelf parser normalizes
+    date_strings = []
+    def record_dates(values):
+        date_strings.extend(values)
+        return katalog.dates.normalize_many(values)
+    recorder = PARSERS['bs4'](katalog.base_url, record_dates)
+    for shelf, content in pages:
+        recorder.parse(content, shelf)
+
+    benchmarks = {}
+    for name in PARSERS:
+        if name == 'lxml' and lxml_html is None:
+            continue
+        parser_katalog = offline_katalog(name)
+        benchmarks[f'get_books_data[{name}]'] = (
+            'rows', lambda k=parser_katalog: len(asyncio.run(k.get_books_data())['all_books'])
+        )
+        benchmarks[f'shelf_parser.parse[{name}]'] = (
+            'rows', lambda p=parser_katalog.shelf_parser: sum(len(p.parse(content, shelf)['books']) for shelf, content in pages)
+        )
+    benchmarks['_parse_feed_html'] = (
+        'items', lambda: len(katalog._parse_feed_html(feed_html, limit=len(raw_feed_items)))
+    )
+    benchmarks['_build_feed_activities'] = (
+        'items', lambda: len(katalog._build_feed_activities(raw_feed_items))
+    )
+    benchmarks['_parse_account_metadata'] = (
+        'pages', lambda: len([katalog._parse_account_metadata(profile)])
+    )
+    benchmarks['_parse_reading_challenge'] = (
+        'responses', lambda: len([katalog._parse_reading_challenge(challenge) for _ in range(100)])
+    )
+    benchmarks['_parse_date'] = (
+        'dates', lambda: len([katalog._parse_date(value) for value in date_strings])
+    )
+    benchmarks['normalize_date'] = (
+        'dates', lambda: len([normalize_date(value) for value in date_strings])
+    )
+    benchmarks['DateNormalizer.normalize_many'] = (
+        'dates', lambda: len(katalog.dates.normalize_many(date_strings))
+    )
+
+    # Object construction and serialization, one call per object (as the
+    # code used to) against one call per page
+    books = [book for shelf, content in pages for book in katalog.shelf_parser.parse(content, shelf)['books']]
+    book_rows = [book.model_dump(exclude_none=True) for book in books]
+    activities = katalog._build_feed_activities(raw_feed_items)
+    activity_rows = [activity.model_dump(exclude_none=True) for activity in activities]
+    copies = [book.model_copy() for book in books]
+    benchmarks['Book(**row)'] = ('objects', lambda: len([Book(**row) for row in book_rows]))
+    benchmarks['validate_many[Book]'] = ('objects', lambda: len(validate_many(Book, book_rows)))
+    benchmarks['FeedActivity(**row)'] = ('objects', lambda: len([FeedActivity(**row) for row in activity_rows]))
+    benchmarks['validate_many[FeedActivity]'] = ('objects', lambda: len(validate_many(FeedActivity, activity_rows)))
+    benchmarks['model_dump[Book]'] = ('objects', lambda: len([book.model_dump(exclude_none=True) for book in books]))
+    benchmarks['dump_many[Book]'] = ('objects', lambda: len(dump_many(books, exclude_none=True)))
+    benchmarks['model_dump ==[Book]'] = ('objects', lambda: sum(
+        book.model_dump(exclude={'user_id'}) == copy.model_dump(exclude={'user_id'}) for book, copy in zip(books, copies)
+    ))
+    benchmarks['same_content[Book]'] = ('objects', lambda: sum(same_content(book, copy) for book, copy in zip(books, copies)))
+    return benchmarks
+
+def reference_workload():
+    """Fixed pure-Python work the benchmarks are scored against: dict, str and int operations."""
+    counts = {}
+    for i in range(REFERENCE_ITERATIONS):
+        key = str(i % 97)
+        counts[key] = counts.get(key, 0) + i
+
+def sample(func, count: int, min_time: float) -> float:
+    """
+    Throughput of `func`, called until `min_time` has passed, in units per
+    second of the process's CPU time, so time other processes take doesn't count.
+    """
+    calls = 0
+    started_at = time.process_time()
+    while True:
+        func()
+        calls += 1
+        elapsed = time.process_time() - started_at
+        if elapsed >= min_time:
+            return count * calls / elapsed
+
+def measure(func, repeat: int, min_time: float = 0.2):
+    """
+    Median throughput in units/s, median score and the peak traced memory
+    of one run, in KiB. Each of the `repeat` samples calls `func` until
+    `min_time` has passed, so fast benchmarks are not dominated by timer
+    noise, right after timing the reference workload for half as long.
+    The score of a sample is the units `func` gets through in the time
+    the reference workload takes once.
+    """
+    count = func() # warm-up, also the unit count
+    throughputs = []
+    scores = []
+    for _ in range(repeat):
+        reference = sample(reference_workload, 1, min_time / 2)
+        throughput = sample(func, count, min_time)
+        throughputs.append(throughput)
+        scores.append(throughput / reference)
+
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return count, statistics.median(throughputs), statistics.median(scores), peak / 1024
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=9, help="timed samples per benchmark, the median counts")
+    parser.add_argument('--min-time', type=float, default=0.2, help="minimum seconds per sample")
+    parser.add_argument('--only', action='append', help="run only benchmarks whose name contains this, repeatable")
+    parser.add_argument('--tolerance', type=float, default=0.25, help="allowed score drop, as a fraction")
+    parser.add_argument('--memory-tolerance', type=float, default=0.25, help="allowed peak memory growth, as a fraction")
+    parser.add_argument('--baselines', default=BASELINES_FILE, help="baselines file")
+    parser.add_argument('--update', action='store_true', help="write the results as the new baselines")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.ERROR)
+
+    baselines = {}
+    if os.path.exists(args.baselines):
+        with open(args.baselines) as f:
+            baselines = json.load(f)
+
+    results = {}
+    failures = []
+    print(f"{'benchmark':32} {'units':>7} {'throughput':>16} {'score':>10} {'baseline':>10} {'peak KiB':>10} {'baseline':>10}")
+    for name, (unit, func) in build_benchmarks().items():
+        if args.only and not any(part in name for part in args.only):
+            continue
+        count, throughput, score, peak_kib = measure(func, args.repeat, args.min_time)
+        results[name] = {'unit': unit, 'throughput': round(throughput, 1), 'score': round(score, 4),
+                         'peak_kib': round(peak_kib, 1)}
+
+        baseline = baselines.get(name)
+        status = ''
+        if baseline:
+            if score < baseline['score'] * (1 - args.tolerance) and not args.update:
+                # Measure once more before calling it, a single burst of noise can sink a median
+                count, throughput, score, peak_kib = max(
+                    (count, throughput, score, peak_kib), measure(func, args.repeat, args.min_time),
+                    key=lambda result: result[2])
+            if score < baseline['score'] * (1 - args.tolerance):
+                status += ' SLOWER'
+            if peak_kib > baseline['peak_kib'] * (1 + args.memory_tolerance):
+                status += ' MORE MEMORY'
+            if status:
+                failures.append(name)
+        baseline_score = f"{baseline['score']:,.2f}" if baseline else '-'
+        baseline_peak = f"{baseline['peak_kib']:,.0f}" if baseline else '-'
+        print(f"{name:32} {count:>7} {throughput:>11,.0f} {unit + '/s':<4} {score:>10,.2f} {baseline_score:>10} "
+              f"{peak_kib:>10,.0f} {baseline_peak:>10}{status}")
+
+    if args.update:
+        baselines.update(results)
+        with open(args.baselines, 'w') as f:
+            json.dump(baselines, f, indent=2, sort_keys=True)
+            f.write('\n')
+        print(f"Baselines written to {os.path.relpath(args.baselines, ROOT)}")
+        return 0
+
+    if failures:
+        print(f"REGRESSION in {', '.join(failures)}")
+        return 1
+    print("No regressions" if baselines else "No baselines yet, record them with --update")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
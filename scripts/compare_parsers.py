@@ -0,0 +1,104 @@
+"""
+Differential harness for the shelf page parsers.
+
+Runs every parser backend over recorded shelf pages and checks that they
+produce identical Books and pagination details, using the bs4 parser as
+the reference. Pages are read from fixtures/shelves by default, pass other
+files or directories to check real recorded pages. The shelf is taken
+from the file name (`<shelf>_page<n>.html`).
+
+    python scripts/compare_parsers.py [PATH ...]
+"""
+import glob
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'src'))
+
+from katalog import Katalog
+from parsers import PARSERS, lxml_html
+
+SHELVES = ('currently-reading', 'to-read', 'read')
+
+def shelf_from_filename(path: str) -> str:
+    name = os.path.basename(path)
+    for shelf in SHELVES:
+        if name.startswith(shelf):
+            return shelf
+    raise ValueError(f"Cannot tell the shelf of {path}, expected <shelf>_page<n>.html")
+
+def collect_pages(paths):
+    pages = []
+    for path in paths:
+        if os.path.isdir(path):
+            pages.extend(sorted(glob.glob(os.path.join(path, '*.html'))))
+        else:
+            pages.append(path)
+    return pages
+
+def comparable(result):
+    return {
+        'books': [book.model_dump() for book in result['books']],
+        'has_rows': result['has_rows'],
+        'next_disabled': result['next_disabled'],
+        'last_page': result['last_page'],
+    }
+
+def main(argv):
+    pages = collect_pages(argv or [os.path.join(ROOT, 'fixtures', 'shelves')])
+    if not pages:
+        print("No pages to compare.")
+        return 1
+
+    # Parsers share Katalog's date handling, the cookie is never used
+    katalog = Katalog('', 'fixture', shelf_parser='bs4')
+    names = [name for name in PARSERS if name != 'lxml' or lxml_html is not None]
+    parsers = {name: PARSERS[name](katalog.base_url, katalog.dates.normalize_many) for name in names}
+    timings = {name: 0.0 for name in names}
+    rows = 0
+    failures = 0
+
+    for path in pages:
+        shelf = shelf_from_filename(path)
+        with open(path, 'rb') as f:
+            content = f.read()
+
+        results = {}
+        for name, parser in parsers.items():
+            start = time.perf_counter()
+            results[name] = comparable(parser.parse(content, shelf))
+            timings[name] += time.perf_counter() - start
+
+        reference = results['bs4']
+        rows += len(reference['books'])
+        for name, result in results.items():
+            if result == reference:
+                continue
+            failures += 1
+            print(f"MISMATCH {name} vs bs4 on {os.path.relpath(path, ROOT)}")
+            for key in ('has_rows', 'next_disabled', 'last_page'):
+                if result[key] != reference[key]:
+                    print(f"  {key}: {result[key]!r} != {reference[key]!r}")
+            if len(result['books']) != len(reference['books']):
+                print(f"  book count: {len(result['books'])} != {len(reference['books'])}")
+            for index, (got, expected) in enumerate(zip(result['books'], reference['books'])):
+                if got != expected:
+                    diff = {k: (got[k], expected[k]) for k in expected if got[k] != expected[k]}
+                    print(f"  row {index}: {diff}")
+                    break
+
+    print(f"Compared {len(parsers)} parsers on {len(pages)} pages ({rows} rows)")
+    for name, seconds in timings.items():
+        rate = rows / seconds if seconds else 0
+        print(f"  {name:>5}: {seconds:.3f}s ({rate:,.0f} rows/s)")
+
+    if failures:
+        print(f"{failures} mismatches found")
+        return 1
+    print("All parsers agree")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,174 @@
+"""
+Local stand-in for Goodreads, for running the scraper end to end offline.
+
+Serves a cassette recorded with HTTP_RECORD_PATH, or without --cassette
+the checked-in fixtures: shelf pages, the rendered home feed, the profile
+page and the reading challenge response. Point the scraper at it and run
+it unchanged:
+
+    python scripts/goodreads_standin.py [--cassette FILE] [--port 8765]
+    GOODREADS_BASE_URL=http://127.0.0.1:8765 python src/index.py
+
+Fixtures are served with an ETag and answer a matching If-None-Match with
+a 304, like Goodreads does, to exercise HTTP_CACHE_PATH.
+
+Latency, 429s and failures can be injected to see how the scraper copes.
+Failures are 503s, or dropped connections with --failure-mode drop. The
+random choices are seeded, so a run can be repeated.
+"""
+import argparse
+import hashlib
+import json
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'src'))
+
+from cassettes import Cassette
+
+FIXTURES_DIR = os.path.join(ROOT, 'fixtures')
+# What Goodreads serves for a page past the end of a shelf
+EMPTY_SHELF_PAGE = b'<html><body><table id="books"><tbody id="booksBody"></tbody></table></body></html>'
+HTML = 'text/html; charset=utf-8'
+
+def fixture_response(path: str, query: dict):
+    """(status, content type, body) for a request, served from fixtures/."""
+    def read(*parts):
+        with open(os.path.join(FIXTURES_DIR, *parts), 'rb') as f:
+            return f.read()
+
+    if path.startswith('/review/list/'):
+        shelf, page = query.get('shelf', [''])[0], query.get('page', ['1'])[0]
+        name = f'{shelf}_page{page}.html'
+        if os.path.exists(os.path.join(FIXTURES_DIR, 'shelves', name)):
+            return 200, HTML, read('shelves', name)
+        return 200, HTML, EMPTY_SHELF_PAGE
+    if path == '/':
+        return 200, HTML, read('feed', 'home.html')
+    if path.startswith('/user/show/'):
+        return 200, HTML, read('profile', 'user_show.html')
+    if path == '/readingchallenges/goals/data':
+        return 200, 'application/json', read('challenge', 'goals_data.json')
+    return 404, 'text/plain', b'not found'
+
+class StandinHandler(BaseHTTPRequestHandler):
+    server: 'StandinServer'
+
+    def do_GET(self):
+        server = self.server
+        if server.latency or server.jitter:
+            time.sleep(server.latency + server.rng_uniform(0, server.jitter))
+
+        roll = server.rng_uniform(0, 1)
+        if roll < server.throttle_rate:
+            server.count('429')
+            return self._respond(429, 'text/plain', b'slow down', {'Retry-After': str(server.retry_after)})
+        if roll < server.throttle_rate + server.failure_rate:
+            if server.failure_mode == 'drop':
+                server.count('dropped')
+                self.close_connection = True
+                return
+            server.count('503')
+            return self._respond(503, 'text/plain', b'unavailable')
+
+        if server.cassette is not None:
+            interaction = server.cassette.lookup('GET', self.path)
+            if interaction is None:
+                server.count('not recorded')
+                self.log_message("Not in the cassette: GET %s", self.path)
+                return self._respond(404, 'text/plain', b'not recorded')
+            server.count(str(interaction['status']))
+            headers = dict(interaction['headers'])
+            content_type = headers.pop('Content-Type', HTML)
+            return self._respond(interaction['status'], content_type, Cassette.body(interaction), headers)
+
+        parts = urlsplit(self.path)
+        status, content_type, body = fixture_response(parts.path, parse_qs(parts.query))
+        if status != 200:
+            server.count(str(status))
+            return self._respond(status, content_type, body)
+        etag = f'"{hashlib.sha256(body).hexdigest()[:16]}"'
+        if self.headers.get('If-None-Match') == etag:
+            server.count('304')
+            return self._respond(304, content_type, b'', {'ETag': etag})
+        server.count(str(status))
+        self._respond(status, content_type, body, {'ETag': etag})
+
+    def _respond(self, status: int, content_type: str, body: bytes, headers=None):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        if not self.server.quiet:
+            super().log_message(format, *args)
+
+class StandinServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, cassette=None, latency=0.0, jitter=0.0, throttle_rate=0.0, retry_after=1,
+                 failure_rate=0.0, failure_mode='status', seed=0, quiet=False):
+        super().__init__(address, StandinHandler)
+        self.cassette = cassette
+        self.latency, self.jitter = latency, jitter
+        self.throttle_rate, self.retry_after = throttle_rate, retry_after
+        self.failure_rate, self.failure_mode = failure_rate, failure_mode
+        self.quiet = quiet
+        self.responses = Counter()
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def rng_uniform(self, low: float, high: float) -> float:
+        with self._lock:
+            return self._rng.uniform(low, high)
+
+    def count(self, outcome: str):
+        with self._lock:
+            self.responses[outcome] += 1
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--cassette', help="cassette recorded with HTTP_RECORD_PATH, the fixtures are served without one")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.0, help="seconds added to every response")
+    parser.add_argument('--jitter', type=float, default=0.0, help="up to this many more seconds, at random")
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help="share of requests answered with a 429")
+    parser.add_argument('--retry-after', type=int, default=1, help="Retry-After seconds sent with each 429")
+    parser.add_argument('--failure-rate', type=float, default=0.0, help="share of requests that fail")
+    parser.add_argument('--failure-mode', choices=['status', 'drop'], default='status',
+                        help="fail with a 503, or by dropping the connection")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--quiet', action='store_true', help="do not log every request")
+    args = parser.parse_args(argv)
+
+    cassette = Cassette.load(args.cassette) if args.cassette else None
+    server = StandinServer(
+        (args.host, args.port), cassette=cassette, latency=args.latency, jitter=args.jitter,
+        throttle_rate=args.throttle_rate, retry_after=args.retry_after, failure_rate=args.failure_rate,
+        failure_mode=args.failure_mode, seed=args.seed, quiet=args.quiet
+    )
+    source = f"{len(cassette.interactions)} recorded exchanges" if cassette else "the fixtures"
+    print(f"Goodreads stand-in serving {source} on http://{args.host}:{server.server_port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(f"Responses: {json.dumps(dict(server.responses), sort_keys=True)}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,108 @@
+"""
+Startup-time budget for the scraper entry point.
+
+Imports src/index.py in fresh interpreters under `python -X importtime`
+and checks the result against scripts/startup_budget.json: the median
+import time must stay under `max_import_ms`, and none of the
+`deferred_modules` may be loaded by the import itself. Those are only
+needed by the phase that uses them (Playwright for the feed, the supabase
+client for the first query, ...), so a run that fails fast should never
+pay for them. Prints the heaviest imports and exits with 1 when the budget
+is broken.
+
+Pass --record to append the measurement to a JSON-lines history file, so
+startup time can be tracked from run to run.
+
+    python scripts/startup_budget.py [--runs N] [--top N] [--record PATH]
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+from datetime import datetime, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SRC = os.path.join(ROOT, 'src')
+BUDGET_FILE = os.path.join(ROOT, 'scripts', 'startup_budget.json')
+
+def import_profile(module: str):
+    """
+    Import `module` in a fresh interpreter under -X importtime. Returns its
+    cumulative import time in microseconds, the cumulative time of each
+    module it imports directly, and the names of all loaded modules.
+    """
+    code = f"import sys, json, {module}; print(json.dumps(sorted(sys.modules)))"
+    completed = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code],
+        cwd=SRC, capture_output=True, text=True, check=True
+    )
+    # `import time: self [us] | cumulative | imported package`, nested imports
+    # are indented by two more spaces and listed before their importer
+    children = {}
+    for line in completed.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        _, cumulative_us, name = line[len('import time:'):].split('|')
+        depth = len(name) - len(name.lstrip())
+        if depth == 1:
+            if name.strip() == module:
+                loaded = json.loads(completed.stdout.strip().splitlines()[-1])
+                return int(cumulative_us), children, loaded
+            children = {}
+        elif depth == 3:
+            children[name.strip()] = int(cumulative_us)
+    raise RuntimeError(f"{module} did not show up in the import profile")
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--module', default='index', help="entry point module in src/")
+    parser.add_argument('--runs', type=int, default=5, help="fresh interpreters to measure, the median is used")
+    parser.add_argument('--top', type=int, default=10, help="heaviest direct imports to list")
+    parser.add_argument('--budget', default=BUDGET_FILE, help="budget file")
+    parser.add_argument('--record', metavar='PATH', help="append this measurement to a JSON-lines history file")
+    args = parser.parse_args(argv)
+
+    with open(args.budget) as f:
+        budget = json.load(f)
+
+    runs = [import_profile(args.module) for _ in range(args.runs)]
+    totals = [total_us / 1000 for total_us, _, _ in runs]
+    import_ms = statistics.median(totals)
+
+    _, children, loaded = runs[-1]
+    print(f"import {args.module}: {import_ms:.0f} ms median of {args.runs} runs "
+          f"(min {min(totals):.0f}, max {max(totals):.0f}), budget {budget['max_import_ms']} ms")
+    heaviest = sorted(children.items(), key=lambda item: item[1], reverse=True)
+    for name, us in heaviest[:args.top]:
+        print(f"  {us / 1000:8.1f} ms  {name}")
+
+    ok = True
+    if import_ms > budget['max_import_ms']:
+        print(f"OVER BUDGET by {import_ms - budget['max_import_ms']:.0f} ms")
+        ok = False
+    eager = [name for name in budget['deferred_modules'] if name in loaded]
+    if eager:
+        print(f"Loaded at startup but should be deferred: {', '.join(eager)}")
+        ok = False
+
+    if args.record:
+        record = {
+            'measured_at': datetime.now(timezone.utc).isoformat(),
+            'python': platform.python_version(),
+            'module': args.module,
+            'import_ms': round(import_ms, 1),
+            'top': {name: round(us / 1000, 1) for name, us in heaviest[:args.top]},
+            'eager': eager
+        }
+        with open(args.record, 'a') as f:
+            f.write(json.dumps(record) + '\n')
+        print(f"Recorded to {args.record}")
+
+    print("Startup within budget" if ok else "Startup budget BROKEN")
+    return 0 if ok else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,248 @@
+"""
+Local stand-in for the Supabase REST API, for running the scraper offline.
+
+Implements the part of PostgREST that src/db_client.py uses, on in-memory
+tables: select with column lists, eq/neq/gt/gte/lt/lte/in filters, order,
+limit and offset, insert, upsert (on_conflict or the table's primary key,
+merging or ignoring duplicates) and delete. Tables are created on first use, with or without the _dev
+suffix. With --data the tables are loaded from and saved to a JSON file,
+so consecutive runs see each other's writes (high-water mark, known books,
+last_refreshed, ...).
+
+    python scripts/supabase_standin.py [--data FILE] [--port 54321]
+    SUPABASE_URL=http://127.0.0.1:54321 SUPABASE_KEY=standin python src/index.py
+
+--latency and --failure-rate slow down or fail requests with a 503, to
+exercise the write retries.
+"""
+import argparse
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+# Conflict target of upserts without on_conflict, by table name without _dev
+PRIMARY_KEYS = {
+    'books': ('user_id', 'book_url'),
+    'feed': ('id',),
+    'metadata': ('key',),
+    'reading_challenges': ('user_id', 'year'),
+    'statistics_state': ('user_id',),
+    'dashboard_aggregates': ('user_id',),
+}
+RESERVED_PARAMS = {'select', 'order', 'limit', 'offset', 'on_conflict', 'columns'}
+IN_VALUE = re.compile(r'"([^"]*)"|([^,]+)')
+
+def parse_in(values: str):
+    """`(a,"b,c",d)` -> ['a', 'b,c', 'd']"""
+    return [quoted or bare for quoted, bare in IN_VALUE.findall(values[1:-1])]
+
+def matches(row: dict, column: str, condition: str) -> bool:
+    operator, _, operand = condition.partition('.')
+    value = row.get(column)
+    if operator == 'in':
+        return value is not None and str(value) in parse_in(operand)
+    if operator == 'is':
+        return value is None if operand == 'null' else str(value).lower() == operand
+    if value is None:
+        return False
+    if operator in ('eq', 'neq'):
+        return (str(value) == operand) == (operator == 'eq')
+    # Compare as numbers where both sides are numbers, as text otherwise
+    if isinstance(value, (int, float)):
+        try:
+            operand = float(operand)
+        except ValueError:
+            value = str(value)
+    else:
+        value = str(value)
+    return {'gt': value > operand, 'gte': value >= operand, 'lt': value < operand, 'lte': value <= operand}[operator]
+
+def sort_rows(rows: list, order: str) -> list:
+    for term in reversed(order.split(',')):
+        column, _, direction = term.partition('.')
+        present = [row for row in rows if row.get(column) is not None]
+        missing = [row for row in rows if row.get(column) is None]
+        present.sort(key=lambda row: row[column], reverse=direction.startswith('desc'))
+        # PostgreSQL puts nulls last ascending and first descending
+        rows = missing + present if direction.startswith('desc') and 'nullslast' not in direction else present + missing
+    return rows
+
+class Tables:
+    """The in-memory tables, saved to `path` after every write if given."""
+
+    def __init__(self, path=None):
+        self.path = path
+        self.lock = threading.Lock()
+        self.tables = {}
+        self.next_id = 1
+        if path and os.path.exists(path):
+            with open(path) as f:
+                data = json.load(f)
+            self.tables, self.next_id = data['tables'], data['next_id']
+
+    def rows(self, table: str) -> list:
+        return self.tables.setdefault(table, [])
+
+    def save(self):
+        if self.path:
+            with open(self.path, 'w') as f:
+                json.dump({'tables': self.tables, 'next_id': self.next_id}, f)
+
+class SupabaseHandler(BaseHTTPRequestHandler):
+    server: 'SupabaseServer'
+
+    def _request(self):
+        parts = urlsplit(self.path)
+        if not parts.path.startswith('/rest/v1/'):
+            self._respond(404, {'message': f'Not found: {parts.path}'})
+            return None
+        table = parts.path[len('/rest/v1/'):].strip('/')
+        params = parse_qsl(parts.query, keep_blank_values=True)
+        filters = [(column, condition) for column, condition in params if column not in RESERVED_PARAMS]
+        options = {name: value for name, value in params if name in RESERVED_PARAMS}
+        return table, filters, options
+
+    def _body(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        return json.loads(self.rfile.read(length)) if length else None
+
+    def _prepare(self) -> bool:
+        """Apply the injected latency and failures. False if the request failed."""
+        server = self.server
+        if server.latency:
+            time.sleep(server.latency)
+        with server.tables.lock:
+            failed = server.rng.random() < server.failure_rate
+        if failed:
+            self._respond(503, {'message': 'Injected failure', 'code': 'PGRST000'})
+        return not failed
+
+    def do_GET(self):
+        request = self._request()
+        if not request or not self._prepare():
+            return
+        table, filters, options = request
+        with self.server.tables.lock:
+            rows = [row for row in self.server.tables.rows(table)
+                    if all(matches(row, column, condition) for column, condition in filters)]
+            if 'order' in options:
+                rows = sort_rows(rows, options['order'])
+            offset = int(options.get('offset', 0))
+            rows = rows[offset:offset + int(options['limit'])] if 'limit' in options else rows[offset:]
+            select = options.get('select', '*')
+            if select != '*':
+                columns = [column.strip() for column in select.split(',')]
+                rows = [{column: row.get(column) for column in columns} for row in rows]
+            else:
+                rows = [dict(row) for row in rows]
+        self._respond(200, rows)
+
+    def do_POST(self):
+        request = self._request()
+        if not request or not self._prepare():
+            return
+        table, _, options = request
+        records = self._body()
+        records = records if isinstance(records, list) else [records]
+        prefer = self.headers.get('Prefer') or ''
+        upsert = 'resolution=' in prefer
+        ignore_duplicates = 'resolution=ignore-duplicates' in prefer
+        base_table = table[:-len('_dev')] if table.endswith('_dev') else table
+        primary_key = PRIMARY_KEYS.get(base_table, ('id',))
+        key_columns = options['on_conflict'].split(',') if options.get('on_conflict') else primary_key
+
+        tables = self.server.tables
+        written = []
+        with tables.lock:
+            rows = tables.rows(table)
+            index = {tuple(str(row.get(column)) for column in key_columns): row for row in rows}
+            for record in records:
+                if 'id' in primary_key and 'id' not in record:
+                    record = {'id': tables.next_id, **record}
+                    tables.next_id += 1
+                key = tuple(str(record.get(column)) for column in key_columns)
+                existing = index.get(key)
+                if existing is not None and not upsert:
+                    self._respond(409, {'message': 'duplicate key value violates unique constraint', 'code': '23505'})
+                    return
+                if existing is not None and ignore_duplicates:
+                    continue
+                if existing is not None:
+                    existing.update(record)
+                    written.append(dict(existing))
+                else:
+                    row = dict(record)
+                    rows.append(row)
+                    index[key] = row
+                    written.append(dict(row))
+            tables.save()
+        self._respond(201, written)
+
+    def do_DELETE(self):
+        request = self._request()
+        if not request or not self._prepare():
+            return
+        table, filters, _ = request
+        tables = self.server.tables
+        with tables.lock:
+            rows = tables.rows(table)
+            deleted = [row for row in rows if all(matches(row, column, condition) for column, condition in filters)]
+            rows[:] = [row for row in rows if row not in deleted]
+            tables.save()
+        self._respond(200, deleted)
+
+    def _respond(self, status: int, payload):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        if not self.server.quiet:
+            super().log_message(format, *args)
+
+class SupabaseServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, tables: Tables, latency=0.0, failure_rate=0.0, seed=0, quiet=False):
+        super().__init__(address, SupabaseHandler)
+        self.tables = tables
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.rng = random.Random(seed)
+        self.quiet = quiet
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--data', help="JSON file the tables are loaded from and saved to")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=54321)
+    parser.add_argument('--latency', type=float, default=0.0, help="seconds added to every request")
+    parser.add_argument('--failure-rate', type=float, default=0.0, help="share of requests answered with a 503")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--quiet', action='store_true', help="do not log every request")
+    args = parser.parse_args(argv)
+
+    server = SupabaseServer((args.host, args.port), Tables(args.data), latency=args.latency,
+                            failure_rate=args.failure_rate, seed=args.seed, quiet=args.quiet)
+    print(f"Supabase stand-in on http://{args.host}:{server.server_port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        with server.tables.lock:
+            print("Rows: " + json.dumps({table: len(rows) for table, rows in server.tables.tables.items()}, sort_keys=True))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
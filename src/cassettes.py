@@ -0,0 +1,146 @@
+import base64
+import json
+import logging
+import threading
+from collections import defaultdict
+from typing import Dict, List, Mapping, Optional
+from urllib.parse import urlsplit
+
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+# Bump when the cassette file layout changes
+CASSETTE_VERSION = 1
+
+# Response headers worth replaying. Cookies are never stored, and bodies are
+# stored decoded, so the encoding and length headers no longer apply.
+RECORDED_HEADERS = ('Content-Type', 'Retry-After', 'ETag', 'Last-Modified', 'Cache-Control', 'Location')
+
+def request_key(method: str, url: str) -> str:
+    """`METHOD /path?query`, the host is left out so a cassette replays on any base URL."""
+    parts = urlsplit(url)
+    path = parts.path or '/'
+    return f"{method.upper()} {path}?{parts.query}" if parts.query else f"{method.upper()} {path}"
+
+class Cassette:
+    """
+    Recorded Goodreads exchanges: the requests.Session traffic and the
+    rendered feed page the browser scraped. Saved as one JSON file that
+    scripts/goodreads_standin.py serves back.
+
+    Exchanges are looked up by method, path and query. Repeated requests
+    get the recorded responses in order, and the last one once they run out.
+    """
+
+    def __init__(self, interactions: Optional[List[Dict]] = None):
+        self.interactions: List[Dict] = interactions or []
+        self._lock = threading.Lock()
+        self._by_key: Dict[str, List[Dict]] = defaultdict(list)
+        self._served: Dict[str, int] = defaultdict(int)
+        for interaction in self.interactions:
+            self._by_key[interaction['key']].append(interaction)
+
+    def record(self, method: str, url: str, status: int, headers: Mapping[str, str], body: bytes, kind: str = 'http'):
+        interaction = {
+            'kind': kind,
+            'key': request_key(method, url),
+            'status': status,
+            'headers': {name: headers[name] for name in RECORDED_HEADERS if name in headers},
+        }
+        try:
+            interaction['body'] = body.decode('utf-8')
+        except UnicodeDecodeError:
+            interaction['body_base64'] = base64.b64encode(body).decode('ascii')
+        with self._lock:
+            self.interactions.append(interaction)
+            self._by_key[interaction['key']].append(interaction)
+
+    def lookup(self, method: str, url: str) -> Optional[Dict]:
+        """The next recorded response to a request, or None if it was never recorded."""
+        key = request_key(method, url)
+        with self._lock:
+            recorded = self._by_key.get(key)
+            if not recorded:
+                return None
+            index = min(self._served[key], len(recorded) - 1)
+            self._served[key] += 1
+            return recorded[index]
+
+    @staticmethod
+    def body(interaction: Dict) -> bytes:
+        if 'body_base64' in interaction:
+            return base64.b64decode(interaction['body_base64'])
+        return interaction.get('body', '').encode('utf-8')
+
+    def save(self, path: str):
+        with self._lock:
+            data = {'version': CASSETTE_VERSION, 'interactions': list(self.interactions)}
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+        logger.info("Recorded %s exchanges to %s", len(data['interactions']), path)
+
+    @classmethod
+    def load(cls, path: str) -> 'Cassette':
+        """Raises ValueError for a cassette written by an incompatible version."""
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+        if data.get('version') != CASSETTE_VERSION:
+            raise ValueError(f"Unsupported cassette version {data.get('version')}")
+        return cls(data['interactions'])
+
+class RecordingAdapter(HTTPAdapter):
+    """
+    An HTTPAdapter that records every exchange it sends into a Cassette.
+    The body is copied as the caller reads it, so a streamed response is
+    still streamed, and recorded once it has been read to the end or the
+    response is closed.
+    """
+
+    def __init__(self, cassette: Cassette, *args, **kwargs):
+        self.cassette = cassette
+        super().__init__(*args, **kwargs)
+
+    def send(self, request, **kwargs):
+        response = super().send(request, **kwargs)
+        raw = response.raw
+        stream, close, release_conn = raw.stream, raw.close, raw.release_conn
+        chunks: List[bytes] = []
+        recorded = reading = False
+
+        def record():
+            nonlocal recorded
+            if not recorded and not reading:
+                recorded = True
+                self.cassette.record(request.method, request.url, response.status_code, response.headers,
+                                     b''.join(chunks))
+
+        def tee_stream(*args, **kwargs):
+            nonlocal reading
+            body = stream(*args, **kwargs)
+            while True:
+                # urllib3 releases the connection from within the read that exhausts the
+                # body, before that last chunk is handed out, so wait for it here
+                reading = True
+                try:
+                    chunk = next(body)
+                except StopIteration:
+                    break
+                finally:
+                    reading = False
+                chunks.append(chunk)
+                yield chunk
+            record()
+
+        def tee_close():
+            record()
+            close()
+
+        def tee_release_conn():
+            record()
+            release_conn()
+
+        # requests reads every body through raw.stream, and closes raw or
+        # releases its connection once the body is read or abandoned
+        raw.stream, raw.close, raw.release_conn = tee_stream, tee_close, tee_release_conn
+        return response
@@ -10,4 +10,54 @@ GOODREADS_COOKIE: Optional[str] = os.environ.get('GOODREADS_COOKIE')
 GOODREADS_USER_ID: Optional[str] = os.environ.get('GOODREADS_USER_ID')
 SUPABASE_URL: Optional[str] = os.environ.get('SUPABASE_URL')
 SUPABASE_KEY: Optional[str] = os.environ.get('SUPABASE_KEY')
-SENTRY_DSN: Optional[str] = os.environ.get('SENTRY_DSN')
\ No newline at end of file
+SENTRY_DSN: Optional[str] = os.environ.get('SENTRY_DSN')
+SCRAPE_CONCURRENCY: int = int(os.environ.get('SCRAPE_CONCURRENCY', '4'))
+GOODREADS_RATE_LIMIT: float = float(os.environ.get('GOODREADS_RATE_LIMIT', '2.0'))
+GOODREADS_MAX_RATE_LIMIT: float = float(os.environ.get('GOODREADS_MAX_RATE_LIMIT', '8.0'))
+SHELF_PARSER: str = os.environ.get('SHELF_PARSER', 'auto')
+# 'full' re-scrapes every shelf page, 'incremental' stops at already-known
+# books, 'auto' runs incremental with a full sweep every FULL_SYNC_INTERVAL_DAYS
+SYNC_MODE: str = os.environ.get('SYNC_MODE', 'auto')
+FULL_SYNC_INTERVAL_DAYS: int = int(os.environ.get('FULL_SYNC_INTERVAL_DAYS', '14'))
+# Delete stored books that vanished from every shelf (full syncs only)
+DELETE_MISSING_BOOKS: bool = os.environ.get('DELETE_MISSING_BOOKS', 'false').lower() == 'true'
+# Supabase writes are sent in batches bounded by rows and JSON size
+DB_WRITE_BATCH_ROWS: int = int(os.environ.get('DB_WRITE_BATCH_ROWS', '500'))
+DB_WRITE_BATCH_BYTES: int = int(os.environ.get('DB_WRITE_BATCH_BYTES', '1000000'))
+DB_WRITE_CONCURRENCY: int = int(os.environ.get('DB_WRITE_CONCURRENCY', '4'))
+DB_WRITE_RETRIES: int = int(os.environ.get('DB_WRITE_RETRIES', '3'))
+# Check the stored statistics against a full rebuild on incremental syncs
+VERIFY_STATISTICS: bool = os.environ.get('VERIFY_STATISTICS', 'false').lower() == 'true'
+# Write books to Supabase page by page while the shelves are being scraped
+STREAM_BOOKS: bool = os.environ.get('STREAM_BOOKS', 'false').lower() == 'true'
+# Lean browser mode blocks images, media, fonts, stylesheets and third-party requests on the feed page
+FEED_LEAN_BROWSER: bool = os.environ.get('FEED_LEAN_BROWSER', 'true').lower() == 'true'
+# 'browser' extracts feed items inside the page, 'html' re-parses the rendered HTML with bs4
+FEED_EXTRACTION: str = os.environ.get('FEED_EXTRACTION', 'browser')
+# Caps on scrolling the feed back to the newest stored item
+FEED_MAX_ITEMS: int = int(os.environ.get('FEED_MAX_ITEMS', '200'))
+FEED_MAX_SECONDS: float = float(os.environ.get('FEED_MAX_SECONDS', '60'))
+# Where Goodreads is fetched from, e.g. a stand-in server from scripts/goodreads_standin.py
+GOODREADS_BASE_URL: str = os.environ.get('GOODREADS_BASE_URL', 'https://www.goodreads.com')
+# Record every Goodreads exchange of the run into this cassette file
+HTTP_RECORD_PATH: Optional[str] = os.environ.get('HTTP_RECORD_PATH')
+# Share of runs traced in Sentry, 0.0 to 1.0
+SENTRY_TRACES_SAMPLE_RATE: float = float(os.environ.get('SENTRY_TRACES_SAMPLE_RATE', '0.1'))
+# Per-phase timings and counters of each run, as JSON. Defaults to the output directory.
+RUN_REPORT_PATH: Optional[str] = os.environ.get('RUN_REPORT_PATH')
+# The same spans as OTLP/JSON, written to a file and/or sent to an OTLP/HTTP collector
+RUN_REPORT_OTLP_PATH: Optional[str] = os.environ.get('RUN_REPORT_OTLP_PATH')
+OTEL_EXPORTER_OTLP_TRACES_ENDPOINT: Optional[str] = os.environ.get('OTEL_EXPORTER_OTLP_TRACES_ENDPOINT')
+OTEL_EXPORTER_OTLP_HEADERS: Optional[str] = os.environ.get('OTEL_EXPORTER_OTLP_HEADERS')
+# Batch mode: a JSON list of {"user_id": ..., "cookie": ...} accounts scraped in one process
+GOODREADS_ACCOUNTS_FILE: Optional[str] = os.environ.get('GOODREADS_ACCOUNTS_FILE')
+# Accounts scraped at once in batch mode
+BATCH_CONCURRENCY: int = int(os.environ.get('BATCH_CONCURRENCY', '2'))
+# Persistent cache of shelf pages, unchanged pages are not parsed again. Disabled without a path.
+HTTP_CACHE_PATH: Optional[str] = os.environ.get('HTTP_CACHE_PATH')
+HTTP_CACHE_MAX_BYTES: int = int(os.environ.get('HTTP_CACHE_MAX_BYTES', '50000000'))
+HTTP_CACHE_TTL_HOURS: float = float(os.environ.get('HTTP_CACHE_TTL_HOURS', '168'))
+# Ignore the cached pages for one run, e.g. to force a full refresh. Fresh pages are still stored.
+HTTP_CACHE_BYPASS: bool = os.environ.get('HTTP_CACHE_BYPASS', 'false').lower() == 'true'
+# Bound on the Books memoized per shelf page row in the same file, unchanged rows are not parsed again
+ROW_MEMO_MAX_BYTES: int = int(os.environ.get('ROW_MEMO_MAX_BYTES', '20000000'))
@@ -0,0 +1,187 @@
+import re
+from collections import Counter
+from datetime import date, timedelta
+from typing import Dict, Iterable, List, Optional, Union
+
+from schemas import Book
+
+# Bump together with DASHBOARD_AGGREGATES_VERSION in client/lib/constants.ts
+# whenever the layout below changes. The dashboard ignores other versions.
+AGGREGATES_VERSION = 1
+
+# Feed rows the dashboard charts cover, newest first
+FEED_AGGREGATE_LIMIT = 2000
+FEED_MESSAGE_COUNT = 10
+FEED_MESSAGE_FIELDS = ('action', 'header_text', 'book_title', 'timestamp')
+
+TOP_AUTHOR_COUNT = 5
+TOP_FEED_BOOK_COUNT = 9
+COMMUNITY_BUCKETS = ('0-1', '1-2', '2-3', '3-4', '4-5')
+
+JS_DATE = re.compile(r'^(\d{4})(?:-(\d{1,2})(?:-(\d{1,2}))?)?$')
+
+def js_date(value: Optional[str]) -> Optional[date]:
+    """
+    Read a book date the way `new Date(value)` does in the dashboard: missing
+    month or day default to 1 and an overflowing day rolls into the next
+    month (2024-02-30 is March 1st). Returns None where JavaScript would get
+    an invalid date.
+    """
+    if not value:
+        return None
+    match = JS_DATE.match(value)
+    if not match:
+        return None
+    year, month, day = (int(part) if part else 1 for part in match.groups())
+    if not 1 <= month <= 12 or not 1 <= day <= 31:
+        return None
+    return date(year, month, 1) + timedelta(days=day - 1)
+
+def community_bucket(rating: float) -> Optional[str]:
+    if rating < 0 or rating > 5:
+        return None
+    for upper, bucket in enumerate(COMMUNITY_BUCKETS, start=1):
+        if rating <= upper:
+            return bucket
+    return None
+
+def book_aggregates(books: Iterable[Book]) -> Dict:
+    """The books side of the dashboard, in one pass over the library. See `BookAggregator`."""
+    aggregator = BookAggregator()
+    aggregator.add_all(books)
+    return aggregator.result()
+
+class BookAggregator:
+    """
+    Builds the books side of the dashboard from a library fed in with
+    `add_all`, a batch at a time and in library order, so the library never
+    has to be held whole.
+
+    Per-month series are returned oldest first as `[month, value]` pairs
+    covering every month, the dashboard picks the recent ones it shows.
+    """
+
+    def __init__(self):
+        self.monthly_read = Counter()
+        self.monthly_pages = Counter()
+        self.reading_time = []
+        self.shelf_counts = {'read': 0, 'to_read': 0, 'currently_reading': 0, 'other': 0}
+        self.authors = Counter()
+        self.heatmap = {rating: dict.fromkeys(COMMUNITY_BUCKETS, 0) for rating in range(1, 6)}
+        self.total_pages_read = 0
+        self.currently_reading = None
+        self.last_read = None
+        self.last_read_date = None
+
+    def add_all(self, books: Iterable[Book]):
+        shelf_counts = self.shelf_counts
+        for book in books:
+            date_read = js_date(book.date_read)
+            if date_read:
+                month = f'{date_read.year:04d}-{date_read.month:02d}'
+                self.monthly_read[month] += 1
+                if book.num_pages and book.num_pages > 0:
+                    self.monthly_pages[month] += book.num_pages
+
+            date_added = js_date(book.date_added)
+            if date_read and date_added:
+                # Inclusive, a book started and finished on the same day took 1 day
+                days_to_read = (date_read - date_added).days + 1
+                if days_to_read > 0:
+                    self.reading_time.append({'x': book.num_pages, 'y': days_to_read, 'title': book.title})
+
+            if book.shelf in shelf_counts:
+                shelf_counts[book.shelf] += 1
+            elif book.shelf:
+                shelf_counts['other'] += 1
+
+            if book.shelf == 'read':
+                self.total_pages_read += book.num_pages or 0
+                # Books without a read date sort as 1970, like `new Date(0)`
+                read_on = date_read or date(1970, 1, 1)
+                if self.last_read is None or read_on > self.last_read_date:
+                    self.last_read, self.last_read_date = book, read_on
+            elif book.shelf == 'currently_reading' and self.currently_reading is None:
+                self.currently_reading = book
+
+            if book.author:
+                self.authors[book.author] += 1
+
+            if book.rating is not None and book.avg_rating is not None and 1 <= book.rating <= 5:
+                bucket = community_bucket(book.avg_rating)
+                if bucket:
+                    self.heatmap[book.rating][bucket] += 1
+
+    def result(self) -> Dict:
+        reading_time = sorted(self.reading_time, key=lambda point: point['y'], reverse=True)
+        return {
+            'monthlyReading': sorted(self.monthly_read.items()),
+            'monthlyPages': sorted(self.monthly_pages.items()),
+            'readingTimeData': [{'id': 'Books', 'data': reading_time}],
+            'shelfCounts': dict(self.shelf_counts),
+            'topAuthors': [{'author': author, 'count': count}
+                           for author, count in self.authors.most_common(TOP_AUTHOR_COUNT)],
+            'ratingHeatmap': [
+                {'id': str(rating), 'data': [{'x': bucket, 'y': count} for bucket, count in buckets.items()]}
+                for rating, buckets in self.heatmap.items()
+            ],
+            'summary': {
+                'totalBooksRead': self.shelf_counts['read'],
+                'totalPagesRead': self.total_pages_read,
+                'tbrCount': self.shelf_counts['to_read'],
+                'currentlyReading': self.currently_reading.model_dump() if self.currently_reading else None,
+                'lastRead': self.last_read.model_dump() if self.last_read else None
+            }
+        }
+
+def feed_aggregates(feed_rows: List[Dict]) -> Dict:
+    """
+    The feed side of the dashboard from the newest feed rows, newest first.
+
+    Month activity is returned per action seen, the dashboard fills in the
+    actions it always charts.
+    """
+    actions = list(dict.fromkeys(row['action'] for row in feed_rows if row.get('action')))
+
+    titles = Counter(row['book_title'] for row in feed_rows if row.get('book_title'))
+    top_titles = [title for title, _ in titles.most_common(TOP_FEED_BOOK_COUNT)]
+    top_set = set(top_titles)
+
+    breakdown = {action: dict.fromkeys(top_titles + ['other'], 0) for action in actions}
+    days = Counter()
+    months: Dict[str, Counter] = {}
+    for row in feed_rows:
+        action, title, timestamp = row.get('action'), row.get('book_title'), row.get('timestamp')
+        if action and title:
+            breakdown[action][title if title in top_set else 'other'] += 1
+        if timestamp:
+            days[timestamp[:10]] += 1
+            month_counts = months.setdefault(timestamp[:7], Counter())
+            if action:
+                month_counts[action] += 1
+
+    return {
+        'actionBreakdown': [{'action': action, **counts} for action, counts in breakdown.items()],
+        'calendarData': [{'day': day, 'value': value} for day, value in days.items()],
+        'networkActivity': [{'month': month, 'counts': dict(counts)} for month, counts in months.items()],
+        'top10BookTitles': top_titles,
+        'feedMessageList': [
+            {field: row.get(field) for field in FEED_MESSAGE_FIELDS} for row in feed_rows[:FEED_MESSAGE_COUNT]
+        ]
+    }
+
+def build_dashboard_aggregates(books: Union[Iterable[Book], BookAggregator], feed_rows: Optional[List[Dict]],
+                               statistics: Optional[Dict] = None) -> Dict:
+    """
+    Everything the dashboard shows, precomputed so its build reads one small
+    row instead of the books and feed tables. `books` is the library, or a
+    `BookAggregator` it was already fed to. `feed_rows` are the newest rows
+    of the feed table, or None to leave the feed out.
+    """
+    books = books.result() if isinstance(books, BookAggregator) else book_aggregates(books)
+    aggregates = {'version': AGGREGATES_VERSION, 'books': books}
+    if feed_rows is not None:
+        aggregates['feed'] = feed_aggregates(feed_rows)
+    if statistics is not None:
+        aggregates['statistics'] = statistics
+    return aggregates
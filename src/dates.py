@@ -0,0 +1,100 @@
+import functools
+import re
+from datetime import date, datetime
+from typing import Dict, Iterable, List, Optional
+
+# The steps of Goodreads date normalization, in the order they apply
+WEEKDAY_PREFIX = re.compile(r'^\w+,\s*')
+TIME_SUFFIX = re.compile(r'\s+\d+:\d+(AM|PM)?$')
+DAY_YEAR = re.compile(r'^\d{1,2},\s*\d{4}$')
+MONTH_DAY_YEAR = re.compile(r'^([A-Za-z]{3,})\s+(\d{1,2}),\s+(\d{4})$')
+MONTH_YEAR = re.compile(r'^([A-Za-z]{3,})\s+(\d{4})$')
+
+# What strptime's %b and %B accept in the C locale, case-insensitively
+MONTHS = {
+    name.lower(): number
+    for number, names in enumerate(zip(
+        ('Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec'),
+        ('January', 'February', 'March', 'April', 'May', 'June', 'July', 'August',
+         'September', 'October', 'November', 'December')
+    ), start=1)
+    for name in names
+}
+
+def normalize_date(date_str: Optional[str]) -> Optional[str]:
+    """
+    Normalize a date as shown on Goodreads: 'Dec 5, 2020' becomes
+    '2020-12-05', 'Dec 2020' '2020-12' and '2020' stays '2020'. Unknown and
+    unset dates are None, anything else comes back stripped of a leading
+    weekday and a trailing time, or as-is when it isn't a real date.
+    """
+    if not date_str: return None
+    date_str = date_str.strip()
+    lowered = date_str.lower()
+    if 'unknown' in lowered or 'not set' in lowered: return None
+    date_str = WEEKDAY_PREFIX.sub('', date_str).strip()
+    date_str = TIME_SUFFIX.sub('', date_str).strip()
+
+    if DAY_YEAR.match(date_str):
+        year = date_str.split(',')[-1].strip()
+        return year if len(year) == 4 and year.isdigit() else None
+
+    match = MONTH_DAY_YEAR.match(date_str)
+    if match:
+        if not date_str.isascii():
+            # strptime reads non-ASCII digits differently in days and years
+            return _strptime(date_str, ("%b %d, %Y", "%B %d, %Y"), "%Y-%m-%d")
+        month = MONTHS.get(match.group(1).lower())
+        try:
+            return date(int(match.group(3)), month, int(match.group(2))).strftime("%Y-%m-%d") if month else date_str
+        except ValueError:
+            return date_str
+
+    match = MONTH_YEAR.match(date_str)
+    if match:
+        if not date_str.isascii():
+            return _strptime(date_str, ("%b %Y", "%B %Y"), "%Y-%m")
+        month = MONTHS.get(match.group(1).lower())
+        try:
+            return date(int(match.group(2)), month, 1).strftime("%Y-%m") if month else date_str
+        except ValueError:
+            return date_str
+
+    return date_str
+
+def _strptime(date_str: str, formats, output_format: str) -> str:
+    for date_format in formats:
+        try:
+            return datetime.strptime(date_str, date_format).strftime(output_format)
+        except ValueError:
+            continue
+    return date_str
+
+class DateNormalizer:
+    """
+    `normalize_date` behind a bounded memo. Goodreads shows a small set of
+    distinct date strings, so most calls are lookups. `normalize_many`
+    normalizes a batch, e.g. every date of a shelf page, at once.
+    Thread-safe.
+    """
+
+    def __init__(self, max_entries: int = 4096):
+        self.normalize = functools.lru_cache(maxsize=max_entries)(normalize_date)
+
+    def __call__(self, date_str: Optional[str]) -> Optional[str]:
+        return self.normalize(date_str)
+
+    def normalize_many(self, values: Iterable[Optional[str]]) -> List[Optional[str]]:
+        """The normalized `values`, in order. Repeated values are normalized once."""
+        normalize = self.normalize
+        normalized: Dict[Optional[str], Optional[str]] = {}
+        results = []
+        for value in values:
+            if value not in normalized:
+                normalized[value] = normalize(value)
+            results.append(normalized[value])
+        return results
+
+    def stats(self) -> Dict[str, int]:
+        info = self.normalize.cache_info()
+        return {'hits': info.hits, 'misses': info.misses, 'entries': info.currsize}
@@ -1,24 +1,58 @@
-from supabase import create_client, Client
-from typing import List, Dict, Optional
-from datetime import datetime
+from typing import TYPE_CHECKING, Any, Callable, Iterable, List, Dict, Optional, Tuple
+from datetime import datetime, timezone
 import dateutil.parser
+import hashlib
+import json
 import logging
+import threading
 
-from config import ENVIRONMENT, SUPABASE_KEY, SUPABASE_URL
-from schemas import Book, FeedActivity, ReadingChallenge
+from config import (
+    ENVIRONMENT, SUPABASE_KEY, SUPABASE_URL,
+    DB_WRITE_BATCH_ROWS, DB_WRITE_BATCH_BYTES, DB_WRITE_CONCURRENCY, DB_WRITE_RETRIES
+)
+from schemas import Book, FeedActivity, ReadingChallenge, dump_many, validate_many
+from write_pipeline import WriteResult, write_batches
+import telemetry
+
+if TYPE_CHECKING:
+    from supabase import Client
 
 logger = logging.getLogger(__name__)
 
-supabase: Optional[Client] = None
+supabase: Optional['Client'] = None
 
 BOOKS_TABLE_NAME = 'books'
 FEED_TABLE_NAME = 'feed'
 CHALLENGE_TABLE_NAME = 'reading_challenges' if ENVIRONMENT == 'production' else 'reading_challenges_dev'
 METADATA_TABLE_NAME = 'metadata' if ENVIRONMENT == 'production' else 'metadata_dev'
 
+STATISTICS_TABLE_NAME = 'statistics_state'
+DASHBOARD_TABLE_NAME = 'dashboard_aggregates'
+
 if ENVIRONMENT != 'production':
     BOOKS_TABLE_NAME = 'books_dev'
     FEED_TABLE_NAME = 'feed_dev'
+    STATISTICS_TABLE_NAME = 'statistics_state_dev'
+    DASHBOARD_TABLE_NAME = 'dashboard_aggregates_dev'
+
+# Rows fetched per request when reading whole tables
+SELECT_PAGE_SIZE = 1000
+# Never delete more than this share of a user's stored books in one run
+MAX_DELETE_FRACTION = 0.5
+# Part of every book content hash. Bump it to rewrite every stored book once,
+# e.g. after rows were stored incompletely.
+CONTENT_HASH_VERSION = 2
+# Left out of the content hash: the community average drifts between runs
+# without the user touching the book
+UNHASHED_BOOK_FIELDS = frozenset({'user_id', 'avg_rating'})
+# A book whose stored avg_rating is off by at least this much is rewritten anyway
+AVG_RATING_REFRESH_DELTA = 0.05
+# (content_hash, avg_rating) of a stored book
+StoredBook = Tuple[Optional[str], Optional[float]]
+# book_urls per delete request, they are sent in the query string
+DELETE_BATCH_ROWS = 50
+# The feed table's unique key, feed items already stored under it are skipped
+FEED_CONFLICT_COLUMNS = 'user_id,user_url,action,book_url,timestamp'
 
 def get_db_client():
     """Initializes and returns a Supabase client instance."""
@@ -31,24 +65,33 @@ def get_db_client():
         return None
     
     try:
-        supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
+        # Deferred until the first query, the client library takes a while to import
+        with telemetry.span('db.connect'):
+            from supabase import create_client
+            supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
         logger.info("Supabase client initialized.")
         return supabase
     except Exception as e:
         logger.exception("Failed to initialize Supabase client: %s", e)
         return None
 
-def get_feed_highwatermark() -> Optional[datetime]:
+@telemetry.traced('db.get_feed_highwatermark')
+def get_feed_highwatermark(user_id: Optional[str] = None) -> Optional[datetime]:
     """
     Fetches the most recent timestamp from the 'feed' table
-    to use as a high-water mark.
+    to use as a high-water mark. Pass `user_id` for the feed of one
+    account in batch mode.
     """
     client = get_db_client()
     if not client:
         return None
 
     try:
-        response = client.table(FEED_TABLE_NAME).select('timestamp').order('timestamp', desc=True).limit(1).execute()
+        query = client.table(FEED_TABLE_NAME).select('timestamp')
+        if user_id:
+            query = query.eq('user_id', user_id)
+        response = query.order('timestamp', desc=True).limit(1).execute()
+        telemetry.count(requests=1, rows=len(response.data or []))
         if response.data:
             hwm_string = response.data[0]['timestamp']
             hwm_date = dateutil.parser.isoparse(hwm_string)
@@ -61,103 +104,432 @@ def get_feed_highwatermark() -> Optional[datetime]:
         logger.exception("Error fetching feed high-water mark: %s", e)
         return None
 
-def upsert_books(book_records: List[Book]):
+@telemetry.traced('db.get_known_books')
+def get_known_books(user_id: str) -> Optional[Dict[str, Book]]:
+    """
+    Loads every stored book for a user, keyed by book_url, for incremental syncs.
+    Returns None if the books could not be loaded.
+    """
+    client = get_db_client()
+    if not client:
+        return None
+
+    try:
+        columns = ','.join(Book.model_fields)
+        known_books = {}
+        start = 0
+        while True:
+            response = (
+                client.table(BOOKS_TABLE_NAME).select(columns).eq('user_id', user_id)
+                .order('book_url').range(start, start + SELECT_PAGE_SIZE - 1).execute()
+            )
+            rows = response.data or []
+            telemetry.count(requests=1, rows=len(rows))
+            for book in validate_many(Book, rows):
+                if book and book.book_url:
+                    known_books[book.book_url] = book
+            if not rows:
+                break
+            start += len(rows)
+
+        logger.info("Loaded %s known books for user %s.", len(known_books), user_id)
+        return known_books
+    except Exception as e:
+        logger.exception("Error loading known books: %s", e)
+        return None
+
+def book_content_hash(book: Book) -> str:
     """
-    Upserts a list of book objects into the 'books' table.
+    Stable hash of a book's scraped content, used to skip rewriting unchanged rows.
+    user_id is left out since it is part of the row key, and avg_rating since
+    it drifts on its own, see AVG_RATING_REFRESH_DELTA.
     """
+    return _record_content_hash(book.model_dump())
+
+def _record_content_hash(record: Dict) -> str:
+    """`book_content_hash` of a book already dumped to `record`."""
+    content = {key: value for key, value in record.items() if key not in UNHASHED_BOOK_FIELDS}
+    return hashlib.sha256(
+        json.dumps([CONTENT_HASH_VERSION, content], sort_keys=True, default=str).encode('utf-8')
+    ).hexdigest()
+
+@telemetry.traced('db.get_book_hashes')
+def get_book_hashes(user_id: str) -> Optional[Dict[str, StoredBook]]:
+    """
+    Loads the stored content hash and avg_rating of every book for a user,
+    keyed by book_url. Returns None if the hashes could not be loaded.
+    """
+    client = get_db_client()
+    if not client:
+        return None
+
+    try:
+        hashes = {}
+        start = 0
+        while True:
+            response = (
+                client.table(BOOKS_TABLE_NAME).select('book_url,content_hash,avg_rating').eq('user_id', user_id)
+                .order('book_url').range(start, start + SELECT_PAGE_SIZE - 1).execute()
+            )
+            rows = response.data or []
+            telemetry.count(requests=1, rows=len(rows))
+            for row in rows:
+                hashes[row['book_url']] = (row.get('content_hash'), row.get('avg_rating'))
+            if not rows:
+                break
+            start += len(rows)
+        return hashes
+    except Exception as e:
+        logger.exception("Error loading book hashes: %s", e)
+        return None
+
+def _write(table: str, records: Iterable[Any], send: Callable[[List[Any]], Any],
+           max_rows: int = DB_WRITE_BATCH_ROWS) -> WriteResult:
+    """Runs a batched, retried write with the configured limits."""
+    result = write_batches(
+        table, records, send,
+        max_rows=max_rows, max_bytes=DB_WRITE_BATCH_BYTES,
+        concurrency=DB_WRITE_CONCURRENCY, max_retries=DB_WRITE_RETRIES
+    )
+    # Batches are sent from a thread pool, outside the caller's span, so count here
+    attempts = sum(batch.attempts for batch in result.batches)
+    telemetry.count(
+        requests=attempts, rows=result.rows_written,
+        bytes=sum(batch.bytes for batch in result.batches if batch.ok),
+        retries=attempts - len(result.batches)
+    )
+    return result
+
+@telemetry.traced('db.upsert_books')
+def upsert_books(book_records: List[Book], delete_missing: bool = False) -> WriteResult:
+    """
+    Writes a user's scraped books to the 'books' table, skipping unchanged rows.
+
+    Each book's content hash is compared with the stored one, and only new
+    or changed books are upserted. With `delete_missing`, stored books that
+    are no longer on any shelf are deleted. Only pass it for a full scrape.
+    The result's stats hold inserted/updated/refreshed/unchanged/deleted counts.
+    """
+    counts = {'inserted': 0, 'updated': 0, 'refreshed': 0, 'unchanged': 0, 'deleted': 0}
     if not book_records:
         logger.info("No book records to upsert.")
-        return
+        return WriteResult(BOOKS_TABLE_NAME, stats=counts)
 
     client = get_db_client()
     if not client:
-        return
+        return WriteResult(BOOKS_TABLE_NAME, stats=counts, error="No database client")
 
-    try:
-        logger.info("Attempting to upsert %s book records...", len(book_records))
+    user_id = book_records[0].user_id
+    existing_hashes = get_book_hashes(user_id)
+    if existing_hashes is None:
+        logger.warning("Could not load stored book hashes. Upserting every book.")
 
-        records_to_upsert = [
-            book.model_dump(exclude_none=True) for book in book_records
-        ]
+    logger.info("Attempting to upsert changed books out of %s book records...", len(book_records))
+    result = _upsert_changed_books(client, book_records, existing_hashes, counts)
 
-        response = client.table(BOOKS_TABLE_NAME).upsert(records_to_upsert, on_conflict='user_id,book_url').execute()
-        
-        if response.data:
-            logger.info("Successfully upserted %s book records.", len(response.data))
-        else:
-            logger.warning("Supabase upsert returned no data. Check response: %s", response.error)
-            
-    except Exception as e:
-        logger.exception("Error upserting book data: %s", e)
+    if delete_missing and existing_hashes is not None and result.ok:
+        scraped_urls = {book.book_url for book in book_records}
+        delete_result = delete_missing_books(user_id, existing_hashes.keys(), scraped_urls)
+        counts['deleted'] = delete_result.rows_written
+        result.batches.extend(delete_result.batches)
+
+    result.stats = counts
+    _log_books_sync(counts)
+    return result
+
+def _upsert_changed_books(client, book_records: Iterable[Book],
+                          existing_hashes: Optional[Dict[str, StoredBook]],
+                          counts: Dict[str, int]) -> WriteResult:
+    """
+    Upserts the books whose content hash differs from `existing_hashes`,
+    tallying into `counts`. New and changed books only count as inserted
+    or updated once their batch has been written. Books the user didn't
+    change are still rewritten, as refreshed, once their community
+    avg_rating has drifted by AVG_RATING_REFRESH_DELTA.
+    """
+    # 'inserted', 'updated' or 'refreshed' for each row not written yet, by book_url
+    pending: Dict[str, List[str]] = {}
+    lock = threading.Lock()
+
+    def changed_records():
+        # One dump for the whole list, both the hash and the row are built from it
+        for full_record in dump_many(book_records):
+            content_hash = _record_content_hash(full_record)
+            book_url = full_record['book_url']
+            if existing_hashes is None or book_url not in existing_hashes:
+                kind = 'inserted'
+            elif existing_hashes[book_url][0] != content_hash:
+                kind = 'updated'
+            elif _avg_rating_drifted(existing_hashes[book_url][1], full_record['avg_rating']):
+                kind = 'refreshed'
+            else:
+                counts['unchanged'] += 1
+                continue
+            with lock:
+                pending.setdefault(book_url, []).append(kind)
+            # Every column, None included: a batch's columns come from its own rows,
+            # so a field left out would keep its stale stored value
+            full_record['content_hash'] = content_hash
+            yield full_record
+
+    def send(batch: List[Dict]):
+        client.table(BOOKS_TABLE_NAME).upsert(batch, on_conflict='user_id,book_url').execute()
+        with lock:
+            for record in batch:
+                kinds = pending[record['book_url']]
+                counts[kinds.pop()] += 1
+                if not kinds:
+                    del pending[record['book_url']]
+
+    return _write(BOOKS_TABLE_NAME, changed_records(), send)
+
+def _avg_rating_drifted(stored: Optional[float], scraped: Optional[float]) -> bool:
+    if stored is None or scraped is None:
+        return stored != scraped
+    return abs(stored - scraped) >= AVG_RATING_REFRESH_DELTA
+
+def _log_books_sync(counts: Dict[str, int]):
+    logger.info(
+        "Books sync: %s inserted, %s updated, %s refreshed, %s unchanged, %s deleted.",
+        counts['inserted'], counts['updated'], counts['refreshed'], counts['unchanged'], counts['deleted']
+    )
+
+class BookPageWriter:
+    """
+    Writes books page by page while the shelves are still being scraped,
+    so every page that has been parsed is already stored if the run dies.
+
+    The stored hashes are loaded once up front and every page goes through
+    the same changed-rows-only upsert as `upsert_books`. Only the book URLs
+    are kept between pages, for `finish` to delete books no longer on any shelf.
+    """
+
+    def __init__(self, user_id: str):
+        self.user_id = user_id
+        self.counts = {'inserted': 0, 'updated': 0, 'refreshed': 0, 'unchanged': 0, 'deleted': 0}
+        self.result = WriteResult(BOOKS_TABLE_NAME, stats=self.counts)
+        self.scraped_urls = set()
+
+        self.client = get_db_client()
+        self.existing_hashes = None
+        if not self.client:
+            self.result.error = "No database client"
+            return
+        self.existing_hashes = get_book_hashes(user_id)
+        if self.existing_hashes is None:
+            logger.warning("Could not load stored book hashes. Upserting every book.")
+
+    @telemetry.traced('db.BookPageWriter.write_page')
+    def write_page(self, book_records: List[Book]):
+        """Upserts the changed books of one shelf page."""
+        if not self.client or not book_records:
+            return
+        for book in book_records:
+            book.user_id = self.user_id
+            self.scraped_urls.add(book.book_url)
+        page_result = _upsert_changed_books(self.client, book_records, self.existing_hashes, self.counts)
+        self.result.batches.extend(page_result.batches)
+
+    @telemetry.traced('db.BookPageWriter.finish')
+    def finish(self, delete_missing: bool = False) -> WriteResult:
+        """
+        Wraps up the run and returns the combined result of every page.
+        `delete_missing` has the same meaning as for `upsert_books`.
+        """
+        if delete_missing and self.existing_hashes is not None and self.scraped_urls and self.result.ok:
+            delete_result = delete_missing_books(self.user_id, self.existing_hashes.keys(), self.scraped_urls)
+            self.counts['deleted'] = delete_result.rows_written
+            self.result.batches.extend(delete_result.batches)
+
+        _log_books_sync(self.counts)
+        return self.result
+
+@telemetry.traced('db.delete_missing_books')
+def delete_missing_books(user_id: str, stored_urls, scraped_urls) -> WriteResult:
+    """
+    Deletes the user's stored books whose book_url is not in `scraped_urls`.
+    Refuses to delete more than MAX_DELETE_FRACTION of the stored books, since
+    that points to a broken scrape rather than a cleared-out library. The URLs
+    go into the request's query string, so they are sent DELETE_BATCH_ROWS at
+    a time.
+    """
+    stored_urls = set(stored_urls)
+    missing_urls = sorted(stored_urls - set(scraped_urls))
+    if not missing_urls:
+        return WriteResult(BOOKS_TABLE_NAME)
+
+    if len(missing_urls) > MAX_DELETE_FRACTION * len(stored_urls):
+        logger.warning(
+            "Refusing to delete %s of %s stored books. The scrape looks incomplete.",
+            len(missing_urls), len(stored_urls)
+        )
+        return WriteResult(BOOKS_TABLE_NAME)
+
+    client = get_db_client()
+    if not client:
+        return WriteResult(BOOKS_TABLE_NAME, error="No database client")
+
+    def send(batch: List[str]):
+        client.table(BOOKS_TABLE_NAME).delete().eq('user_id', user_id).in_('book_url', batch).execute()
 
-def insert_feed_items(feed_records: List[FeedActivity]):
+    result = _write(BOOKS_TABLE_NAME, missing_urls, send, max_rows=DELETE_BATCH_ROWS)
+    logger.info("Deleted %s books that are no longer on any shelf.", result.rows_written)
+    return result
+
+@telemetry.traced('db.insert_feed_items')
+def insert_feed_items(feed_records: List[FeedActivity]) -> WriteResult:
     """
-    Inserts a list of new feed item records into the 'feed' table.
+    Inserts a list of new feed item records into the 'feed' table. Items
+    already stored are skipped (ON CONFLICT DO NOTHING), so a batch that
+    overlaps the stored feed still inserts the rest of its items.
     """
     if not feed_records:
         logger.info("No new feed items to insert.")
-        return
+        return WriteResult(FEED_TABLE_NAME)
         
     client = get_db_client()
     if not client:
-        return
-        
-    try:
-        records_to_insert = [
-            item.model_dump(exclude_none=True) for item in feed_records
-        ]
+        return WriteResult(FEED_TABLE_NAME, error="No database client")
 
-        if not records_to_insert:
-            logger.info("No new feed items to insert after filtering.")
-            return
+    def send(batch: List[Dict]):
+        client.table(FEED_TABLE_NAME).upsert(
+            batch, on_conflict=FEED_CONFLICT_COLUMNS, ignore_duplicates=True
+        ).execute()
 
-        logger.info("Attempting to insert %s new feed items...", len(records_to_insert))
-        # Pass the list of dictionaries to insert
-        response = client.table(FEED_TABLE_NAME).insert(records_to_insert).execute()
-        
-        if response.data:
-            logger.info("Successfully inserted %s feed items.", len(response.data))
-        else:
-            logger.warning("Supabase insert returned no data. Check response: %s", response.error)
-            
-    except Exception as e:
-        if "duplicate key value" in str(e):
-             logger.warning("Some feed items were duplicates and were ignored, as expected.")
-        else:
-            logger.exception("Error inserting feed data: %s", e)
+    logger.info("Attempting to insert %s new feed items...", len(feed_records))
+    return _write(FEED_TABLE_NAME, dump_many(feed_records, exclude_none=True), send)
 
-def upsert_reading_challenge(challenge: ReadingChallenge):
+@telemetry.traced('db.upsert_reading_challenge')
+def upsert_reading_challenge(challenge: ReadingChallenge) -> WriteResult:
     """
     Upserts the reading challenge status for the current year.
     """
     client = get_db_client()
     if not client:
-        return
+        return WriteResult(CHALLENGE_TABLE_NAME, error="No database client")
+
+    def send(batch: List[Dict]):
+        client.table(CHALLENGE_TABLE_NAME).upsert(batch).execute()
+
+    result = _write(CHALLENGE_TABLE_NAME, [challenge.model_dump(exclude_none=True)], send)
+    if result.ok:
+        logger.info("Successfully updated reading challenge for %s.", challenge.year)
+    return result
+
+@telemetry.traced('db.get_statistics_state')
+def get_statistics_state(user_id: str) -> Optional[Dict]:
+    """
+    Reads the stored statistics aggregates of a user, or None if there are none.
+    """
+    client = get_db_client()
+    if not client:
+        return None
 
     try:
-        data = challenge.model_dump(exclude_none=True)
-        response = client.table(CHALLENGE_TABLE_NAME).upsert(data).execute()
-        
+        response = client.table(STATISTICS_TABLE_NAME).select('state').eq('user_id', user_id).limit(1).execute()
+        telemetry.count(requests=1, rows=len(response.data or []))
         if response.data:
-            logger.info("Successfully updated reading challenge for %s.", challenge.year)
-        else:
-            logger.warning("Supabase challenge upsert returned no data: %s", response.error)
+            return response.data[0]['state']
+        return None
+    except Exception as e:
+        logger.error("Error reading statistics state: %s", e)
+        return None
+
+@telemetry.traced('db.save_statistics_state')
+def save_statistics_state(user_id: str, state: Dict) -> WriteResult:
+    """
+    Stores the statistics aggregates of a user, replacing the previous ones.
+    """
+    client = get_db_client()
+    if not client:
+        return WriteResult(STATISTICS_TABLE_NAME, error="No database client")
+
+    def send(batch: List[Dict]):
+        client.table(STATISTICS_TABLE_NAME).upsert(batch, on_conflict='user_id').execute()
+
+    record = {'user_id': user_id, 'state': state, 'updated_at': datetime.now(timezone.utc).isoformat()}
+    result = _write(STATISTICS_TABLE_NAME, [record], send)
+    if result.ok:
+        logger.info("Saved statistics state for user %s.", user_id)
+    return result
 
+@telemetry.traced('db.get_recent_feed')
+def get_recent_feed(limit: int, columns: str = 'action, header_text, book_title, timestamp',
+                    user_id: Optional[str] = None) -> Optional[List[Dict]]:
+    """
+    Reads the newest `limit` rows of the feed table, newest first, or None
+    if they could not be read. Pass `user_id` for the feed of one account
+    in batch mode.
+    """
+    client = get_db_client()
+    if not client:
+        return None
+
+    try:
+        query = client.table(FEED_TABLE_NAME).select(columns)
+        if user_id:
+            query = query.eq('user_id', user_id)
+        response = query.order('timestamp', desc=True).limit(limit).execute()
+        telemetry.count(requests=1, rows=len(response.data or []))
+        return response.data or []
     except Exception as e:
-        logger.exception("Error upserting reading challenge: %s", e)
+        logger.error("Error reading recent feed items: %s", e)
+        return None
 
-def set_system_metadata(key: str, value: str):
+@telemetry.traced('db.upsert_dashboard_aggregates')
+def upsert_dashboard_aggregates(user_id: str, aggregates: Dict) -> WriteResult:
     """
-    Updates a key-value pair in the metadata table.
+    Stores the precomputed dashboard aggregates of a user, replacing the previous ones.
+    """
+    client = get_db_client()
+    if not client:
+        return WriteResult(DASHBOARD_TABLE_NAME, error="No database client")
+
+    def send(batch: List[Dict]):
+        client.table(DASHBOARD_TABLE_NAME).upsert(batch, on_conflict='user_id').execute()
+
+    record = {
+        'user_id': user_id, 'version': aggregates.get('version'), 'data': aggregates,
+        'updated_at': datetime.now(timezone.utc).isoformat()
+    }
+    result = _write(DASHBOARD_TABLE_NAME, [record], send)
+    if result.ok:
+        logger.info("Saved dashboard aggregates for user %s.", user_id)
+    return result
+
+@telemetry.traced('db.get_system_metadata')
+def get_system_metadata(key: str) -> Optional[str]:
+    """
+    Reads a value from the metadata table, or None if it is not set.
     """
     client = get_db_client()
     if not client:
-        return
+        return None
 
     try:
+        response = client.table(METADATA_TABLE_NAME).select('value').eq('key', key).limit(1).execute()
+        telemetry.count(requests=1, rows=len(response.data or []))
+        if response.data:
+            return response.data[0]['value']
+        return None
+    except Exception as e:
+        logger.error("Error reading system metadata: %s", e)
+        return None
+
+@telemetry.traced('db.set_system_metadata')
+def set_system_metadata(key: str, value: str) -> WriteResult:
+    """
+    Updates a key-value pair in the metadata table.
+    """
+    client = get_db_client()
+    if not client:
+        return WriteResult(METADATA_TABLE_NAME, error="No database client")
+
+    def send(batch: List[Dict]):
         # Simple upsert: if key exists, update value; if not, insert.
-        data = {"key": key, "value": value}
-        client.table(METADATA_TABLE_NAME).upsert(data).execute()
+        client.table(METADATA_TABLE_NAME).upsert(batch).execute()
+
+    result = _write(METADATA_TABLE_NAME, [{"key": key, "value": value}], send)
+    if result.ok:
         logger.info("Updated system metadata: %s", key)
-    except Exception as e:
-        logger.error("Error updating system metadata: %s", e)
\ No newline at end of file
+    return result
@@ -0,0 +1,281 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, Optional
+
+from schemas import Book, dump_many
+
+logger = logging.getLogger(__name__)
+
+# Bump when the stored page results change shape, or the shelf parsers
+# start reading pages differently. Entries of other versions are misses.
+CACHE_VERSION = 1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS pages (
+    user_id TEXT NOT NULL,
+    url TEXT NOT NULL,
+    version INTEGER NOT NULL,
+    etag TEXT,
+    last_modified TEXT,
+    body_hash TEXT NOT NULL,
+    result TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    stored_at REAL NOT NULL,
+    used_at REAL NOT NULL,
+    PRIMARY KEY (user_id, url)
+);
+CREATE TABLE IF NOT EXISTS rows (
+    shelf TEXT NOT NULL,
+    row_hash TEXT NOT NULL,
+    version INTEGER NOT NULL,
+    book TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    stored_at REAL NOT NULL,
+    used_at REAL NOT NULL,
+    PRIMARY KEY (shelf, row_hash)
+);
+"""
+
+# Stands for "not memoized", a memoized row may be None when it had no book
+_MISSING = object()
+
+def body_hash(content: bytes) -> str:
+    return hashlib.sha256(content).hexdigest()
+
+class PageCache:
+    """
+    Persistent cache of Goodreads pages and what was parsed from them, in
+    a SQLite file, keyed by user and URL.
+
+    An entry keeps the page's ETag and Last-Modified validators, a hash of
+    its body and the parse result (JSON-serializable). `validators` gives
+    the headers of a conditional request for a cached page. When the page
+    comes back as a 304, or with a body identical to the cached one, the
+    stored result is reused and the page isn't parsed again.
+
+    Entries expire `ttl` seconds after they were last parsed, 304s don't
+    extend that, so every page is re-parsed once in a while. The stored
+    results are kept under `max_bytes` by evicting the least recently used
+    entries. With `bypass` cached entries are never used, but fresh pages
+    are still stored, e.g. to force a full refresh.
+
+    Changed pages are still mostly made of unchanged rows. `rows` is a
+    `RowMemo` in the same file, which lets the shelf parsers skip those.
+
+    Thread-safe, one connection is shared behind a lock.
+    """
+
+    def __init__(self, path: str, max_bytes: int = 50_000_000, ttl: float = 7 * 24 * 3600, bypass: bool = False,
+                 row_max_bytes: int = 20_000_000):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.bypass = bypass
+        self._lock = threading.Lock()
+        self._counts = dict.fromkeys(('not_modified', 'unchanged', 'misses', 'stored', 'evicted'), 0)
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        # Commits come per page, WAL without an fsync on each keeps them cheap and the file intact
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(SCHEMA)
+        with self._db:
+            expired = self._db.execute(
+                "DELETE FROM pages WHERE stored_at < ? OR version != ?", (time.time() - ttl, CACHE_VERSION)
+            ).rowcount
+            # max_bytes may have been lowered since the last run
+            self._evict()
+        if expired:
+            logger.info("Dropped %s expired pages from the HTTP cache", expired)
+        self.rows = RowMemo(self._db, self._lock, max_bytes=row_max_bytes, ttl=ttl, bypass=bypass)
+
+    def lookup(self, user_id: str, url: str) -> Optional[Dict]:
+        """The cached entry of a page, or None. Always None when bypassing."""
+        if self.bypass:
+            return None
+        with self._lock:
+            row = self._db.execute(
+                "SELECT etag, last_modified, body_hash, result FROM pages "
+                "WHERE user_id = ? AND url = ? AND version = ? AND stored_at >= ?",
+                (user_id, url, CACHE_VERSION, time.time() - self.ttl)
+            ).fetchone()
+        if row is None:
+            return None
+        etag, last_modified, stored_hash, result = row
+        return {'etag': etag, 'last_modified': last_modified, 'body_hash': stored_hash, 'result': result}
+
+    @staticmethod
+    def validators(entry: Optional[Dict]) -> Dict[str, str]:
+        """Conditional request headers for a cached entry."""
+        headers = {}
+        if entry and entry['etag']:
+            headers['If-None-Match'] = entry['etag']
+        if entry and entry['last_modified']:
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def reuse(self, user_id: str, url: str, entry: Dict, not_modified: bool) -> Dict:
+        """
+        The stored result of `entry`, after a 304 (`not_modified`) or a body
+        matching the stored hash. Marks the entry as recently used.
+        """
+        with self._lock:
+            self._counts['not_modified' if not_modified else 'unchanged'] += 1
+            with self._db:
+                self._db.execute("UPDATE pages SET used_at = ? WHERE user_id = ? AND url = ?",
+                                 (time.time(), user_id, url))
+        return json.loads(entry['result'])
+
+    def store(self, user_id: str, url: str, headers, content_hash: str, result: Dict):
+        """Store a freshly parsed page, then evict down to `max_bytes`."""
+        serialized = json.dumps(result)
+        now = time.time()
+        with self._lock:
+            self._counts['misses'] += 1
+            with self._db:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (user_id, url, CACHE_VERSION, headers.get('ETag'), headers.get('Last-Modified'),
+                     content_hash, serialized, len(serialized), now, now)
+                )
+                self._counts['stored'] += 1
+                self._evict()
+
+    def _evict(self):
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM pages").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for user_id, url, size in self._db.execute(
+            "SELECT user_id, url, size FROM pages ORDER BY used_at"
+        ).fetchall():
+            self._db.execute("DELETE FROM pages WHERE user_id = ? AND url = ?", (user_id, url))
+            self._counts['evicted'] += 1
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    def stats(self) -> Dict[str, int]:
+        """`not_modified` and `unchanged` pages reused their stored result, `misses` were parsed."""
+        with self._lock:
+            return dict(self._counts)
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+class RowMemo:
+    """
+    Books parsed from single shelf page rows, keyed by shelf and a hash of
+    the row's HTML. A row seen before, on any page, gives back the Book
+    built from it last time instead of being extracted and validated again.
+    Rows without a book are memoized as None. The key includes the shelf
+    since the parsers set `Book.shelf`, and read some dates, by shelf.
+
+    Lives in the `PageCache` file and shares its connection, lock, `ttl`
+    and `bypass`, with its own `max_bytes` bound and LRU eviction. Books
+    read from the file are kept in memory for the rest of the process.
+    Callers get copies, so setting e.g. `user_id` on them is fine.
+    """
+
+    def __init__(self, db: sqlite3.Connection, lock: threading.Lock, max_bytes: int = 20_000_000,
+                 ttl: float = 7 * 24 * 3600, bypass: bool = False):
+        self._db = db
+        self._lock = lock
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.bypass = bypass
+        self._books: Dict[tuple, Optional[Book]] = {}
+        self._counts = dict.fromkeys(('hits', 'misses', 'stored', 'evicted'), 0)
+        with self._lock, self._db:
+            expired = self._db.execute(
+                "DELETE FROM rows WHERE stored_at < ? OR version != ?", (time.time() - ttl, CACHE_VERSION)
+            ).rowcount
+            self._evict()
+        if expired:
+            logger.info("Dropped %s expired rows from the row memo", expired)
+
+    @staticmethod
+    def key(row_html: bytes) -> str:
+        return body_hash(row_html)
+
+    def lookup(self, shelf: str, keys: Iterable[str]) -> Dict[str, Optional[Book]]:
+        """The memoized Books of the rows in `keys` that have one, by key. Empty when bypassing."""
+        keys = list(dict.fromkeys(keys))
+        if self.bypass or not keys:
+            with self._lock:
+                self._counts['misses'] += len(keys)
+            return {}
+
+        found = {}
+        with self._lock:
+            unloaded = []
+            for key in keys:
+                book = self._books.get((shelf, key), _MISSING)
+                if book is _MISSING:
+                    unloaded.append(key)
+                else:
+                    found[key] = book
+            if unloaded:
+                stored = self._db.execute(
+                    f"SELECT row_hash, book FROM rows WHERE shelf = ? AND version = ? AND stored_at >= ? "
+                    f"AND row_hash IN ({', '.join('?' * len(unloaded))})",
+                    (shelf, CACHE_VERSION, time.time() - self.ttl, *unloaded)
+                ).fetchall()
+                for key, book in stored:
+                    found[key] = self._books[(shelf, key)] = Book.model_validate_json(book) if book != 'null' else None
+            if found:
+                with self._db:
+                    now = time.time()
+                    self._db.executemany("UPDATE rows SET used_at = ? WHERE shelf = ? AND row_hash = ?",
+                                         [(now, shelf, key) for key in found])
+            self._counts['hits'] += len(found)
+            self._counts['misses'] += len(keys) - len(found)
+        return {key: book.model_copy() if book is not None else None for key, book in found.items()}
+
+    def store(self, shelf: str, books: Dict[str, Optional[Book]]):
+        """Memoize freshly parsed rows, Books or None by key, then evict down to `max_bytes`."""
+        if not books:
+            return
+        now = time.time()
+        dumped = iter(dump_many(book for book in books.values() if book is not None))
+        entries = []
+        for key, book in books.items():
+            serialized = json.dumps(next(dumped) if book is not None else None)
+            entries.append((shelf, key, CACHE_VERSION, serialized, len(serialized), now, now))
+        with self._lock:
+            for key, book in books.items():
+                self._books[(shelf, key)] = book.model_copy() if book is not None else None
+            with self._db:
+                self._db.executemany("INSERT OR REPLACE INTO rows VALUES (?, ?, ?, ?, ?, ?, ?)", entries)
+                self._counts['stored'] += len(entries)
+                self._evict()
+
+    def _evict(self):
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM rows").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for shelf, key, size in self._db.execute(
+            "SELECT shelf, row_hash, size FROM rows ORDER BY used_at"
+        ).fetchall():
+            self._db.execute("DELETE FROM rows WHERE shelf = ? AND row_hash = ?", (shelf, key))
+            self._books.pop((shelf, key), None)
+            self._counts['evicted'] += 1
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    def stats(self) -> Dict:
+        """`hits` rows reused a memoized Book, `misses` were parsed, and the share of hits as `hit_rate`."""
+        with self._lock:
+            counts = dict(self._counts)
+        looked_up = counts['hits'] + counts['misses']
+        counts['hit_rate'] = round(counts['hits'] / looked_up, 3) if looked_up else None
+        return counts
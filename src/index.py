@@ -1,111 +1,410 @@
 import logging
+import os
 import sys
+import json
 import asyncio
 import dateutil.parser
+from dataclasses import dataclass
 from datetime import datetime, timezone, timedelta
+from typing import List, Optional, Tuple
 
-from config import GOODREADS_COOKIE, GOODREADS_USER_ID, ENVIRONMENT
-from utils import setup_logging, save_output_files_locally
-from katalog import Katalog
+from requests.adapters import HTTPAdapter
+
+from config import (
+    GOODREADS_COOKIE, GOODREADS_USER_ID, ENVIRONMENT, SCRAPE_CONCURRENCY,
+    GOODREADS_RATE_LIMIT, GOODREADS_MAX_RATE_LIMIT, SHELF_PARSER,
+    SYNC_MODE, FULL_SYNC_INTERVAL_DAYS, DELETE_MISSING_BOOKS, STREAM_BOOKS, VERIFY_STATISTICS,
+    FEED_LEAN_BROWSER, FEED_EXTRACTION, FEED_MAX_ITEMS, FEED_MAX_SECONDS,
+    GOODREADS_BASE_URL, HTTP_RECORD_PATH, RUN_REPORT_PATH, RUN_REPORT_OTLP_PATH,
+    OTEL_EXPORTER_OTLP_TRACES_ENDPOINT, OTEL_EXPORTER_OTLP_HEADERS,
+    GOODREADS_ACCOUNTS_FILE, BATCH_CONCURRENCY,
+    HTTP_CACHE_PATH, HTTP_CACHE_MAX_BYTES, HTTP_CACHE_TTL_HOURS, HTTP_CACHE_BYPASS, ROW_MEMO_MAX_BYTES
+)
+from utils import init_sentry, setup_logging, save_output_files_locally, get_output_dir
+from katalog import Katalog, SharedBrowser
+from cassettes import Cassette, RecordingAdapter
+from http_cache import PageCache
+from dashboard import FEED_AGGREGATE_LIMIT, BookAggregator, build_dashboard_aggregates
+from rate_limiter import AdaptiveRateLimiter
 import db_client
+import telemetry
 from schemas import ReadingChallenge
 
-async def main():
-    setup_logging() # Run the setup
-    
-    # Get secrets from environment
+class SyncFailed(Exception):
+    """A sync that must fail the job: nothing scraped, an invalid session or a failed write."""
 
-    if not GOODREADS_COOKIE or not GOODREADS_USER_ID:
-        logging.critical("GOODREADS_COOKIE or GOODREADS_USER_ID not set. Exiting.")
-        return
+@dataclass
+class AccountResult:
+    """Outcome of syncing one account in batch mode."""
+    user_id: str
+    ok: bool = False
+    error: Optional[str] = None
+    duration: float = 0.0
+
+def metadata_key(key: str, user_id: Optional[str] = None) -> str:
+    """Sync bookkeeping is kept per account in batch mode, as `key:user_id`."""
+    return f"{key}:{user_id}" if user_id else key
 
-    scraper = Katalog(GOODREADS_COOKIE, GOODREADS_USER_ID)
+def should_run_full_sync(account: Optional[str] = None) -> bool:
+    """Decide between a full and an incremental books sync based on SYNC_MODE."""
+    if SYNC_MODE == 'full':
+        return True
+    if SYNC_MODE == 'incremental':
+        return False
+
+    last_full_sync = db_client.get_system_metadata(metadata_key("last_full_sync", account))
+    if not last_full_sync:
+        logging.info("No previous full sync recorded. Running a full sync.")
+        return True
 
     try:
-        data = await scraper.scrape()
+        last_full_sync_time = dateutil.parser.isoparse(last_full_sync)
+    except ValueError:
+        logging.warning(f"Could not parse last_full_sync '{last_full_sync}'. Running a full sync.")
+        return True
+    if last_full_sync_time.tzinfo is None:
+        last_full_sync_time = last_full_sync_time.replace(tzinfo=timezone.utc)
 
-        # Validate that we actually got data before we try to save it.
-        # If selectors break, these lists will be empty.
-        total_books = len(data.get('books', {}).get('all_books', []))
-        feed_count = len(data.get('feed_activity', []))
+    if datetime.now(timezone.utc) - last_full_sync_time >= timedelta(days=FULL_SYNC_INTERVAL_DAYS):
+        logging.info(f"Last full sync was on {last_full_sync}. Running a full sync.")
+        return True
+    return False
 
-        # Check Books
-        if total_books == 0:
-            logging.error("Health check failed: Scraped 0 books. Goodreads DOM likely changed.")
-            sys.exit(1)
+def load_statistics_state(user_id: str, account: Optional[str] = None):
+    """
+    The stored statistics state, if it was saved by the last successful run.
+    A state saved by an earlier run has missed the changes since then.
+    """
+    statistics_state = db_client.get_statistics_state(user_id)
+    if not statistics_state:
+        return None
+    if statistics_state.get('synced_at') != db_client.get_system_metadata(metadata_key("last_refreshed", account)):
+        logging.info("Stored statistics are out of date. Rebuilding them.")
+        return None
+    return statistics_state
+
+def open_page_cache() -> Optional[PageCache]:
+    """The shelf page cache at HTTP_CACHE_PATH, or None without one or if it can't be opened."""
+    if not HTTP_CACHE_PATH:
+        return None
+    try:
+        return PageCache(
+            HTTP_CACHE_PATH, max_bytes=HTTP_CACHE_MAX_BYTES,
+            ttl=HTTP_CACHE_TTL_HOURS * 3600, bypass=HTTP_CACHE_BYPASS, row_max_bytes=ROW_MEMO_MAX_BYTES
+        )
+    except Exception as e:
+        logging.warning(f"Could not open the HTTP cache at {HTTP_CACHE_PATH}, running without it: {e}")
+        return None
+
+def build_scraper(cookie: str, user_id: str, rate_limiter: AdaptiveRateLimiter, **kwargs) -> Katalog:
+    return Katalog(
+        cookie, user_id,
+        max_concurrency=SCRAPE_CONCURRENCY, rate_limiter=rate_limiter,
+        shelf_parser=SHELF_PARSER, lean_browser=FEED_LEAN_BROWSER,
+        feed_extraction=FEED_EXTRACTION, feed_max_items=FEED_MAX_ITEMS,
+        feed_max_seconds=FEED_MAX_SECONDS, base_url=GOODREADS_BASE_URL, **kwargs
+    )
+
+async def sync_account(scraper: Katalog, batch: bool = False):
+    """
+    Scrape one account and write it to Supabase. Raises SyncFailed when
+    the job should fail. In `batch` mode the feed rows and the sync
+    bookkeeping in the metadata table are kept per account.
+    """
+    user_id = scraper.user_id
+    account = user_id if batch else None
+
+    full_sync = should_run_full_sync(account)
+    known_books = None
+    statistics_state = None
+    if not full_sync:
+        known_books = db_client.get_known_books(user_id)
+        if not known_books:
+            logging.info("No known books available. Falling back to a full sync.")
+            full_sync = True
+            known_books = None
         else:
-            logging.info(f"Health check passed: Found {total_books} books.")
+            # Full syncs rebuild the statistics, incremental ones update the stored state
+            statistics_state = load_statistics_state(user_id, account)
+    logging.info(f"Running a {'full' if full_sync else 'incremental'} books sync for {user_id}.")
+    telemetry.set_attribute('sync', 'full' if full_sync else 'incremental')
+
+    # The scraper reads the feed back to the newest item we already have
+    hwm = db_client.get_feed_highwatermark(account)
+
+    # In streaming mode books are written page by page during the scrape,
+    # and only aggregated, never kept, so memory doesn't grow with the library
+    book_writer = db_client.BookPageWriter(user_id) if STREAM_BOOKS else None
+    dashboard_books = BookAggregator()
+
+    with telemetry.span('scrape'):
+        data = await scraper.scrape(
+            known_books=known_books, feed_high_water_mark=hwm,
+            on_book_page=book_writer.write_page if book_writer else None,
+            statistics_state=statistics_state, verify_statistics=VERIFY_STATISTICS,
+            on_books=dashboard_books.add_all, keep_books=not STREAM_BOOKS
+        )
+
+    # An invalid session is not a DOM change, say so first
+    if 'error' in data:
+        raise SyncFailed(f"Scraper finished with a known error: {data['error']}")
 
-        # Check feed, it could actually be empty as well
-        if feed_count == 0:
-            logging.warning("Health check warning: Scraped 0 feed items. Feed might be empty or selectors changed. Take a look nonetheless.")
+    # Validate that we actually got data before we try to save it.
+    # If selectors break, these lists will be empty.
+    total_books = data.get('books', {}).get('book_count', 0)
+    feed_count = len(data.get('feed_activity', []))
+
+    # Check Books
+    if total_books == 0:
+        raise SyncFailed("Health check failed: Scraped 0 books. Goodreads DOM likely changed.")
+    else:
+        logging.info(f"Health check passed: Found {total_books} books.")
+
+    # Check feed, it could actually be empty as well
+    if feed_count == 0:
+        logging.warning("Health check warning: Scraped 0 feed items. Feed might be empty or selectors changed. Take a look nonetheless.")
+    else:
+        logging.info(f"Health check passed: Found {feed_count} feed items.")
+    
+    logging.info("Scrape job finished successfully.")
+
+    if ENVIRONMENT != 'production':
+        save_output_files_locally(data, name=user_id if batch else None)
+
+    logging.info("Attempting to save data to Supabase.")
+    try:
+        all_feed_items = data.get('feed_activity', [])
+        new_feed_items = []
+
+        if hwm:
+            for item in all_feed_items:
+                item_time = dateutil.parser.isoparse(item.timestamp)
+                if item_time > hwm:
+                    new_feed_items.append(item)
         else:
-            logging.info(f"Health check passed: Found {feed_count} feed items.")
-        
-        if 'error' in data:
-            logging.error(f"Scraper finished with a known error: {data['error']}")
-            sys.exit(1)
+            # If no high-water mark, insert all items
+            new_feed_items = all_feed_items
+        if batch:
+            for item in new_feed_items:
+                item.user_id = user_id
         
-        logging.info("Scrape job finished successfully.")
+        write_results = [db_client.insert_feed_items(new_feed_items)]
 
-        if ENVIRONMENT != 'production':
-            save_output_files_locally(data)
+        all_books = data.get('books', {}).get('all_books', [])
+        if book_writer:
+            write_results.append(book_writer.finish(delete_missing=full_sync and DELETE_MISSING_BOOKS))
+        elif all_books:
+            # Add the user_id to each book record for the primary key
+            for book in all_books:
+                book.user_id = user_id
+            write_results.append(
+                db_client.upsert_books(all_books, delete_missing=full_sync and DELETE_MISSING_BOOKS)
+            )
+        else:
+            logging.info("No books found in scrape data. Nothing to upsert.")
 
-        logging.info("Attempting to save data to Supabase.")
+        challenge_data = data.get('reading_challenge', {})
+        if challenge_data:
+            try:
+                challenge_data['user_id'] = user_id
+                challenge_data['updated_at'] = datetime.now(timezone.utc).isoformat()          
+                challenge_obj = ReadingChallenge(**challenge_data)
+                write_results.append(db_client.upsert_reading_challenge(challenge_obj))
+            except Exception as e:
+                logging.error(f"Failed to process reading challenge data: {e}")
+
+        # Leave last_refreshed alone so a failed sync is visible, and fail the job
+        failed_writes = [result for result in write_results if not result.ok]
+        if failed_writes:
+            for result in failed_writes:
+                logging.error(f"Supabase write failed: {result.summary()}")
+            raise SyncFailed(f"{len(failed_writes)} Supabase writes failed")
+
+        current_time = datetime.now(timezone.utc)
+
+        # Tied to last_refreshed, so a state that misses a run is never reused
+        statistics_state = data.get('statistics_state')
+        if statistics_state:
+            statistics_state['synced_at'] = current_time.isoformat()
+            state_result = db_client.save_statistics_state(user_id, statistics_state)
+            if not state_result.ok:
+                logging.warning(f"Could not save statistics state: {state_result.summary()}")
+
+        # The dashboard reads these instead of the books and feed tables.
+        # Built from the feed table, so it covers the rows inserted above.
         try:
-            hwm = db_client.get_feed_highwatermark()
-            all_feed_items = data.get('feed_activity', [])
-            new_feed_items = []
-
-            if hwm:
-                for item in all_feed_items:
-                    item_time = dateutil.parser.isoparse(item.timestamp)
-                    if item_time > hwm:
-                        new_feed_items.append(item)
-            else:
-                # If no high-water mark, insert all items
-                new_feed_items = all_feed_items
-            
-            db_client.insert_feed_items(new_feed_items)
-
-            all_books = data.get('books', {}).get('all_books', [])
-            if all_books:
-                # Add the user_id to each book record for the primary key
-                for book in all_books:
-                    book.user_id = GOODREADS_USER_ID
-                db_client.upsert_books(all_books)
-            else:
-                logging.info("No books found in scrape data. Nothing to upsert.")
-
-            challenge_data = data.get('reading_challenge', {})
-            if challenge_data:
-                try:
-                    challenge_data['user_id'] = GOODREADS_USER_ID
-                    challenge_data['updated_at'] = datetime.now(timezone.utc).isoformat()          
-                    challenge_obj = ReadingChallenge(**challenge_data)
-                    db_client.upsert_reading_challenge(challenge_obj)
-                except Exception as e:
-                    logging.error(f"Failed to process reading challenge data: {e}")
+            feed_rows = db_client.get_recent_feed(FEED_AGGREGATE_LIMIT, user_id=account)
+            with telemetry.span('dashboard.build'):
+                aggregates = build_dashboard_aggregates(dashboard_books, feed_rows, data.get('statistics'))
+            dashboard_result = db_client.upsert_dashboard_aggregates(user_id, aggregates)
+            if not dashboard_result.ok:
+                logging.warning(f"Could not save dashboard aggregates: {dashboard_result.summary()}")
+        except Exception as e:
+            logging.warning(f"Could not build dashboard aggregates: {e}")
 
-            try:
-                current_time = datetime.now(timezone.utc)
-                db_client.set_system_metadata("last_refreshed", current_time.isoformat())
+        try:
+            db_client.set_system_metadata(metadata_key("last_refreshed", account), current_time.isoformat())
 
+            # In batch mode the dashboard's next_scrape is set once for the whole batch
+            if not batch:
                 next_scrape = current_time + timedelta(days=3)
                 db_client.set_system_metadata("next_scrape", next_scrape.isoformat())
 
-            except Exception as e:
-                logging.warning(f"Could not update last_refreshed or next_scrape time: {e}")
-                
-            logging.info("Supabase data sync complete.")
-            
+            if full_sync:
+                db_client.set_system_metadata(metadata_key("last_full_sync", account), current_time.isoformat())
+
         except Exception as e:
-            logging.exception("An error occurred during Supabase data insertion.")
+            logging.warning(f"Could not update last_refreshed or next_scrape time: {e}")
             
+        logging.info("Supabase data sync complete.")
+        
+    except SyncFailed:
+        raise
+    except Exception as e:
+        logging.exception("An error occurred during Supabase data insertion.")
+
+def load_accounts(path: str) -> List[Tuple[str, str]]:
+    """(user_id, cookie) pairs from a JSON list of {"user_id": ..., "cookie": ...} objects."""
+    with open(path) as f:
+        entries = json.load(f)
+    if not isinstance(entries, list):
+        raise ValueError(f"{path} must contain a JSON list of accounts")
+
+    accounts = []
+    for index, entry in enumerate(entries):
+        if not isinstance(entry, dict) or not entry.get('user_id') or not entry.get('cookie'):
+            raise ValueError(f"Account {index} in {path} needs a user_id and a cookie")
+        accounts.append((str(entry['user_id']), entry['cookie']))
+    if len({user_id for user_id, _ in accounts}) != len(accounts):
+        raise ValueError(f"{path} lists an account more than once")
+    return accounts
+
+async def run_batch(accounts: List[Tuple[str, str]], cassette: Optional[Cassette] = None,
+                    page_cache: Optional[PageCache] = None) -> List[AccountResult]:
+    """
+    Sync several accounts in one process, BATCH_CONCURRENCY at a time.
+
+    Every account gets its own scraper and session, but they share one
+    rate limiter, one HTTP connection pool and one Chromium, with a
+    browser context per account. A failing account is logged and
+    reported, and never stops the others.
+    """
+    rate_limiter = AdaptiveRateLimiter(rate=GOODREADS_RATE_LIMIT, max_rate=GOODREADS_MAX_RATE_LIMIT)
+    concurrency = max(1, BATCH_CONCURRENCY)
+    pool_size = SCRAPE_CONCURRENCY * concurrency
+    pool = {'pool_connections': pool_size, 'pool_maxsize': pool_size}
+    adapter = RecordingAdapter(cassette, **pool) if cassette is not None else HTTPAdapter(**pool)
+    browser = SharedBrowser(lean=FEED_LEAN_BROWSER)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def sync(user_id: str, cookie: str) -> AccountResult:
+        result = AccountResult(user_id)
+        async with semaphore:
+            with telemetry.span('account', user_id=user_id) as account_span:
+                try:
+                    scraper = build_scraper(
+                        cookie, user_id, rate_limiter, cassette=cassette,
+                        adapter=adapter, shared_browser=browser, page_cache=page_cache
+                    )
+                    await sync_account(scraper, batch=True)
+                    result.ok = True
+                except SyncFailed as e:
+                    result.error = str(e)
+                    logging.error(f"Sync of account {user_id} failed: {e}")
+                except Exception as e:
+                    result.error = f"{type(e).__name__}: {e}"
+                    logging.exception(f"Unexpected error syncing account {user_id}.")
+                account_span.attributes['ok'] = result.ok
+        result.duration = account_span.duration
+        return result
+
+    logging.info(f"Syncing {len(accounts)} accounts, {concurrency} at a time.")
+    try:
+        results = await asyncio.gather(*(sync(user_id, cookie) for user_id, cookie in accounts))
+    finally:
+        await browser.close()
+        adapter.close()
+
+    failed = [result for result in results if not result.ok]
+    for result in results:
+        status = "ok" if result.ok else f"FAILED ({result.error})"
+        logging.info(f"Account {result.user_id}: {status} in {result.duration:.1f}s")
+    logging.info(f"Batch finished: {len(results) - len(failed)} of {len(results)} accounts synced. Request stats: {rate_limiter.stats()}")
+    telemetry.set_attribute('accounts', len(results))
+    telemetry.set_attribute('accounts_failed', len(failed))
+
+    # The dashboard shows one refresh time, it only moves when every account synced
+    if results and not failed:
+        current_time = datetime.now(timezone.utc)
+        db_client.set_system_metadata("last_refreshed", current_time.isoformat())
+        db_client.set_system_metadata("next_scrape", (current_time + timedelta(days=3)).isoformat())
+    return results
+
+async def main():
+    init_sentry()
+    setup_logging() # Run the setup
+    
+    cassette = Cassette() if HTTP_RECORD_PATH else None
+    page_cache = open_page_cache()
+
+    def finish():
+        if cassette is not None:
+            cassette.save(HTTP_RECORD_PATH)
+        if page_cache is not None:
+            page_cache.close()
+
+    if GOODREADS_ACCOUNTS_FILE:
+        try:
+            accounts = load_accounts(GOODREADS_ACCOUNTS_FILE)
+        except (OSError, ValueError) as e:
+            logging.critical(f"Could not read GOODREADS_ACCOUNTS_FILE: {e}. Exiting.")
+            sys.exit(1)
+        try:
+            results = await run_batch(accounts, cassette, page_cache)
+        finally:
+            finish()
+        if not all(result.ok for result in results):
+            sys.exit(1)
+        return
+
+    # Get secrets from environment
+
+    if not GOODREADS_COOKIE or not GOODREADS_USER_ID:
+        logging.critical("GOODREADS_COOKIE or GOODREADS_USER_ID not set. Exiting.")
+        return
+
+    rate_limiter = AdaptiveRateLimiter(rate=GOODREADS_RATE_LIMIT, max_rate=GOODREADS_MAX_RATE_LIMIT)
+    scraper = build_scraper(GOODREADS_COOKIE, GOODREADS_USER_ID, rate_limiter, cassette=cassette, page_cache=page_cache)
+
+    try:
+        try:
+            await sync_account(scraper)
+        finally:
+            finish()
+    except SyncFailed as e:
+        logging.error(str(e))
+        sys.exit(1)
     except Exception as e:
         # This will catch any fatal, unexpected error
         logging.exception("An unexpected, fatal error occurred. Job failed.")
         sys.exit(1) # Exit with a non-zero code
 
+async def run():
+    """`main` as the root span of the run report."""
+    with telemetry.span('run', environment=ENVIRONMENT):
+        await main()
+
+def emit_run_report():
+    telemetry.emit_report(
+        report_path=RUN_REPORT_PATH or os.path.join(get_output_dir(), 'run_report.json'),
+        otlp_path=RUN_REPORT_OTLP_PATH,
+        otlp_endpoint=OTEL_EXPORTER_OTLP_TRACES_ENDPOINT, otlp_headers=OTEL_EXPORTER_OTLP_HEADERS,
+        environment=ENVIRONMENT
+    )
+
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    try:
+        asyncio.run(run())
+    finally:
+        # Also after sys.exit, a failed run is the one worth looking at
+        emit_run_report()
\ No newline at end of file
@@ -1,30 +1,233 @@
 import logging
-from datetime import datetime
-import time
+from datetime import datetime, timezone
 import re
-from typing import Dict, List, Optional
+import random
+import time
+from typing import Any, AsyncIterator, Callable, Deque, Dict, List, Optional, Tuple
+from urllib.parse import urlparse
 import os
 import ast
+import hashlib
+import itertools
 import json
 
-import pydantic
-import pandas as pd
+import dateutil.parser
 import requests
-from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
 import asyncio
-from playwright.async_api import async_playwright
+from collections import deque
+from contextlib import asynccontextmanager
+
+from schemas import BOOK_USER_FIELDS, Book, FeedActivity, dump_many, same_content, validate_many
+from rate_limiter import AdaptiveRateLimiter
+from parsers import STREAM_CHUNK_BYTES, get_shelf_parser
+from dates import DateNormalizer
+from cassettes import Cassette, RecordingAdapter
+from page_memo import PageMemo
+from http_cache import PageCache, body_hash
+import telemetry
+from reading_stats import StatisticsAggregator, StatisticsBuilder, calculate_statistics
+
+# Links to books and authors always point here, wherever the pages were fetched from
+GOODREADS_URL = "https://www.goodreads.com"
+
+# Goodreads stops serving shelf pages well before this, it is only a safety net.
+MAX_SHELF_PAGES = 100
+
+# Responses worth retrying with backoff
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+MAX_RETRIES = 3
+
+SHELVES = ['read', 'currently-reading', 'to-read']
+# Parsed shelf pages buffered between the scrape and a slower consumer
+BOOK_PAGE_QUEUE_SIZE = 8
+
+# Shelf sort order for incremental syncs, most recently touched books first
+INCREMENTAL_SORT = 'date_updated'
+# Left out when deciding whether an incremental sync has reached unchanged books
+NON_USER_FIELDS = frozenset(Book.model_fields) - BOOK_USER_FIELDS
+
+FEED_ITEM_SELECTOR = 'div.gr-newsfeedItem'
+FEED_ITEM_LIMIT = 50
+# Upper bounds for scrolling back to the feed high-water mark
+FEED_MAX_ITEMS = 200
+FEED_MAX_SECONDS = 60.0
+# Lean browser mode: requests of these types are never needed to read the feed
+BLOCKED_RESOURCE_TYPES = {'image', 'media', 'font', 'stylesheet'}
+# Chromium flags that trim memory use in a small container
+LEAN_CHROMIUM_ARGS = ['--disable-dev-shm-usage', '--disable-gpu', '--disable-extensions', '--mute-audio']
 
-from schemas import Book, FeedActivity
+# Collects the raw fields of each feed item straight from the live DOM, the
+# same fields as Katalog._extract_feed_item reads from the serialized HTML.
+# `strings` follows bs4's get_text(strip=True): stripped text nodes, empty ones dropped.
+FEED_EXTRACT_SCRIPT = """
+([selector, limit]) => {
+    const strings = (el) => {
+        const parts = [];
+        const walker = document.createTreeWalker(el, NodeFilter.SHOW_TEXT);
+        while (walker.nextNode()) {
+            const text = walker.currentNode.nodeValue.trim();
+            if (text) parts.push(text);
+        }
+        return parts;
+    };
+    const text = (el) => el.textContent.trim();
+
+    return Array.from(document.querySelectorAll(selector)).slice(0, limit).map((item) => {
+        const raw = {};
+
+        const userLink = item.querySelector('a.gr-user__profileLink');
+        if (userLink) {
+            raw.user_text = text(userLink);
+            raw.user_url = userLink.getAttribute('href') || '';
+        }
+
+        const header = item.querySelector('div.gr-newsfeedItem__header');
+        if (header) raw.header_text = strings(header).join(' ');
+
+        const ratingElem = item.querySelector('div.communityRating__stars');
+        if (ratingElem) raw.rating_style = ratingElem.getAttribute('style');
+
+        const bookTitle = item.querySelector('a.gr-book__titleLink');
+        if (bookTitle) {
+            raw.book_title = text(bookTitle);
+            raw.book_url = bookTitle.getAttribute('href') || '';
+        }
+
+        const authorLink = item.querySelector('a.gr-book__authorLink');
+        if (authorLink) {
+            raw.author = text(authorLink);
+            raw.author_url = authorLink.getAttribute('href') || '';
+        }
+
+        const timestampElem = item.querySelector('small.gr-newsfeedItem__headerTimestamp');
+        if (timestampElem) {
+            const timeTag = timestampElem.querySelector('time');
+            if (timeTag && timeTag.getAttribute('datetime')) {
+                raw.timestamp = timeTag.getAttribute('datetime');
+                raw.time_ago = text(timeTag);
+            } else if (timestampElem.getAttribute('datetime')) {
+                raw.timestamp = timestampElem.getAttribute('datetime');
+                raw.time_ago = text(timestampElem);
+            } else {
+                raw.time_ago = strings(timestampElem).join('');
+            }
+        }
+
+        const bookDesc = item.querySelector('div.gr-book__description');
+        if (bookDesc) raw.description = strings(bookDesc).join(' ');
+
+        return raw;
+    });
+}
+"""
+
+# Timestamps of the feed items from index `start` on, null where an item has none
+FEED_TIMESTAMPS_SCRIPT = """
+([selector, start]) => Array.from(document.querySelectorAll(selector)).slice(start).map((item) => {
+    const elem = item.querySelector('small.gr-newsfeedItem__headerTimestamp');
+    if (!elem) return null;
+    const timeTag = elem.querySelector('time');
+    return (timeTag && timeTag.getAttribute('datetime')) || elem.getAttribute('datetime');
+})
+"""
+
+class SharedBrowser:
+    """
+    One Chromium shared by several Katalog instances, e.g. in batch mode.
+    Each scraper still gets its own browser context, so cookies and storage
+    stay separate per account. Launched on first use, `close` it when done.
+    """
+
+    def __init__(self, lean: bool = True):
+        self.lean = lean
+        self._lock: Optional[asyncio.Lock] = None
+        self._playwright = None
+        self._browser = None
+
+    async def get(self):
+        """The browser, launched by the first caller."""
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            if self._browser is None:
+                from playwright.async_api import async_playwright
+                self._playwright = await async_playwright().start()
+                self._browser = await self._playwright.chromium.launch(
+                    headless=True, args=LEAN_CHROMIUM_ARGS if self.lean else None
+                )
+            return self._browser
+
+    async def close(self):
+        if self._browser is not None:
+            await self._browser.close()
+        if self._playwright is not None:
+            await self._playwright.stop()
+        self._browser = self._playwright = None
 
 class Katalog:
-    def __init__(self, cookie_string: str, user_id: str):
-        """Initialize the scraper with session cookie and user ID."""
+    def __init__(self, cookie_string: str, user_id: str, max_concurrency: int = 4,
+                 rate_limiter: Optional[AdaptiveRateLimiter] = None, shelf_parser: str = 'auto',
+                 lean_browser: bool = True, browser_allowed_domains: Optional[List[str]] = None,
+                 feed_extraction: str = 'browser', feed_max_items: int = FEED_MAX_ITEMS,
+                 feed_max_seconds: float = FEED_MAX_SECONDS, base_url: str = GOODREADS_URL,
+                 cassette: Optional[Cassette] = None, adapter: Optional[HTTPAdapter] = None,
+                 shared_browser: Optional[SharedBrowser] = None, page_cache: Optional[PageCache] = None):
+        """
+        Initialize the scraper with session cookie and user ID. Point
+        `base_url` at a stand-in server to scrape something other than
+        Goodreads, and pass a `cassette` to record every exchange into it.
+
+        Scrapers of several accounts can share one connection pool by
+        passing the same `adapter`, and one Chromium via `shared_browser`.
+        A shared adapter records into a cassette only if it was built as a
+        RecordingAdapter. With a `page_cache`, shelf pages are requested
+        conditionally and unchanged ones are not parsed again, nor are
+        unchanged rows of changed pages.
+        """
         self.logger = logging.getLogger(__name__) # Get a logger instance
         self.logger.info(f"Initializing Katalog for user_id: {user_id}")
         
         self.session = requests.Session()
         self.user_id = user_id
-        self.base_url = "https://www.goodreads.com"
+        self.max_concurrency = max(1, max_concurrency)
+        self._fetch_semaphore: Optional[asyncio.Semaphore] = None
+        # Every Goodreads request goes through this, pass one in to share it
+        self.rate_limiter = rate_limiter or AdaptiveRateLimiter()
+        # Pages more than one phase reads, like the profile, are fetched and parsed once per run
+        self.page_memo = PageMemo()
+        self.page_cache = page_cache
+
+        self.cassette = cassette
+        if adapter is None:
+            # Size the connection pool so concurrent shelf fetches can reuse connections
+            pool = {'pool_connections': self.max_concurrency, 'pool_maxsize': self.max_concurrency}
+            adapter = RecordingAdapter(cassette, **pool) if cassette is not None else HTTPAdapter(**pool)
+        # A shared adapter only pools connections, the cookies stay on each session
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.base_url = base_url.rstrip('/')
+        host = urlparse(self.base_url).hostname or ''
+        # Goodreads cookies are set for every subdomain, a stand-in only has its own host
+        self.cookie_domain = '.goodreads.com' if host == 'goodreads.com' or host.endswith('.goodreads.com') else host
+        # Goodreads dates repeat a lot, so they are normalized through a memo
+        self.dates = DateNormalizer()
+        self.shelf_parser = get_shelf_parser(
+            shelf_parser, GOODREADS_URL, self.dates.normalize_many, row_memo=page_cache.rows if page_cache else None
+        )
+        self.logger.info("Using %s shelf parser", self.shelf_parser.name)
+
+        self.shared_browser = shared_browser
+        # In lean browser mode, the feed page may only load from these domains
+        self.lean_browser = lean_browser
+        self.browser_allowed_domains = [urlparse(self.base_url).hostname] + list(
+            browser_allowed_domains if browser_allowed_domains is not None else ['goodreads.com', 'gr-assets.com']
+        )
+        # 'browser' extracts feed items with a script in the page, 'html' parses page.content() with bs4
+        self.feed_extraction = feed_extraction
+        # Bounds on scrolling the feed back to the high-water mark
+        self.feed_max_items = max(1, feed_max_items)
+        self.feed_max_seconds = feed_max_seconds
         
         # Parse cookies from the cookie string
         self.cookies = {}
@@ -42,8 +245,8 @@ class Katalog:
             'Accept-Language': 'en-US,en;q=0.9',
             'Accept-Encoding': 'gzip, deflate, br',
             'X-Requested-With': 'XMLHttpRequest',
-            'Referer': 'https://www.goodreads.com/',
-            'Origin': 'https://www.goodreads.com',
+            'Referer': f'{self.base_url}/',
+            'Origin': self.base_url,
             'DNT': '1',
             'Connection': 'keep-alive',
             'Sec-Fetch-Dest': 'empty',
@@ -53,20 +256,66 @@ class Katalog:
         
         # Set cookies in session
         for key, value in self.cookies.items():
-            self.session.cookies.set(key, value, domain='.goodreads.com', path='/')
+            self.session.cookies.set(key, value, domain=self.cookie_domain, path='/')
         
         # Update session headers
         self.session.headers.update(self.headers)
         
+    def _get(self, url: str, **kwargs) -> requests.Response:
+        """
+        GET a Goodreads URL through the shared rate limiter. With
+        `stream=True` the body is left for the caller to read, or close.
+
+        429 and 5xx responses, timeouts and connection errors are retried with
+        jittered exponential backoff. The last response is returned as-is once
+        retries run out, so callers keep handling status codes themselves.
+        """
+        attempt = 0
+        while True:
+            self.rate_limiter.acquire()
+            try:
+                response = self.session.get(url, **kwargs)
+            except (requests.exceptions.Timeout, requests.exceptions.ConnectionError) as e:
+                telemetry.count(requests=1)
+                if attempt >= MAX_RETRIES:
+                    raise
+                self.logger.warning("Request to %s failed (%s), retrying...", url, e)
+            else:
+                # A streamed body is counted by whoever reads it
+                telemetry.count(requests=1, bytes=0 if kwargs.get('stream') else len(response.content))
+                self.rate_limiter.record_response(response.status_code, response.headers.get('Retry-After'))
+                if response.status_code not in RETRY_STATUSES or attempt >= MAX_RETRIES:
+                    return response
+                self.logger.warning("Got status code %s for %s, retrying...", response.status_code, url)
+                response.close()
+
+            self.rate_limiter.record_retry()
+            telemetry.count(retries=1)
+            time.sleep(min(30, 2 ** attempt) * random.uniform(0.5, 1.0))
+            attempt += 1
+
+    def _get_profile_page(self):
+        """
+        The user's own profile page and its parsed tree (None unless the
+        status is 200), memoized for the run. Redirects are not followed,
+        an invalid session redirects to the sign-in page.
+        """
+        from bs4 import BeautifulSoup
+        url = f"{self.base_url}/user/show/{self.user_id}"
+
+        def parse(content: bytes):
+            telemetry.count(pages=1)
+            return BeautifulSoup(content, 'html.parser')
+
+        return self.page_memo.document(url, lambda: self._get(url, allow_redirects=False, timeout=10), parse, 'bs4')
+
     def verify_session(self) -> bool:
         """
         Verify that the session cookie is valid by checking for the
         "Edit profile" link on the user's own profile page.
         """
-        url = f"{self.base_url}/user/show/{self.user_id}"
-        
         try:
-            response = self.session.get(url, allow_redirects=False, timeout=10)
+            response, soup = self._get_profile_page()
 
             if response.status_code in (301, 302, 307):
                 self.logger.warning("Session invalid (Redirected to: %s)", response.headers.get('Location'))
@@ -76,7 +325,6 @@ class Katalog:
                 self.logger.warning("Session invalid (Got HTTP Status %s)", response.status_code)
                 return False
 
-            soup = BeautifulSoup(response.content, 'html.parser')
             edit_profile_link = soup.find('a', href='/user/edit')
             
             if edit_profile_link:
@@ -94,293 +342,370 @@ class Katalog:
             self.logger.exception("Unexpected error verifying session: %s", e)
             return False
     
-    def get_books_data(self) -> Dict:
-        """Scrape books data including read status and dates."""
+    async def get_books_data(self, known_books: Optional[Dict[str, Book]] = None,
+                             on_page: Optional[Callable[[List[Book]], Any]] = None,
+                             on_books: Optional[Callable[[List[Book]], Any]] = None,
+                             keep_books: bool = True) -> Dict:
+        """
+        Scrape books data including read status and dates.
+
+        Shelves are scraped in parallel, and once the first page of a shelf
+        reveals the page count, the remaining pages are fetched in parallel
+        too. At most `max_concurrency` requests are in flight at once.
+
+        When `known_books` (the stored books keyed by book_url) is given, the
+        shelves are synced incrementally instead: see `_iter_shelf_pages_incremental`.
+        Books that were not re-scraped are carried over from `known_books`, so
+        the result still covers the whole library.
+
+        `on_page`, if given, is called from a worker thread with the books of
+        each scraped page as soon as it is parsed, e.g. to write them out
+        while the rest of the library is still being scraped. `on_books` is
+        called on the event loop with the whole library, carried-over books
+        included, a batch at a time and in library order, e.g. to aggregate
+        it. Without `keep_books` the books are only handed to those two and
+        the lists in the result stay empty, so memory doesn't grow with the
+        library. `book_count` always counts them.
+        """
         books_data = {
-            'read': [], 'currently_reading': [], 'want_to_read': [], 'all_books': []
+            'read': [], 'currently_reading': [], 'want_to_read': [], 'all_books': [], 'book_count': 0
         }
         
         try:
-            shelves = ['read', 'currently-reading', 'to-read']
-            
-            for shelf in shelves:
-                self.logger.info("Scraping %s shelf...", shelf)
-                page = 1
-                books_found = 0
-                consecutive_empty_pages = 0
-                
-                while consecutive_empty_pages < 2:
-                    url = f"{self.base_url}/review/list/{self.user_id}?shelf={shelf}&page={page}&per_page=100"
-                    response = self.session.get(url)
-                    
-                    if response.status_code != 200:
-                        self.logger.warning("Got status code %s for %s page %s", response.status_code, shelf, page)
-                        break
-                        
-                    soup = BeautifulSoup(response.content, 'html.parser')
-                    
-                    book_rows = soup.find_all('tr', class_='bookalike review')
-                    if not book_rows:
-                        book_rows = soup.find_all('tr', id=re.compile(r'review_\d+'))
-                    
-                    if not book_rows:
-                        consecutive_empty_pages += 1
-                        if page == 1:
-                            self.logger.info("No books found in %s shelf", shelf)
-                            break
-                    else:
-                        consecutive_empty_pages = 0
-                        page_books = 0
-                        
-                        for row in book_rows:
-                            book = {}
-                            
-                            # Title
-                            title_elem = row.find('td', class_='field title')
-                            if title_elem:
-                                title_link = title_elem.find('a', class_='bookTitle')
-                                if not title_link:
-                                    title_link = title_elem.find('a')
-                                if title_link:
-                                    book['title'] = title_link.text.strip()
-                                    book['book_url'] = self.base_url + title_link.get('href', '')
-                            
-                            # Author
-                            author_elem = row.find('td', class_='field author')
-                            if author_elem:
-                                author_link = author_elem.find('a')
-                                if author_link:
-                                    book['author'] = author_link.text.strip()
-                            
-                            # ISBN
-                            isbn_elem = row.find('td', class_='field isbn13')
-                            if isbn_elem:
-                                value_div = isbn_elem.find('div', class_='value')
-                                if value_div:
-                                    isbn_text = value_div.text.strip()
-                                    if isbn_text and isbn_text != '—':
-                                        book['isbn'] = isbn_text
-                            
-                            # Rating
-                            rating_elem = row.find('td', class_='field rating')
-                            if rating_elem:
-                                stars_div = rating_elem.find('div', class_='stars')
-                                if stars_div and stars_div.get('data-rating'):
-                                    try:
-                                        rating_value = stars_div.get('data-rating')
-                                        if int(rating_value) > 0:
-                                            book['rating'] = int(rating_value)
-                                    except Exception:
-                                        pass # Non-fatal, just skip
-                            
-                            # Average rating
-                            avg_rating_elem = row.find('td', class_='field avg_rating')
-                            if avg_rating_elem:
-                                value_div = avg_rating_elem.find('div', class_='value')
-                                if value_div:
-                                    avg_text = value_div.text.strip()
-                                    try:
-                                        book['avg_rating'] = float(avg_text)
-                                    except Exception:
-                                        pass # Non-fatal, just skip
-
-                            # Number of pages
-                            pages_elem = row.find('td', class_='field num_pages')
-                            if pages_elem:
-                                value_div = pages_elem.find('div', class_='value')
-                                if value_div:
-                                    nobr_tag = value_div.find('nobr')
-                                    if nobr_tag and nobr_tag.contents:
-                                        pages_text = str(nobr_tag.contents[0]).strip().replace(',', '')
-                                        try:
-                                            book['num_pages'] = int(pages_text)
-                                        except Exception:
-                                            pass # Non-fatal, just skip
-                            
-                            # Date published
-                            date_pub_elem = row.find('td', class_='field date_pub')
-                            if date_pub_elem:
-                                value_div = date_pub_elem.find('div', class_='value')
-                                if value_div:
-                                    date_text = value_div.text.strip()
-                                    book['date_published'] = date_text
-                            
-                            # Date added
-                            date_added_elem = row.find('td', class_='field date_added')
-                            if date_added_elem:
-                                date_text = ''
-                                span_with_title = date_added_elem.find('span', title=True)
-                                if span_with_title:
-                                    date_text = span_with_title.get('title')
-                                if not date_text:
-                                    date_span = date_added_elem.find('span', class_='date_added_value')
-                                    if date_span:
-                                        date_text = date_span.text.strip()
-                                if not date_text:
-                                    date_text = date_added_elem.get_text(strip=True)
-                                if date_text:
-                                    book['date_added'] = self._parse_date(date_text)
-                            
-                            # Date started
-                            if shelf == 'currently-reading':
-                                date_started_elem = row.find('td', class_='field date_started')
-                                if date_started_elem:
-                                    date_text = ''
-                                    span_with_title = date_started_elem.find('span', title=True)
-                                    if span_with_title:
-                                        date_text = span_with_title.get('title')
-                                    if not date_text:
-                                        date_span = date_started_elem.find('span', class_='date_started_value')
-                                        if date_span:
-                                            date_text = date_span.text.strip()
-                                    if not date_text:
-                                        date_text = date_started_elem.get_text(strip=True)
-                                    if date_text:
-                                        book['date_started'] = self._parse_date(date_text)
-                            
-                            # Date read
-                            if shelf == 'read':
-                                date_read_elem = row.find('td', class_='field date_read')
-                                if date_read_elem:
-                                    date_span = date_read_elem.find('span', class_='date_read_value')
-                                    if not date_span:
-                                        date_span = date_read_elem.find('span')
-                                    if date_span:
-                                        date_text = date_span.get('title', '')
-                                        if not date_text:
-                                            date_text = date_span.text.strip()
-                                    else:
-                                        date_text = date_read_elem.get_text(strip=True)
-                                    if date_text:
-                                        book['date_read'] = self._parse_date(date_text)
-                            
-                            # Review
-                            review_elem = row.find('td', class_='field review')
-                            if review_elem:
-                                review_text = review_elem.find('span', id=re.compile(r'freeText\d+'))
-                                if review_text:
-                                    book['review'] = review_text.text.strip()[:500]
-                            
-                            book['shelf'] = shelf.replace('-', '_')
-                            
-                            if book.get('title'):
-                                try:
-                                    book_obj = Book(
-                                        title=book.get('title'),
-                                        book_url=book.get('book_url'),
-                                        author=book.get('author'),
-                                        isbn=book.get('isbn'),
-                                        rating=book.get('rating'),
-                                        avg_rating=book.get('avg_rating'),
-                                        num_pages=book.get('num_pages'),
-                                        date_published=book.get('date_published'),
-                                        date_added=book.get('date_added'),
-                                        date_started=book.get('date_started'),
-                                        date_read=book.get('date_read'),
-                                        review=book.get('review'),
-                                        shelf=book.get('shelf')
-                                    )
-                                    
-                                    books_found += 1
-                                    page_books += 1
-                                    
-                                    if shelf == 'read':
-                                        books_data['read'].append(book_obj)
-                                    elif shelf == 'currently-reading':
-                                        books_data['currently_reading'].append(book_obj)
-                                    else:
-                                        books_data['want_to_read'].append(book_obj)
-                                    books_data['all_books'].append(book_obj)
-                                except pydantic.ValidationError as e:
-                                    self.logger.warning(
-                                        "Skipping book, failed validation: %s. Data: %s",
-                                        e, book
-                                    )
-                                    continue
-                        
-                        if page_books > 0:
-                            self.logger.debug("Page %s: Found %s books", page, page_books)
-                    
-                    next_link = soup.find('a', class_='next_page')
-                    if next_link and 'disabled' in next_link.get('class', []):
-                        break
-                    
-                    page += 1
-                    
-                    if page > 100:
-                        self.logger.warning("Reached page limit (100) for %s shelf", shelf)
-                        break
-                    
-                    time.sleep(0.5)
-                
-                self.logger.info("Total found: %s books in %s shelf", books_found, shelf)
+            scraped = {shelf: [] for shelf in SHELVES}
+            scraped_urls = set()
+            async for shelf, page_books in self.iter_book_pages(known_books):
+                if on_page:
+                    await asyncio.to_thread(on_page, page_books)
+                if keep_books:
+                    scraped[shelf].extend(page_books)
+                    continue
+                scraped_urls.update(book.book_url for book in page_books)
+                books_data['book_count'] += len(page_books)
+                if on_books:
+                    on_books(page_books)
+
+            if not keep_books:
+                if known_books is not None:
+                    for carried_over in self._carried_over_books(SHELVES, scraped_urls, known_books):
+                        books_data['book_count'] += len(carried_over)
+                        if on_books:
+                            on_books(carried_over)
+                return books_data
+
+            shelf_results = [scraped[shelf] for shelf in SHELVES]
+            if known_books is not None:
+                shelf_results = self._merge_known_books(SHELVES, shelf_results, known_books)
+
+            for shelf, shelf_books in zip(SHELVES, shelf_results):
+                if shelf == 'read':
+                    books_data['read'].extend(shelf_books)
+                elif shelf == 'currently-reading':
+                    books_data['currently_reading'].extend(shelf_books)
+                else:
+                    books_data['want_to_read'].extend(shelf_books)
+                books_data['all_books'].extend(shelf_books)
+                if on_books:
+                    on_books(shelf_books)
+            books_data['book_count'] = len(books_data['all_books'])
                     
         except Exception as e:
             self.logger.exception("Error scraping books: %s", e)
             
         return books_data
-    
+
+    async def iter_book_pages(self, known_books: Optional[Dict[str, Book]] = None) -> AsyncIterator[Tuple[str, List[Book]]]:
+        """
+        Yield `(shelf, books)` for every scraped shelf page, shelf by shelf in
+        SHELVES order and each shelf in page order.
+
+        The shelves are scraped concurrently, each into its own queue of at
+        most BOOK_PAGE_QUEUE_SIZE pages. A shelf whose queue is full, e.g.
+        while an earlier shelf is still being consumed, starts no new page
+        fetches until there is room again, so a slow consumer holds the
+        scrape back instead of letting parsed pages pile up in memory. With
+        `known_books` the shelves are synced incrementally and only the
+        re-scraped pages are yielded.
+        """
+        self._fetch_semaphore = asyncio.Semaphore(self.max_concurrency)
+        queues = {shelf: asyncio.Queue(maxsize=BOOK_PAGE_QUEUE_SIZE) for shelf in SHELVES}
+
+        async def produce(shelf: str):
+            if known_books is None:
+                pages = self._iter_shelf_pages(shelf)
+            else:
+                pages = self._iter_shelf_pages_incremental(shelf, known_books)
+            try:
+                async for page_books in pages:
+                    await queues[shelf].put(page_books)
+            except Exception as e:
+                self.logger.exception("Error scraping %s shelf: %s", shelf, e)
+            # Marks the end of this shelf
+            await queues[shelf].put(None)
+
+        producers = [asyncio.create_task(produce(shelf)) for shelf in SHELVES]
+        try:
+            for shelf in SHELVES:
+                while True:
+                    page_books = await queues[shelf].get()
+                    if page_books is None:
+                        break
+                    yield shelf, page_books
+        finally:
+            for producer in producers:
+                producer.cancel()
+            await asyncio.gather(*producers, return_exceptions=True)
+
+    async def _iter_shelf_pages(self, shelf: str) -> AsyncIterator[List[Book]]:
+        """
+        Scrape every page of a single shelf, yielding each page's books in page order.
+
+        The first page is fetched on its own to discover the page count from
+        the pagination links. The remaining pages are then fetched up to
+        `max_concurrency` at a time and yielded as soon as every page before
+        them is in. The next page is only fetched once one is consumed.
+        If no page count can be found, pages are walked one at a time until
+        two consecutive empty pages are seen.
+        """
+        self.logger.info("Scraping %s shelf...", shelf)
+        state = {'page': 1, 'consecutive_empty_pages': 0}
+        total = 0
+        pending: Deque[asyncio.Task] = deque()
+
+        try:
+            first_page = await self._get_shelf_page(shelf, 1)
+            page_books: List[Book] = []
+            keep_going = self._consume_shelf_page(shelf, first_page, state, page_books)
+            if page_books:
+                total += len(page_books)
+                yield page_books
+
+            last_page = first_page.get('last_page')
+            if keep_going and last_page and last_page >= state['page']:
+                page_numbers = iter(range(state['page'], min(last_page, MAX_SHELF_PAGES) + 1))
+                # A window of fetches, topped up as pages are consumed, so a
+                # consumer that stops pulling pages also stops new fetches
+                pending = deque(asyncio.create_task(self._get_shelf_page(shelf, page))
+                                for page in itertools.islice(page_numbers, self.max_concurrency))
+                while pending:
+                    result = await pending.popleft()
+                    for page in itertools.islice(page_numbers, 1):
+                        pending.append(asyncio.create_task(self._get_shelf_page(shelf, page)))
+                    page_books = []
+                    keep_going = self._consume_shelf_page(shelf, result, state, page_books)
+                    if page_books:
+                        total += len(page_books)
+                        yield page_books
+                    if not keep_going:
+                        break
+
+            # Fall back to a sequential walk when the page count is unknown,
+            # or the discovered pages did not reach the end of the shelf.
+            while keep_going:
+                result = await self._get_shelf_page(shelf, state['page'])
+                page_books = []
+                keep_going = self._consume_shelf_page(shelf, result, state, page_books)
+                if page_books:
+                    total += len(page_books)
+                    yield page_books
+
+        except Exception as e:
+            self.logger.exception("Error scraping %s shelf: %s", shelf, e)
+        finally:
+            # Pages past a stop, or left behind by an error, are not needed
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+
+        self.logger.info("Total found: %s books in %s shelf", total, shelf)
+
+    async def _iter_shelf_pages_incremental(self, shelf: str, known_books: Dict[str, Book]) -> AsyncIterator[List[Book]]:
+        """
+        Scrape a shelf newest-updated first, stopping at the first page whose
+        books all match `known_books`. Everything past that page is assumed
+        to be unchanged since the last sync. Yields each page's books, so
+        the scraped pages still bring fresh avg_rating and num_pages values.
+        """
+        self.logger.info("Scraping %s shelf (incremental)...", shelf)
+        state = {'page': 1, 'consecutive_empty_pages': 0}
+        checked = 0
+        changed = 0
+
+        try:
+            keep_going = True
+            while keep_going:
+                result = await self._get_shelf_page(shelf, state['page'], sort=INCREMENTAL_SORT)
+                page_books: List[Book] = []
+                keep_going = self._consume_shelf_page(shelf, result, state, page_books)
+                if page_books:
+                    checked += len(page_books)
+                    changed += sum(1 for book in page_books if not self._is_known_book(book, known_books))
+                    yield page_books
+
+                if keep_going and result['books'] and all(self._is_known_book(book, known_books) for book in result['books']):
+                    self.logger.info("Page %s of %s shelf is unchanged, stopping early", result['page'], shelf)
+                    break
+
+        except Exception as e:
+            self.logger.exception("Error scraping %s shelf: %s", shelf, e)
+
+        self.logger.info("Found %s new or changed books in %s shelf (%s books checked)", changed, shelf, checked)
+
+    def _is_known_book(self, book: Book, known_books: Dict[str, Book]) -> bool:
+        """
+        Whether the stored copy of this book has the same BOOK_USER_FIELDS.
+        Community values like avg_rating drift without bumping date_updated,
+        so they don't count.
+        """
+        known = known_books.get(book.book_url)
+        if known is None:
+            return False
+        return same_content(book, known, exclude=NON_USER_FIELDS)
+
+    def _merge_known_books(self, shelves: List[str], shelf_results: List[List[Book]],
+                           known_books: Dict[str, Book]) -> List[List[Book]]:
+        """
+        Append stored books that were not re-scraped to their stored shelf.
+        A book that was scraped on any shelf this run replaces its stored copy.
+        """
+        scraped_urls = {book.book_url for shelf_books in shelf_results for book in shelf_books}
+        carried_over = self._carried_over_books(shelves, scraped_urls, known_books)
+        return [list(shelf_books) + remaining for shelf_books, remaining in zip(shelf_results, carried_over)]
+
+    def _carried_over_books(self, shelves: List[str], scraped_urls: set,
+                            known_books: Dict[str, Book]) -> List[List[Book]]:
+        """The stored books of each shelf that were not scraped on any shelf this run."""
+        carried_over = []
+        for shelf in shelves:
+            shelf_key = shelf.replace('-', '_')
+            carried_over.append([
+                book for url, book in known_books.items()
+                if book.shelf == shelf_key and url not in scraped_urls
+            ])
+
+        self.logger.info("Carried over %s unchanged books from the database", sum(map(len, carried_over)))
+        return carried_over
+
+    async def _get_shelf_page(self, shelf: str, page: int, sort: Optional[str] = None) -> Dict:
+        """Fetch and parse one shelf page off the event loop, within the concurrency cap."""
+        async with self._fetch_semaphore:
+            return await asyncio.to_thread(self._fetch_shelf_page, shelf, page, sort)
+
+    def _fetch_shelf_page(self, shelf: str, page: int, sort: Optional[str] = None) -> Dict:
+        """
+        Blocking fetch and parse of one shelf page. With a page cache, a
+        page that comes back unchanged reuses the books parsed last time.
+        A streaming shelf parser reads the body as it arrives instead of
+        buffering it whole. Each page is a `scrape.shelf_page` telemetry
+        span. With a streaming parser, its `peak_elements` attribute is the
+        most elements the parse held at once, the page's own memory
+        high-water mark whatever else the process is doing.
+        """
+        url = f"{self.base_url}/review/list/{self.user_id}?shelf={shelf}&page={page}&per_page=100"
+        if sort:
+            url += f"&sort={sort}&order=d"
+        with telemetry.span('scrape.shelf_page', shelf=shelf, page=page):
+            return self._fetch_shelf_page_result(url, shelf, page)
+
+    def _fetch_shelf_page_result(self, url: str, shelf: str, page: int) -> Dict:
+        cached = self.page_cache.lookup(self.user_id, url) if self.page_cache else None
+        streaming = self.shelf_parser.streaming
+        response = self._get(url, headers=PageCache.validators(cached), stream=streaming)
+
+        result = {'page': page, 'status': response.status_code, 'books': [], 'has_rows': False,
+                  'next_disabled': False, 'last_page': None}
+        parsed = None
+        try:
+            if response.status_code == 304 and cached:
+                result.update(self._cached_shelf_page(url, cached, not_modified=True))
+                result['status'] = 200
+                return result
+            if response.status_code != 200:
+                return result
+
+            if streaming:
+                # Hashed on the way through, an unchanged page is only known once it is read
+                digest = hashlib.sha256()
+                def chunks():
+                    for chunk in response.iter_content(STREAM_CHUNK_BYTES):
+                        digest.update(chunk)
+                        telemetry.count(bytes=len(chunk))
+                        yield chunk
+                parsed = self.shelf_parser.parse_stream(chunks(), shelf)
+                content_hash = digest.hexdigest()
+                peak_elements = parsed.pop('peak_elements', None)
+                if peak_elements is not None:
+                    telemetry.set_attribute('peak_elements', peak_elements)
+            else:
+                content_hash = body_hash(response.content) if self.page_cache else None
+        finally:
+            response.close()
+
+        if cached and cached['body_hash'] == content_hash:
+            result.update(self._cached_shelf_page(url, cached, not_modified=False))
+            return result
+
+        if parsed is None:
+            parsed = self.shelf_parser.parse(response.content, shelf)
+        result.update(parsed)
+        telemetry.count(pages=1, rows=len(result['books']))
+        if self.page_cache:
+            stored = dict(result, books=dump_many(result['books']))
+            del stored['page'], stored['status']
+            self.page_cache.store(self.user_id, url, response.headers, content_hash, stored)
+        return result
+
+    def _cached_shelf_page(self, url: str, cached: Dict, not_modified: bool) -> Dict:
+        """The parse result stored for an unchanged shelf page, with fresh Book objects."""
+        stored = self.page_cache.reuse(self.user_id, url, cached, not_modified)
+        stored['books'] = [book for book in validate_many(Book, stored['books']) if book]
+        telemetry.count(rows=len(stored['books']))
+        return stored
+
+    def _consume_shelf_page(self, shelf: str, result: Dict, state: Dict, books: List[Book]) -> bool:
+        """
+        Fold one fetched page into the shelf's results, applying the same
+        stop rules as a page-by-page walk. Returns False once the walk
+        should stop.
+        """
+        page = state['page']
+
+        if result['status'] != 200:
+            self.logger.warning("Got status code %s for %s page %s", result['status'], shelf, page)
+            return False
+
+        if not result['has_rows']:
+            state['consecutive_empty_pages'] += 1
+            if page == 1:
+                self.logger.info("No books found in %s shelf", shelf)
+                return False
+        else:
+            state['consecutive_empty_pages'] = 0
+            books.extend(result['books'])
+            if result['books']:
+                self.logger.debug("Page %s: Found %s books", page, len(result['books']))
+
+        if result['next_disabled']:
+            return False
+
+        state['page'] = page + 1
+
+        if state['page'] > MAX_SHELF_PAGES:
+            self.logger.warning("Reached page limit (%s) for %s shelf", MAX_SHELF_PAGES, shelf)
+            return False
+
+        return state['consecutive_empty_pages'] < 2
+
     def get_account_metadata(self) -> Dict:
         """Get general metadata about the account."""
         metadata = {}
         self.logger.info("Fetching account metadata...")
         
         try:
-            response = self.session.get(f"{self.base_url}/user/show/{self.user_id}")
-            soup = BeautifulSoup(response.content, 'html.parser')
-            
-            # ... (all your metadata parsing logic remains identical) ...
-            # Username
-            username_elem = soup.find('h1', class_='userProfileName')
-            if not username_elem:
-                username_elem = soup.find('h1')
-            if username_elem:
-                metadata['username'] = username_elem.text.strip()
-            
-            # Profile stats
-            stats_divs = soup.find_all('div', class_='leftContainer')
-            for div in stats_divs:
-                text = div.get_text()
-                books_match = re.search(r'(\d+)\s+books?', text, re.IGNORECASE)
-                if books_match:
-                    metadata['total_books'] = int(books_match.group(1))
-                friends_match = re.search(r'(\d+)\s+friends?', text, re.IGNORECASE)
-                if friends_match:
-                    metadata['friends_count'] = int(friends_match.group(1))
-                following_match = re.search(r'(\d+)\s+following', text, re.IGNORECASE)
-                if following_match:
-                    metadata['following_count'] = int(following_match.group(1))
-                followers_match = re.search(r'(\d+)\s+followers?', text, re.IGNORECASE)
-                if followers_match:
-                    metadata['followers_count'] = int(followers_match.group(1))
-            
-            # Year reading goal
-            goal_elem = soup.find('div', class_='challengePic')
-            if goal_elem:
-                goal_text = goal_elem.get_text()
-                goal_match = re.search(r'(\d+)\s+of\s+(\d+)', goal_text)
-                if goal_match:
-                    metadata['books_read_this_year'] = int(goal_match.group(1))
-                    metadata['yearly_reading_goal'] = int(goal_match.group(2))
-            
-            # Member since
-            profile_divs = soup.find_all('div', class_='infoBoxRowItem')
-            for div in profile_divs:
-                if 'member since' in div.get_text().lower():
-                    date_text = div.get_text().replace('member since', '').strip()
-                    metadata['member_since'] = date_text
-            
-            # Get shelf counts
-            shelves_elem = soup.find('div', id='shelvesSection')
-            if shelves_elem:
-                shelf_links = shelves_elem.find_all('a', href=re.compile(r'/review/list/'))
-                for link in shelf_links:
-                    shelf_text = link.get_text()
-                    count_match = re.search(r'\((\d+)\)', shelf_text)
-                    if count_match:
-                        shelf_name = shelf_text.split('(')[0].strip()
-                        metadata[f'shelf_{shelf_name.replace(" ", "_").replace("-", "_")}'] = int(count_match.group(1))
-            
+            response, soup = self._get_profile_page()
+            if soup is None:
+                raise ValueError(f"Got status code {response.status_code} for the profile page")
+            metadata.update(self._account_metadata_from_soup(soup))
             metadata['user_id'] = self.user_id
             metadata['scraped_at'] = datetime.now().isoformat()
             
@@ -389,170 +714,137 @@ class Katalog:
             
         return metadata
 
-    async def get_home_feed_activity(self) -> List[FeedActivity]:
-        """Scrape home page feed activity using Playwright's Async API."""
+    def _parse_account_metadata(self, content: bytes) -> Dict:
+        """Parse the account metadata out of a profile page."""
+        from bs4 import BeautifulSoup
+        return self._account_metadata_from_soup(BeautifulSoup(content, 'html.parser'))
+
+    def _account_metadata_from_soup(self, soup) -> Dict:
+        """The account metadata of a parsed profile page. Only reads `soup`, it may be shared."""
+        metadata = {}
+
+        # Username
+        username_elem = soup.find('h1', class_='userProfileName')
+        if not username_elem:
+            username_elem = soup.find('h1')
+        if username_elem:
+            metadata['username'] = username_elem.text.strip()
+        
+        # Profile stats
+        stats_divs = soup.find_all('div', class_='leftContainer')
+        for div in stats_divs:
+            text = div.get_text()
+            books_match = re.search(r'(\d+)\s+books?', text, re.IGNORECASE)
+            if books_match:
+                metadata['total_books'] = int(books_match.group(1))
+            friends_match = re.search(r'(\d+)\s+friends?', text, re.IGNORECASE)
+            if friends_match:
+                metadata['friends_count'] = int(friends_match.group(1))
+            following_match = re.search(r'(\d+)\s+following', text, re.IGNORECASE)
+            if following_match:
+                metadata['following_count'] = int(following_match.group(1))
+            followers_match = re.search(r'(\d+)\s+followers?', text, re.IGNORECASE)
+            if followers_match:
+                metadata['followers_count'] = int(followers_match.group(1))
+        
+        # Year reading goal
+        goal_elem = soup.find('div', class_='challengePic')
+        if goal_elem:
+            goal_text = goal_elem.get_text()
+            goal_match = re.search(r'(\d+)\s+of\s+(\d+)', goal_text)
+            if goal_match:
+                metadata['books_read_this_year'] = int(goal_match.group(1))
+                metadata['yearly_reading_goal'] = int(goal_match.group(2))
+        
+        # Member since
+        profile_divs = soup.find_all('div', class_='infoBoxRowItem')
+        for div in profile_divs:
+            if 'member since' in div.get_text().lower():
+                date_text = div.get_text().replace('member since', '').strip()
+                metadata['member_since'] = date_text
+        
+        # Get shelf counts
+        shelves_elem = soup.find('div', id='shelvesSection')
+        if shelves_elem:
+            shelf_links = shelves_elem.find_all('a', href=re.compile(r'/review/list/'))
+            for link in shelf_links:
+                shelf_text = link.get_text()
+                count_match = re.search(r'\((\d+)\)', shelf_text)
+                if count_match:
+                    shelf_name = shelf_text.split('(')[0].strip()
+                    metadata[f'shelf_{shelf_name.replace(" ", "_").replace("-", "_")}'] = int(count_match.group(1))
+
+        return metadata
+
+    async def get_home_feed_activity(self, high_water_mark: Optional[datetime] = None) -> List[FeedActivity]:
+        """
+        Scrape home page feed activity using Playwright's Async API.
+
+        Without a `high_water_mark` only the first screen of the feed is read.
+        With one, the feed is scrolled until an item at or older than the mark
+        has loaded, bounded by `feed_max_items` and `feed_max_seconds`.
+        """
         activities = []
         self.logger.info("Fetching home feed with Playwright (Async)...")
+        limit = FEED_ITEM_LIMIT if high_water_mark is None else self.feed_max_items
 
-        try:            
-            async with async_playwright() as p:
-                browser = await p.chromium.launch(headless=True)
-                context = await browser.new_context(user_agent=self.headers['User-Agent'])
-                
+        try:
+            async with self._browser_context() as context:
                 playwright_cookies = []
                 for name, value in self.cookies.items():
                     playwright_cookies.append({
-                        'name': name, 'value': value, 'domain': '.goodreads.com', 'path': '/'
+                        'name': name, 'value': value, 'domain': self.cookie_domain, 'path': '/'
                     })
                 await context.add_cookies(playwright_cookies)
+
+                if self.lean_browser:
+                    await context.route('**/*', self._route_feed_request)
                 
                 page = await context.new_page()
-                await page.goto(self.base_url)
+                # The feed is rendered by scripts, there is no need to wait for the full `load`
+                await page.goto(self.base_url, wait_until='domcontentloaded' if self.lean_browser else 'load')
                 
                 try:
-                    await page.wait_for_selector('div.gr-newsfeedItem', timeout=20000)
-                    self.logger.info("Feed container found. Parsing items...")
-                    await asyncio.sleep(3)
+                    await page.wait_for_selector(FEED_ITEM_SELECTOR, state='attached', timeout=20000)
+                    self.logger.info("Feed container found. Waiting for items to settle...")
+                    item_count = await self._wait_for_feed_items(page, FEED_ITEM_LIMIT)
+                    if high_water_mark is not None:
+                        item_count = await self._scroll_feed_to(page, high_water_mark, item_count)
+                    self.logger.info("Feed settled with %s items. Parsing items...", item_count)
                 except Exception as e:
                     self.logger.warning("Timed out waiting for feed items: %s", e)
                     # Save to /app/output for container consistency
                     output_dir = '/app/output'
                     os.makedirs(output_dir, exist_ok=True)
-                    screenshot_path = os.path.join(output_dir, 'debug_screenshot.png')
+                    screenshot_path = os.path.join(output_dir, f'debug_screenshot_{self.user_id}.png' if self.shared_browser else 'debug_screenshot.png')
                     await page.screenshot(path=screenshot_path)
                     self.logger.info(f"Saved debug screenshot to {screenshot_path}")
                     pass # Don't raise, just return empty list
 
-                html_content = await page.content()
-                await browser.close()
-                
-                soup = BeautifulSoup(html_content, 'html.parser')
-                feed_items = soup.find_all('div', class_='gr-newsfeedItem')
-                
-                if not feed_items:
-                    self.logger.info("No feed items found in the rendered HTML.")
-                    return []
+                if self.cassette is not None:
+                    # What the browser saw, so a replay can serve the feed as static HTML
+                    self.cassette.record('GET', page.url, 200, {'Content-Type': 'text/html; charset=utf-8'},
+                                         (await page.content()).encode('utf-8'), kind='browser')
 
-                for item in feed_items[:50]:
+                raw_items = None
+                if self.feed_extraction == 'browser':
                     try:
-                        activity = {}
-                        
-                        # User info
-                        user_link = item.find('a', class_='gr-user__profileLink')
-                        if user_link:
-                            user_text = user_link.text.strip()
-                            user_url = user_link.get('href', '')
-                            
-                            # List of action texts that might be inside the link
-                            action_texts = ('wants to read', 'is currently reading', 
-                                              'started reading', 'finished reading', 
-                                              'has read', 'rated', 'reviewed', 'added', 'made progress on')
-
-                            # If the link text is an action, parse name from URL
-                            if user_text.lower() in action_texts:
-                                if user_url and '-' in user_url:
-                                    # Get name from '.../12345-user-name'
-                                    name_part = user_url.split('-')[-1]
-                                    # Format it to be readable
-                                    activity['user_name'] = ' '.join(
-                                        [word.capitalize() for word in name_part.split('-')]
-                                    )
-                                else:
-                                    activity['user_name'] = "Unknown" # Fallback
-                            else:
-                                activity['user_name'] = user_text
-                            
-                            activity['user_url'] = user_url
-                        
-                        # Header
-                        header = item.find('div', class_='gr-newsfeedItem__header')
-                        if header:
-                            header_text = header.get_text(' ', strip=True)
-                            if 'wants to read' in header_text: activity['action'] = 'wants_to_read'
-                            elif 'is currently reading' in header_text: activity['action'] = 'currently_reading'  
-                            elif 'started reading' in header_text: activity['action'] = 'started_reading'
-                            elif 'finished reading' in header_text or 'has read' in header_text: activity['action'] = 'read'
-                            elif 'rated' in header_text:
-                                activity['action'] = 'rated'
-                                rating_elem = item.find('div', class_='communityRating__stars')
-                                if rating_elem and rating_elem.get('style'):
-                                    width_match = re.search(r'width:\s*(\d+)%', rating_elem.get('style', ''))
-                                    if width_match: activity['rating'] = round(int(width_match.group(1)) / 20)
-                            elif 'reviewed' in header_text: activity['action'] = 'reviewed'
-                            elif 'added' in header_text: activity['action'] = 'added_book'
-                            elif 'made progress on' in header_text: activity['action'] = 'progress'
-                            else: activity['action'] = 'other'
-                            activity['header_text'] = header_text[:200]
-                        
-                        # Book details
-                        book_title = item.find('a', class_='gr-book__titleLink')
-                        if book_title:
-                            activity['book_title'] = book_title.text.strip()
-                            activity['book_url'] = book_title.get('href', '')
-                            if activity['book_url'] and not activity['book_url'].startswith('http'):
-                                activity['book_url'] = self.base_url + activity['book_url']
-                        
-                        # Author
-                        author_link = item.find('a', class_='gr-book__authorLink')
-                        if author_link:
-                            activity['author'] = author_link.text.strip()
-                            activity['author_url'] = author_link.get('href', '')
-                            if activity['author_url'] and not activity['author_url'].startswith('http'):
-                                activity['author_url'] = self.base_url + activity['author_url']
-                        
-                        timestamp_elem = item.find('small', class_='gr-newsfeedItem__headerTimestamp')
-                        if timestamp_elem:
-                            time_tag = timestamp_elem.find('time')
-                            
-                            # Case 1: Found a <time> tag inside
-                            if time_tag and time_tag.get('datetime'):
-                                activity['timestamp'] = time_tag.get('datetime', '')
-                                activity['time_ago'] = time_tag.text.strip()
-                            # Case 2: Check the <small> tag itself for datetime
-                            elif timestamp_elem.get('datetime'):
-                                activity['timestamp'] = timestamp_elem.get('datetime', '')
-                                activity['time_ago'] = timestamp_elem.text.strip()
-                            # Case 3: Just get text
-                            else:
-                                activity['time_ago'] = timestamp_elem.get_text(strip=True)
-                        
-                        # Description
-                        book_desc = item.find('div', class_='gr-book__description')
-                        if book_desc:
-                            desc_text = book_desc.get_text(' ', strip=True)
-                            desc_text = re.sub(r'Continue reading$', '', desc_text).strip()
-                            activity['book_description'] = desc_text[:500]
-                        
-                        if activity.get('user_name') or activity.get('book_title'):
-                            try:
-                                activity_obj = FeedActivity(
-                                    user_name=activity.get('user_name'),
-                                    user_url=activity.get('user_url'),
-                                    action=activity.get('action'),
-                                    header_text=activity.get('header_text'),
-                                    book_title=activity.get('book_title'),
-                                    book_url=activity.get('book_url'),
-                                    author=activity.get('author'),
-                                    author_url=activity.get('author_url'),
-                                    timestamp=activity.get('timestamp'),
-                                    time_ago=activity.get('time_ago'),
-                                    rating=activity.get('rating'),
-                                    book_description=activity.get('book_description')
-                                )
-                                activities.append(activity_obj)
-                            except pydantic.ValidationError as e:
-                                self.logger.warning(
-                                    "Skipping feed item, failed validation: %s. Data: %s",
-                                    e, activity
-                                )
-                                continue
-
+                        raw_items = await page.evaluate(FEED_EXTRACT_SCRIPT, [FEED_ITEM_SELECTOR, limit])
                     except Exception as e:
-                        # Log the non-fatal error but continue the loop
-                        self.logger.warning("Skipping problematic feed item: %s", e, exc_info=True)
-                        continue
+                        self.logger.warning("In-browser feed extraction failed, falling back to HTML parsing: %s", e)
+
+                if raw_items is None:
+                    html_content = await page.content()
+                
+            if raw_items is not None:
+                if not raw_items:
+                    self.logger.info("No feed items found in the rendered page.")
+                activities = self._build_feed_activities(raw_items)
+            else:
+                activities = await asyncio.to_thread(self._parse_feed_html, html_content, limit)
             
             self.logger.info("Found %s activities in feed", len(activities))
+            telemetry.count(pages=1, rows=len(activities))
             
         except Exception as e:
             # This is a fatal error for this function
@@ -560,6 +852,266 @@ class Katalog:
             
         return activities
     
+    @asynccontextmanager
+    async def _browser_context(self):
+        """A fresh browser context, in the shared browser or in one launched for this call."""
+        if self.shared_browser is not None:
+            browser = await self.shared_browser.get()
+            context = await browser.new_context(user_agent=self.headers['User-Agent'])
+            try:
+                yield context
+            finally:
+                await context.close()
+            return
+
+        # Playwright is by far the heaviest import, only the feed needs it
+        from playwright.async_api import async_playwright
+        async with async_playwright() as p:
+            browser = await p.chromium.launch(headless=True, args=LEAN_CHROMIUM_ARGS if self.lean_browser else None)
+            try:
+                yield await browser.new_context(user_agent=self.headers['User-Agent'])
+            finally:
+                await browser.close()
+
+    async def _route_feed_request(self, route):
+        """Lean browser mode: abort heavy resources and third-party requests."""
+        request = route.request
+        host = urlparse(request.url).hostname or ''
+        first_party = any(host == domain or host.endswith('.' + domain) for domain in self.browser_allowed_domains)
+        if request.resource_type in BLOCKED_RESOURCE_TYPES or not first_party:
+            await route.abort()
+        else:
+            await route.continue_()
+
+    async def _wait_for_feed_items(self, page, target: int, stable_checks: int = 3,
+                                   interval: float = 0.25, max_wait: float = 5.0) -> int:
+        """
+        Wait until the feed item count reaches `target` or stops growing for
+        `stable_checks` polls in a row, giving up after `max_wait` seconds.
+        Returns the last item count seen.
+        """
+        feed_items = page.locator(FEED_ITEM_SELECTOR)
+        deadline = time.monotonic() + max_wait
+        count = await feed_items.count()
+        unchanged = 0
+        while count < target and unchanged < stable_checks and time.monotonic() < deadline:
+            await asyncio.sleep(interval)
+            new_count = await feed_items.count()
+            unchanged = unchanged + 1 if new_count == count else 0
+            count = new_count
+        return count
+
+    async def _scroll_feed_to(self, page, high_water_mark: datetime, count: int) -> int:
+        """
+        Scroll the feed until an item at or older than `high_water_mark` has
+        loaded, the feed stops growing, or `feed_max_items` or
+        `feed_max_seconds` is reached. Returns the number of loaded items.
+        """
+        if high_water_mark.tzinfo is None:
+            high_water_mark = high_water_mark.replace(tzinfo=timezone.utc)
+        deadline = time.monotonic() + self.feed_max_seconds
+        checked = 0
+
+        while True:
+            # The feed is newest first, only newly loaded items need checking
+            timestamps = await page.evaluate(FEED_TIMESTAMPS_SCRIPT, [FEED_ITEM_SELECTOR, checked])
+            checked += len(timestamps)
+            if any(self._is_at_or_before(ts, high_water_mark) for ts in timestamps):
+                self.logger.info("Reached the feed high-water mark after %s items.", count)
+                break
+            if count >= self.feed_max_items:
+                self.logger.warning("Stopped scrolling the feed at the %s item limit before reaching the high-water mark.", self.feed_max_items)
+                break
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                self.logger.warning("Stopped scrolling the feed after %ss before reaching the high-water mark.", self.feed_max_seconds)
+                break
+
+            await page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
+            new_count = await self._wait_for_feed_items(page, count + 1, max_wait=min(5.0, remaining))
+            if new_count <= count:
+                self.logger.info("Feed stopped growing at %s items.", count)
+                break
+            count = new_count
+
+        return count
+
+    @staticmethod
+    def _is_at_or_before(timestamp: Optional[str], high_water_mark: datetime) -> bool:
+        """True if a feed item timestamp is at or older than the (aware) high-water mark."""
+        if not timestamp:
+            return False
+        try:
+            item_time = dateutil.parser.isoparse(timestamp)
+        except ValueError:
+            return False
+        if item_time.tzinfo is None:
+            item_time = item_time.replace(tzinfo=timezone.utc)
+        return item_time <= high_water_mark
+
+    def _parse_feed_html(self, html_content: str, limit: int = FEED_ITEM_LIMIT) -> List[FeedActivity]:
+        """Parse up to `limit` feed items out of the rendered home page HTML."""
+        from bs4 import BeautifulSoup
+        soup = BeautifulSoup(html_content, 'html.parser')
+        feed_items = soup.find_all('div', class_='gr-newsfeedItem')
+
+        if not feed_items:
+            self.logger.info("No feed items found in the rendered HTML.")
+            return []
+
+        raw_items = []
+        for item in feed_items[:limit]:
+            try:
+                raw_items.append(self._extract_feed_item(item))
+            except Exception as e:
+                # Log the non-fatal error but continue the loop
+                self.logger.warning("Skipping problematic feed item: %s", e, exc_info=True)
+                continue
+
+        return self._build_feed_activities(raw_items)
+
+    def _extract_feed_item(self, item) -> Dict:
+        """
+        Pull the raw fields of one feed item out of the parsed HTML. Mirrors
+        FEED_EXTRACT_SCRIPT, which does the same inside the browser. Keys are
+        only set when the matching element exists.
+        """
+        raw = {}
+
+        user_link = item.find('a', class_='gr-user__profileLink')
+        if user_link:
+            raw['user_text'] = user_link.text.strip()
+            raw['user_url'] = user_link.get('href', '')
+
+        header = item.find('div', class_='gr-newsfeedItem__header')
+        if header:
+            raw['header_text'] = header.get_text(' ', strip=True)
+
+        rating_elem = item.find('div', class_='communityRating__stars')
+        if rating_elem:
+            raw['rating_style'] = rating_elem.get('style')
+
+        book_title = item.find('a', class_='gr-book__titleLink')
+        if book_title:
+            raw['book_title'] = book_title.text.strip()
+            raw['book_url'] = book_title.get('href', '')
+
+        author_link = item.find('a', class_='gr-book__authorLink')
+        if author_link:
+            raw['author'] = author_link.text.strip()
+            raw['author_url'] = author_link.get('href', '')
+
+        timestamp_elem = item.find('small', class_='gr-newsfeedItem__headerTimestamp')
+        if timestamp_elem:
+            time_tag = timestamp_elem.find('time')
+
+            # Case 1: Found a <time> tag inside
+            if time_tag and time_tag.get('datetime'):
+                raw['timestamp'] = time_tag.get('datetime', '')
+                raw['time_ago'] = time_tag.text.strip()
+            # Case 2: Check the <small> tag itself for datetime
+            elif timestamp_elem.get('datetime'):
+                raw['timestamp'] = timestamp_elem.get('datetime', '')
+                raw['time_ago'] = timestamp_elem.text.strip()
+            # Case 3: Just get text
+            else:
+                raw['time_ago'] = timestamp_elem.get_text(strip=True)
+
+        book_desc = item.find('div', class_='gr-book__description')
+        if book_desc:
+            raw['description'] = book_desc.get_text(' ', strip=True)
+
+        return raw
+
+    def _build_feed_activities(self, raw_items: List[Dict]) -> List[FeedActivity]:
+        """Map raw feed item fields, from either extraction path, into FeedActivity objects."""
+        activities = []
+
+        for raw in raw_items:
+            try:
+                activity = {}
+
+                # User info
+                if 'user_text' in raw:
+                    user_text = raw['user_text']
+                    user_url = raw['user_url']
+
+                    # List of action texts that might be inside the link
+                    action_texts = ('wants to read', 'is currently reading', 
+                                      'started reading', 'finished reading', 
+                                      'has read', 'rated', 'reviewed', 'added', 'made progress on')
+
+                    # If the link text is an action, parse name from URL
+                    if user_text.lower() in action_texts:
+                        if user_url and '-' in user_url:
+                            # Get name from '.../12345-user-name'
+                            name_part = user_url.split('-')[-1]
+                            # Format it to be readable
+                            activity['user_name'] = ' '.join(
+                                [word.capitalize() for word in name_part.split('-')]
+                            )
+                        else:
+                            activity['user_name'] = "Unknown" # Fallback
+                    else:
+                        activity['user_name'] = user_text
+
+                    activity['user_url'] = user_url
+
+                # Header
+                if 'header_text' in raw:
+                    header_text = raw['header_text']
+                    if 'wants to read' in header_text: activity['action'] = 'wants_to_read'
+                    elif 'is currently reading' in header_text: activity['action'] = 'currently_reading'  
+                    elif 'started reading' in header_text: activity['action'] = 'started_reading'
+                    elif 'finished reading' in header_text or 'has read' in header_text: activity['action'] = 'read'
+                    elif 'rated' in header_text:
+                        activity['action'] = 'rated'
+                        rating_style = raw.get('rating_style')
+                        if rating_style:
+                            width_match = re.search(r'width:\s*(\d+)%', rating_style)
+                            if width_match: activity['rating'] = round(int(width_match.group(1)) / 20)
+                    elif 'reviewed' in header_text: activity['action'] = 'reviewed'
+                    elif 'added' in header_text: activity['action'] = 'added_book'
+                    elif 'made progress on' in header_text: activity['action'] = 'progress'
+                    else: activity['action'] = 'other'
+                    activity['header_text'] = header_text[:200]
+
+                # Book details
+                if 'book_title' in raw:
+                    activity['book_title'] = raw['book_title']
+                    activity['book_url'] = raw['book_url']
+                    if activity['book_url'] and not activity['book_url'].startswith('http'):
+                        activity['book_url'] = GOODREADS_URL + activity['book_url']
+
+                # Author
+                if 'author' in raw:
+                    activity['author'] = raw['author']
+                    activity['author_url'] = raw['author_url']
+                    if activity['author_url'] and not activity['author_url'].startswith('http'):
+                        activity['author_url'] = GOODREADS_URL + activity['author_url']
+
+                # Timestamp
+                if 'timestamp' in raw:
+                    activity['timestamp'] = raw['timestamp']
+                if 'time_ago' in raw:
+                    activity['time_ago'] = raw['time_ago']
+
+                # Description
+                if 'description' in raw:
+                    desc_text = re.sub(r'Continue reading$', '', raw['description']).strip()
+                    activity['book_description'] = desc_text[:500]
+
+                if activity.get('user_name') or activity.get('book_title'):
+                    activities.append(activity)
+
+            except Exception as e:
+                # Log the non-fatal error but continue the loop
+                self.logger.warning("Skipping problematic feed item: %s", e, exc_info=True)
+                continue
+
+        # Validated all at once, items failing validation are logged and skipped
+        return [activity for activity in validate_many(FeedActivity, activities) if activity]
+
     def get_reading_challenge_details(self) -> Dict:
         """Get detailed reading challenge information using the API endpoint."""
         challenge_data = {}
@@ -567,38 +1119,15 @@ class Katalog:
         
         try:
             api_url = f"{self.base_url}/readingchallenges/goals/data"
-            response = self.session.get(api_url)
+            response = self._get(api_url)
             
             if response.status_code == 200:
                 try:
                     data = response.json()
                     
-                    # ... (all your challenge parsing logic remains identical) ...
-                    if 'readingGoal' in data:
-                        challenge_data['goal'] = data['readingGoal']
-                    if 'booksRead' in data:
-                        books_read_data = ast.literal_eval(data['booksRead'])
-                        challenge_data['books_completed'] = len(books_read_data) if isinstance(books_read_data, list) else 0
-                    
-                    if 'goal' in challenge_data and challenge_data['goal'] > 0:
-                        books_completed = challenge_data.get('books_completed', 0)
-                        challenge_data['percentage'] = round((books_completed / challenge_data['goal']) * 100, 2)
-                        
-                        current_day = datetime.now().timetuple().tm_yday
-                        days_in_year = 365
-                        expected_progress = (current_day / days_in_year) * challenge_data['goal']
-                        books_difference = books_completed - expected_progress
-                        
-                        if books_difference > 0:
-                            challenge_data['books_ahead'] = round(books_difference, 1)
-                        else:
-                            challenge_data['books_behind'] = round(abs(books_difference), 1)
-                    
-                    if 'readingProgress' in data:
-                        challenge_data['reading_progress'] = data['readingProgress']
-                    
-                    challenge_data['year'] = datetime.now().year
-                    
+                    challenge_data.update(self._parse_reading_challenge(data))
+                    telemetry.count(pages=1, rows=1)
+
                 except Exception as e: # Changed from JSONDecodeError to catch ast.literal_eval
                     self.logger.error("Failed to parse JSON response: %s. Response text: %s", e, response.text[:500])
             else:
@@ -609,105 +1138,111 @@ class Katalog:
             
         return challenge_data
 
+    def _parse_reading_challenge(self, data: Dict) -> Dict:
+        """Parse the reading challenge out of the goals API response."""
+        challenge_data = {}
+        if 'readingGoal' in data:
+            challenge_data['goal'] = data['readingGoal']
+        if 'booksRead' in data:
+            books_read_data = ast.literal_eval(data['booksRead'])
+            challenge_data['books_completed'] = len(books_read_data) if isinstance(books_read_data, list) else 0
+        
+        if 'goal' in challenge_data and challenge_data['goal'] > 0:
+            books_completed = challenge_data.get('books_completed', 0)
+            challenge_data['percentage'] = round((books_completed / challenge_data['goal']) * 100, 2)
+            
+            current_day = datetime.now().timetuple().tm_yday
+            days_in_year = 365
+            expected_progress = (current_day / days_in_year) * challenge_data['goal']
+            books_difference = books_completed - expected_progress
+            
+            if books_difference > 0:
+                challenge_data['books_ahead'] = round(books_difference, 1)
+            else:
+                challenge_data['books_behind'] = round(abs(books_difference), 1)
+        
+        if 'readingProgress' in data:
+            challenge_data['reading_progress'] = data['readingProgress']
+        
+        challenge_data['year'] = datetime.now().year
+
+        return challenge_data
+
     def _parse_date(self, date_str: str) -> Optional[str]:
         # This is a utility function, no logging needed
-        if not date_str: return None
-        date_str = date_str.strip()
-        if 'unknown' in date_str.lower() or 'not set' in date_str.lower(): return None
-        date_str = re.sub(r'^\w+,\s*', '', date_str).strip()
-        date_str = re.sub(r'\s+\d+:\d+(AM|PM)?$', '', date_str).strip()
-        try:
-            if re.match(r'^\d{1,2},\s*\d{4}$', date_str):
-                year = date_str.split(',')[-1].strip()
-                return year if len(year) == 4 and year.isdigit() else None
-            if re.match(r'^[A-Za-z]{3,}\s+\d{1,2},\s+\d{4}$', date_str):
-                try: date_obj = datetime.strptime(date_str, "%b %d, %Y")
-                except ValueError: date_obj = datetime.strptime(date_str, "%B %d, %Y")
-                return date_obj.strftime("%Y-%m-%d")
-            if re.match(r'^[A-Za-z]{3,}\s+\d{4}$', date_str):
-                try: date_obj = datetime.strptime(date_str, "%b %Y")
-                except ValueError: date_obj = datetime.strptime(date_str, "%B %Y")
-                return date_obj.strftime("%Y-%m")
-            if len(date_str) == 4 and date_str.isdigit():
-                return date_str
-            return date_str
-        except Exception:
-            return date_str
+        return self.dates(date_str)
     
     def calculate_statistics(self, books_data: Dict) -> Dict:
         # This is a pure function, no logging needed
-        stats = {
-            'books_per_month': {}, 'books_per_year': {}, 'books_read_per_month': {},
-            'books_read_per_year': {}, 'overall_stats': {}, 'status_change_frequency': {},
-            'shelf_additions_per_month': {}, 'shelf_additions_per_year': {}, 'reading_pace': {}
-        }
-        if not books_data['all_books']: return stats
-        df = pd.DataFrame([book.model_dump() for book in books_data['all_books']])
-        date_columns = ['date_added', 'date_read', 'date_started']
-        for col in date_columns:
-            if col in df.columns:
-                df[col] = pd.to_datetime(df[col], errors='coerce')
-        read_valid = df[(df['shelf'] == 'read') & (df['date_read'].notna())]
-        if not read_valid.empty:
-            monthly_read = read_valid.groupby(read_valid['date_read'].dt.to_period('M')).size()
-            yearly_read = read_valid.groupby(read_valid['date_read'].dt.year).size()
-            stats['books_read_per_month'] = {str(k): int(v) for k, v in monthly_read.to_dict().items()}
-            stats['books_read_per_year'] = {int(k): int(v) for k, v in yearly_read.to_dict().items() if pd.notna(k)}
-        added_valid = df[df['date_added'].notna()]
-        if not added_valid.empty:
-            monthly_added = added_valid.groupby(added_valid['date_added'].dt.to_period('M')).size()
-            yearly_added = added_valid.groupby(added_valid['date_added'].dt.year).size()
-            stats['books_per_month'] = {str(k): int(v) for k, v in monthly_added.to_dict().items()}
-            stats['books_per_year'] = {int(k): int(v) for k, v in yearly_added.to_dict().items() if pd.notna(k)}
-        stats['overall_stats'] = {
-            'total_books': len(df), 'read': len(df[df['shelf'] == 'read']),
-            'currently_reading': len(df[df['shelf'] == 'currently_reading']),
-            'want_to_read': len(df[df['shelf'] == 'to_read']),
-            'average_rating': round(df['rating'].mean(), 2) if 'rating' in df.columns and df['rating'].notna().any() else None,
-            'total_pages_read': int(df[df['shelf'] == 'read']['num_pages'].sum()) if 'num_pages' in df.columns else None,
-            'average_pages_per_book': round(df['num_pages'].mean(), 1) if 'num_pages' in df.columns and df['num_pages'].notna().any() else None
-        }
-        for shelf in ['read', 'currently_reading', 'to_read']:
-            shelf_valid = df[(df['shelf'] == shelf) & (df['date_added'].notna())]
-            if not shelf_valid.empty:
-                monthly_shelf = shelf_valid.groupby(shelf_valid['date_added'].dt.to_period('M')).size()
-                yearly_shelf = shelf_valid.groupby(shelf_valid['date_added'].dt.year).size()
-                stats['shelf_additions_per_month'][shelf] = {str(k): int(v) for k, v in monthly_shelf.to_dict().items()}
-                stats['shelf_additions_per_year'][shelf] = {int(k): int(v) for k, v in yearly_shelf.to_dict().items() if pd.notna(k)}
-        if 'date_read' in df.columns and 'date_added' in df.columns:
-            valid_days = df[(df['shelf'] == 'read') & df['date_read'].notna() & df['date_added'].notna()]
-            if not valid_days.empty:
-                valid_days = valid_days.copy()
-                valid_days['days_to_read'] = (valid_days['date_read'] - valid_days['date_added']).dt.days
-                valid_days = valid_days[valid_days['days_to_read'] >= 0]
-                if not valid_days.empty:
-                    stats['status_change_frequency']['avg_days_to_read'] = round(valid_days['days_to_read'].mean(), 1)
-                    stats['status_change_frequency']['median_days_to_read'] = round(valid_days['days_to_read'].median(), 1)
-        return stats
+        return calculate_statistics(books_data['all_books'])
+
+    def build_statistics(self, books_data: Dict, known_books: Optional[Dict[str, Book]] = None,
+                         statistics_state: Optional[Dict] = None, verify: bool = False) -> StatisticsAggregator:
+        """
+        Aggregate the statistics of `books_data`.
+
+        On an incremental sync with a stored `statistics_state`, only the books
+        that differ from `known_books` are applied to that state. Otherwise,
+        or if the state cannot be used, every book is aggregated from scratch.
+        With `verify`, an updated state is checked against a full rebuild and
+        the rebuild is used if they disagree. See `StatisticsBuilder`.
+        """
+        builder = StatisticsBuilder(known_books, statistics_state, verify)
+        builder.add_all(books_data['all_books'])
+        return builder.finish()
     
-    async def scrape(self) -> Dict:
-        """Main method to scrape all data."""
+    async def _timed(self, name: str, awaitable):
+        """Await `awaitable` in a `scrape.<name>` telemetry span and log how long it took."""
+        with telemetry.span(f"scrape.{name.lower().replace(' ', '_')}") as phase:
+            result = await awaitable
+        self.logger.info("%s phase took %.1fs", name, phase.duration)
+        return result
+
+    async def scrape(self, known_books: Optional[Dict[str, Book]] = None,
+                     feed_high_water_mark: Optional[datetime] = None,
+                     on_book_page: Optional[Callable[[List[Book]], Any]] = None,
+                     statistics_state: Optional[Dict] = None, verify_statistics: bool = False,
+                     on_books: Optional[Callable[[List[Book]], Any]] = None, keep_books: bool = True) -> Dict:
+        """
+        Main method to scrape all data. Pass the stored books as
+        `known_books` to sync the shelves incrementally, and the newest stored
+        feed timestamp as `feed_high_water_mark` to read the feed back to it.
+        `on_book_page` receives each scraped shelf page and `on_books` the
+        whole library a batch at a time, see `get_books_data`, which also
+        explains `keep_books`. The statistics are aggregated as the books
+        come in. The stored `statistics_state` is updated from the changed
+        books, see `build_statistics`, and returned as `statistics_state`.
+        """
         self.logger.info("Starting Goodreads scraping...")
         self.logger.info("User ID: %s", self.user_id)
+        # Pages from an earlier run may be stale
+        self.page_memo.clear()
         
-        if not self.verify_session():
+        if not await self._timed("Session check", asyncio.to_thread(self.verify_session)):
             self.logger.error("Session verification failed. Aborting scrape.")
             return {"error": "Invalid or expired session cookie. Please update your cookie."}
         
-        self.logger.info("Scraping home feed activity...")
-        feed_activity = await self.get_home_feed_activity()
-
-        self.logger.info("Scraping books data...")
-        books_data = self.get_books_data()
-        
-        self.logger.info("Getting account metadata...")
-        metadata = self.get_account_metadata()
-        
-        self.logger.info("Getting reading challenge details...")
-        challenge = self.get_reading_challenge_details()
+        # The browser feed scrape mostly waits on page loads, so run it
+        # alongside the HTTP phases. Blocking calls go to worker threads.
+        self.logger.info("Scraping home feed activity, books data, account metadata and reading challenge details...")
+        statistics_builder = StatisticsBuilder(known_books, statistics_state, verify_statistics)
+        def add_books(books: List[Book]):
+            statistics_builder.add_all(books)
+            if on_books:
+                on_books(books)
+        started_at = time.monotonic()
+        feed_activity, books_data, metadata, challenge = await asyncio.gather(
+            self._timed("Home feed", self.get_home_feed_activity(feed_high_water_mark)),
+            self._timed("Books", self.get_books_data(known_books, on_book_page, add_books, keep_books)),
+            self._timed("Account metadata", asyncio.to_thread(self.get_account_metadata)),
+            self._timed("Reading challenge", asyncio.to_thread(self.get_reading_challenge_details))
+        )
+        self.logger.info("Scraping phases finished in %.1fs", time.monotonic() - started_at)
         
         self.logger.info("Calculating statistics...")
-        statistics = self.calculate_statistics(books_data)
+        with telemetry.span('scrape.statistics', books=books_data['book_count']):
+            aggregator = statistics_builder.finish()
+            statistics = aggregator.result()
         
         all_data = {
             'metadata': metadata,
@@ -715,8 +1250,18 @@ class Katalog:
             'feed_activity': feed_activity,
             'reading_challenge': challenge,
             'statistics': statistics,
+            'statistics_state': aggregator.to_dict(),
             'scraped_timestamp': datetime.now().isoformat()
         }
         
+        self.logger.info("Request stats: %s", self.rate_limiter.stats())
+        if self.page_cache:
+            self.logger.info("HTTP cache stats: %s", self.page_cache.stats())
+            row_stats = self.page_cache.rows.stats()
+            self.logger.info("Row memo stats: %s", row_stats)
+            telemetry.set_attribute('row_memo_hit_rate', row_stats['hit_rate'])
+        memo_stats = self.page_memo.stats()
+        self.logger.info("Page memo stats: %s", memo_stats)
+        telemetry.set_attribute('page_memo_hits', memo_stats['hits'] + memo_stats['shared'])
         self.logger.info("Scraping complete!")
         return all_data
\ No newline at end of file
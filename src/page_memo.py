@@ -0,0 +1,91 @@
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+import requests
+
+class PageMemo:
+    """
+    Run-scoped memo of fetched pages and the documents parsed from them.
+
+    The first caller for a URL fetches it, and concurrent callers wait for
+    that same fetch instead of sending their own (single-flight). Later
+    callers get the stored response. Parsed documents are memoized the same
+    way per URL and parser, so a page is fetched and parsed at most once per
+    run, e.g. the profile page shared by the session check and the account
+    metadata. Callers must treat shared documents as read-only.
+
+    Only 200 responses are kept, anything else is handed to the callers
+    already waiting and then forgotten, so the next caller fetches again.
+    Failed fetches are not kept either. `invalidate` drops one URL, `clear`
+    everything, e.g. at the start of a run.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._responses: Dict[str, Future] = {}
+        self._documents: Dict[Tuple[str, str], Future] = {}
+        self._counts = dict.fromkeys(
+            ('hits', 'misses', 'shared', 'document_hits', 'document_misses', 'document_shared'), 0
+        )
+
+    def _single_flight(self, table: Dict[Hashable, Future], key: Hashable, compute: Callable[[], Any],
+                       keep: Callable[[Any], bool], prefix: str = '') -> Any:
+        with self._lock:
+            future = table.get(key)
+            leader = future is None
+            if leader:
+                future = table[key] = Future()
+                self._counts[prefix + 'misses'] += 1
+            else:
+                self._counts[prefix + ('hits' if future.done() else 'shared')] += 1
+        if not leader:
+            return future.result()
+
+        try:
+            result = compute()
+        except BaseException as e:
+            with self._lock:
+                table.pop(key, None)
+            future.set_exception(e)
+            raise
+        if not keep(result):
+            with self._lock:
+                table.pop(key, None)
+        future.set_result(result)
+        return result
+
+    def get(self, url: str, fetch: Callable[[], requests.Response]) -> requests.Response:
+        """The response for `url`, from `fetch` only if it isn't memoized or in flight."""
+        return self._single_flight(self._responses, url, fetch, lambda response: response.status_code == 200)
+
+    def document(self, url: str, fetch: Callable[[], requests.Response], parse: Callable[[bytes], Any],
+                 parser: str = 'default') -> Tuple[requests.Response, Optional[Any]]:
+        """
+        The response for `url` and its body parsed by `parse`, memoized under
+        `parser`. The document is None for responses other than 200.
+        """
+        response = self.get(url, fetch)
+        if response.status_code != 200:
+            return response, None
+        document = self._single_flight(
+            self._documents, (url, parser), lambda: parse(response.content), lambda _: True, prefix='document_'
+        )
+        return response, document
+
+    def invalidate(self, url: str):
+        """Forget the response and the documents of `url`."""
+        with self._lock:
+            self._responses.pop(url, None)
+            for key in [key for key in self._documents if key[0] == url]:
+                del self._documents[key]
+
+    def clear(self):
+        with self._lock:
+            self._responses.clear()
+            self._documents.clear()
+
+    def stats(self) -> Dict[str, int]:
+        """Hit counts: `hits` were served from the memo, `shared` waited for an in-flight fetch."""
+        with self._lock:
+            return dict(self._counts)
@@ -0,0 +1,623 @@
+import logging
+import re
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+try:
+    from lxml import etree, html as lxml_html
+except ImportError: # lxml is optional, the bs4 parser is always available
+    etree = lxml_html = None
+
+from schemas import Book, validate_many
+
+logger = logging.getLogger(__name__)
+
+REVIEW_ROW_ID = re.compile(r'review_\d+')
+FREE_TEXT_ID = re.compile(r'freeText\d+')
+SHELF_PAGE_HREF = re.compile(r'/review/list/.*[?&]page=\d+')
+PAGE_PARAM = re.compile(r'[?&]page=(\d+)')
+# Read as shown on the page, then normalized a page at a time
+DATE_FIELDS = ('date_added', 'date_started', 'date_read')
+# Bytes fed to a streaming parser at a time
+STREAM_CHUNK_BYTES = 64 * 1024
+# Stands for "not in the row memo", a memoized row may be None when it had no book
+_MISSING = object()
+
+class ShelfPageParser:
+    """
+    Turns the HTML of one shelf list page into `Book` rows plus the
+    pagination details needed to walk the shelf.
+
+    `parse` returns a dict with `books`, `has_rows`, `next_disabled` and
+    `last_page`. With a `row_memo` (see http_cache.RowMemo), rows whose
+    HTML was seen before reuse the Book built from them back then.
+
+    Parsers with `streaming` set also take the body in chunks through
+    `parse_stream`, so it never has to be held whole.
+    """
+    name = 'base'
+    streaming = False
+
+    def __init__(self, base_url: str, parse_dates: Callable[[List[str]], List[Optional[str]]], row_memo=None):
+        self.base_url = base_url
+        # Normalizes a batch of raw dates, see dates.DateNormalizer.normalize_many
+        self.parse_dates = parse_dates
+        self.row_memo = row_memo
+
+    def parse(self, content: bytes, shelf: str) -> Dict:
+        raise NotImplementedError
+
+    def _extract_book_row(self, row, shelf: str) -> Dict:
+        """
+        The Book fields of a single `<tr>` of a shelf page, with the dates
+        as shown on the page. Not validated yet.
+        """
+        raise NotImplementedError
+
+    def _row_html(self, row) -> bytes:
+        """The markup of a row, which the row memo is keyed by."""
+        raise NotImplementedError
+
+    def _parse_book_rows(self, book_rows, shelf: str) -> List[Book]:
+        """The Books of a page's rows, in order, taking unchanged rows from the row memo."""
+        if self.row_memo is None:
+            books = self._build_books([self._extract_book_row(row, shelf) for row in book_rows])
+            return [book for book in books if book]
+
+        keys = [self.row_memo.key(self._row_html(row)) for row in book_rows]
+        memoized = self.row_memo.lookup(shelf, keys)
+        rows_by_key = dict(zip(keys, book_rows))
+        fresh_keys = [key for key in rows_by_key if key not in memoized]
+        fresh = dict(zip(fresh_keys, self._build_books(
+            [self._extract_book_row(rows_by_key[key], shelf) for key in fresh_keys]
+        )))
+        self.row_memo.store(shelf, fresh)
+        books = [memoized[key] if key in memoized else fresh[key] for key in keys]
+        return [book for book in books if book]
+
+    def _build_books(self, extracted: List[Dict]) -> List[Optional[Book]]:
+        """
+        Normalize the dates of a page's extracted rows and validate them into
+        Books, each step all at once. Rows without a title, or failing
+        validation, give None.
+        """
+        titled = [book for book in extracted if book.get('title')]
+        dated = [(book, field) for book in titled for field in DATE_FIELDS if field in book]
+        for (book, field), value in zip(dated, self.parse_dates([book[field] for book, field in dated])):
+            book[field] = value
+        built = iter(validate_many(Book, titled))
+        return [next(built) if book.get('title') else None for book in extracted]
+
+class Bs4ShelfParser(ShelfPageParser):
+    """Reference implementation on BeautifulSoup's html.parser."""
+    name = 'bs4'
+
+    def parse(self, content: bytes, shelf: str) -> Dict:
+        # Imported here so runs on the lxml parser never load bs4 for shelves
+        from bs4 import BeautifulSoup
+        soup = BeautifulSoup(content, 'html.parser')
+
+        book_rows = soup.find_all('tr', class_='bookalike review')
+        if not book_rows:
+            book_rows = soup.find_all('tr', id=REVIEW_ROW_ID)
+
+        books = self._parse_book_rows(book_rows, shelf)
+
+        next_link = soup.find('a', class_='next_page')
+        return {
+            'books': books,
+            'has_rows': bool(book_rows),
+            'next_disabled': bool(next_link and 'disabled' in next_link.get('class', [])),
+            'last_page': self._find_last_page(soup)
+        }
+
+    def _find_last_page(self, soup) -> Optional[int]:
+        """Read the highest page number from a shelf page's pagination links."""
+        pagination = soup.find('div', id='reviewPagination')
+        if pagination:
+            links = pagination.find_all('a', href=True)
+        else:
+            links = soup.find_all('a', href=SHELF_PAGE_HREF)
+
+        page_numbers = []
+        for link in links:
+            page_match = PAGE_PARAM.search(link['href'])
+            if page_match:
+                page_numbers.append(int(page_match.group(1)))
+
+        return max(page_numbers) if page_numbers else None
+
+    def _row_html(self, row) -> bytes:
+        return row.encode()
+
+    def _extract_book_row(self, row, shelf: str) -> Dict:
+        book = {}
+        
+        # Title
+        title_elem = row.find('td', class_='field title')
+        if title_elem:
+            title_link = title_elem.find('a', class_='bookTitle')
+            if not title_link:
+                title_link = title_elem.find('a')
+            if title_link:
+                book['title'] = title_link.text.strip()
+                book['book_url'] = self.base_url + title_link.get('href', '')
+        
+        # Author
+        author_elem = row.find('td', class_='field author')
+        if author_elem:
+            author_link = author_elem.find('a')
+            if author_link:
+                book['author'] = author_link.text.strip()
+        
+        # ISBN
+        isbn_elem = row.find('td', class_='field isbn13')
+        if isbn_elem:
+            value_div = isbn_elem.find('div', class_='value')
+            if value_div:
+                isbn_text = value_div.text.strip()
+                if isbn_text and isbn_text != '—':
+                    book['isbn'] = isbn_text
+        
+        # Rating
+        rating_elem = row.find('td', class_='field rating')
+        if rating_elem:
+            stars_div = rating_elem.find('div', class_='stars')
+            if stars_div and stars_div.get('data-rating'):
+                try:
+                    rating_value = stars_div.get('data-rating')
+                    if int(rating_value) > 0:
+                        book['rating'] = int(rating_value)
+                except Exception:
+                    pass # Non-fatal, just skip
+        
+        # Average rating
+        avg_rating_elem = row.find('td', class_='field avg_rating')
+        if avg_rating_elem:
+            value_div = avg_rating_elem.find('div', class_='value')
+            if value_div:
+                avg_text = value_div.text.strip()
+                try:
+                    book['avg_rating'] = float(avg_text)
+                except Exception:
+                    pass # Non-fatal, just skip
+
+        # Number of pages
+        pages_elem = row.find('td', class_='field num_pages')
+        if pages_elem:
+            value_div = pages_elem.find('div', class_='value')
+            if value_div:
+                nobr_tag = value_div.find('nobr')
+                if nobr_tag and nobr_tag.contents:
+                    pages_text = str(nobr_tag.contents[0]).strip().replace(',', '')
+                    try:
+                        book['num_pages'] = int(pages_text)
+                    except Exception:
+                        pass # Non-fatal, just skip
+        
+        # Date published
+        date_pub_elem = row.find('td', class_='field date_pub')
+        if date_pub_elem:
+            value_div = date_pub_elem.find('div', class_='value')
+            if value_div:
+                date_text = value_div.text.strip()
+                book['date_published'] = date_text
+        
+        # Date added
+        date_added_elem = row.find('td', class_='field date_added')
+        if date_added_elem:
+            date_text = ''
+            span_with_title = date_added_elem.find('span', title=True)
+            if span_with_title:
+                date_text = span_with_title.get('title')
+            if not date_text:
+                date_span = date_added_elem.find('span', class_='date_added_value')
+                if date_span:
+                    date_text = date_span.text.strip()
+            if not date_text:
+                date_text = date_added_elem.get_text(strip=True)
+            if date_text:
+                book['date_added'] = date_text
+        
+        # Date started
+        if shelf == 'currently-reading':
+            date_started_elem = row.find('td', class_='field date_started')
+            if date_started_elem:
+                date_text = ''
+                span_with_title = date_started_elem.find('span', title=True)
+                if span_with_title:
+                    date_text = span_with_title.get('title')
+                if not date_text:
+                    date_span = date_started_elem.find('span', class_='date_started_value')
+                    if date_span:
+                        date_text = date_span.text.strip()
+                if not date_text:
+                    date_text = date_started_elem.get_text(strip=True)
+                if date_text:
+                    book['date_started'] = date_text
+        
+        # Date read
+        if shelf == 'read':
+            date_read_elem = row.find('td', class_='field date_read')
+            if date_read_elem:
+                date_span = date_read_elem.find('span', class_='date_read_value')
+                if not date_span:
+                    date_span = date_read_elem.find('span')
+                if date_span:
+                    date_text = date_span.get('title', '')
+                    if not date_text:
+                        date_text = date_span.text.strip()
+                else:
+                    date_text = date_read_elem.get_text(strip=True)
+                if date_text:
+                    book['date_read'] = date_text
+        
+        # Review
+        review_elem = row.find('td', class_='field review')
+        if review_elem:
+            review_text = review_elem.find('span', id=FREE_TEXT_ID)
+            if review_text:
+                book['review'] = review_text.text.strip()[:500]
+        
+        book['shelf'] = shelf.replace('-', '_')
+        
+        return book
+
+class LxmlShelfParser(ShelfPageParser):
+    """
+    Fast path on lxml. Each row is walked once to find its `field` cells,
+    and every Book field is then read from those cells directly. Produces
+    the same Books as `Bs4ShelfParser`.
+    """
+    name = 'lxml'
+
+    FIELD_CELLS = (
+        'field title', 'field author', 'field isbn13', 'field rating', 'field avg_rating',
+        'field num_pages', 'field date_pub', 'field date_added', 'field date_started',
+        'field date_read', 'field review'
+    )
+
+    def parse(self, content: bytes, shelf: str) -> Dict:
+        if not content or not content.strip():
+            return {'books': [], 'has_rows': False, 'next_disabled': False, 'last_page': None}
+
+        root = lxml_html.document_fromstring(content, parser=lxml_html.HTMLParser(encoding='utf-8'))
+
+        book_rows = [tr for tr in root.iter('tr') if _class_string(tr) == 'bookalike review']
+        if not book_rows:
+            book_rows = [tr for tr in root.iter('tr') if REVIEW_ROW_ID.search(tr.get('id', ''))]
+
+        books = self._parse_book_rows(book_rows, shelf)
+
+        next_link = _find(root, 'a', cls='next_page')
+        return {
+            'books': books,
+            'has_rows': bool(book_rows),
+            'next_disabled': bool(next_link is not None and 'disabled' in _classes(next_link)),
+            'last_page': self._find_last_page(root)
+        }
+
+    def _find_last_page(self, root) -> Optional[int]:
+        pagination = _find(root, 'div', id='reviewPagination')
+        if pagination is not None:
+            hrefs = [a.get('href') for a in pagination.iterdescendants('a') if a.get('href') is not None]
+        else:
+            hrefs = [a.get('href') for a in root.iter('a') if SHELF_PAGE_HREF.search(a.get('href') or '')]
+
+        page_numbers = []
+        for href in hrefs:
+            page_match = PAGE_PARAM.search(href)
+            if page_match:
+                page_numbers.append(int(page_match.group(1)))
+
+        return max(page_numbers) if page_numbers else None
+
+    def _row_html(self, row) -> bytes:
+        # lxml.html.tostring wraps this at a noticeable cost per row
+        return etree.tostring(row, with_tail=False)
+
+    def _extract_book_row(self, row, shelf: str) -> Dict:
+        # One pass over the row to pick up the first cell of each field
+        cells = {}
+        for td in row.iterdescendants('td'):
+            cls = _class_string(td)
+            if cls in self.FIELD_CELLS and cls not in cells:
+                cells[cls] = td
+
+        book = {}
+
+        td = cells.get('field title')
+        if td is not None:
+            link = _find(td, 'a', cls='bookTitle')
+            if link is None:
+                link = _find(td, 'a')
+            if link is not None:
+                book['title'] = _text(link).strip()
+                book['book_url'] = self.base_url + link.get('href', '')
+
+        td = cells.get('field author')
+        if td is not None:
+            link = _find(td, 'a')
+            if link is not None:
+                book['author'] = _text(link).strip()
+
+        value = _cell_value(cells.get('field isbn13'))
+        if value is not None:
+            isbn_text = _text(value).strip()
+            if isbn_text and isbn_text != '—':
+                book['isbn'] = isbn_text
+
+        td = cells.get('field rating')
+        if td is not None:
+            stars = _find(td, 'div', cls='stars')
+            if stars is not None and stars.get('data-rating'):
+                try:
+                    rating_value = int(stars.get('data-rating'))
+                    if rating_value > 0:
+                        book['rating'] = rating_value
+                except Exception:
+                    pass
+
+        value = _cell_value(cells.get('field avg_rating'))
+        if value is not None:
+            try:
+                book['avg_rating'] = float(_text(value).strip())
+            except Exception:
+                pass
+
+        value = _cell_value(cells.get('field num_pages'))
+        if value is not None:
+            nobr = _find(value, 'nobr')
+            # Only the leading text node holds the count, as in `nobr.contents[0]`
+            if nobr is not None and nobr.text:
+                try:
+                    book['num_pages'] = int(nobr.text.strip().replace(',', ''))
+                except Exception:
+                    pass
+
+        value = _cell_value(cells.get('field date_pub'))
+        if value is not None:
+            book['date_published'] = _text(value).strip()
+
+        td = cells.get('field date_added')
+        if td is not None:
+            date_text = _titled_date_text(td, 'date_added_value')
+            if date_text:
+                book['date_added'] = date_text
+
+        if shelf == 'currently-reading':
+            td = cells.get('field date_started')
+            if td is not None:
+                date_text = _titled_date_text(td, 'date_started_value')
+                if date_text:
+                    book['date_started'] = date_text
+
+        if shelf == 'read':
+            td = cells.get('field date_read')
+            if td is not None:
+                span = _find(td, 'span', cls='date_read_value')
+                if span is None:
+                    span = _find(td, 'span')
+                if span is not None:
+                    date_text = span.get('title', '')
+                    if not date_text:
+                        date_text = _text(span).strip()
+                else:
+                    date_text = ''.join(_strings(td, strip=True))
+                if date_text:
+                    book['date_read'] = date_text
+
+        td = cells.get('field review')
+        if td is not None:
+            for span in td.iterdescendants('span'):
+                if FREE_TEXT_ID.search(span.get('id', '')):
+                    book['review'] = _text(span).strip()[:500]
+                    break
+
+        book['shelf'] = shelf.replace('-', '_')
+
+        return book
+
+class StreamingShelfParser(LxmlShelfParser):
+    """
+    `LxmlShelfParser` on lxml's pull parser, for memory-limited hosts. The
+    body is fed in as it arrives and only the book rows are kept whole
+    until their fields are read. Every other element, and each row once
+    read, is cleared and dropped from the tree as soon as it ends, so
+    navigation, sidebars and scripts never pile up. Pagination is read from
+    the link attributes as they stream past. Produces the same Books as
+    `LxmlShelfParser`.
+
+    The rows' fields are turned into Books a page at a time, as in the
+    other parsers. Rows in the row memo are looked up one by one, as they
+    end, so a memoized row is never read at all. The result's
+    `peak_elements` is the most elements the parse held at once, the open
+    ones plus those kept for the row being read.
+    """
+    name = 'lxml-stream'
+    streaming = True
+
+    def parse(self, content: bytes, shelf: str) -> Dict:
+        # In chunks all the same, the events of a single feed are queued up at once
+        return self.parse_stream(
+            (content[start:start + STREAM_CHUNK_BYTES] for start in range(0, len(content), STREAM_CHUNK_BYTES)),
+            shelf
+        )
+
+    def parse_stream(self, chunks: Iterable[bytes], shelf: str) -> Dict:
+        parser = etree.HTMLPullParser(events=('start', 'end'), encoding='utf-8')
+        rows = []           # (memo key, memoized Book or _MISSING, extracted fields or None) per primary row
+        fallback_rows = []  # the same for rows only matched by their id, used if there are no primary rows
+        pending_row = None  # the row being read, its descendants are kept until it ends
+        pagination = None   # the first #reviewPagination div, while it is open
+        pagination_seen = False
+        pagination_hrefs = []
+        page_hrefs = []
+        next_link_classes = None
+        has_content = False
+        depth = 0           # elements open in the document
+        row_held = 0        # elements of the pending row that ended and are still held
+        peak_elements = 0   # the most elements held at once, open or kept for the pending row
+
+        def events():
+            nonlocal has_content
+            for chunk in chunks:
+                if chunk:
+                    has_content = has_content or bool(chunk.strip())
+                    parser.feed(chunk)
+                    yield from parser.read_events()
+            if has_content:
+                # Ends the elements still open, e.g. the last row of a truncated page
+                parser.close()
+                yield from parser.read_events()
+
+        for event, el in events():
+            tag = el.tag
+            if event == 'start':
+                depth += 1
+                peak_elements = max(peak_elements, depth + row_held)
+                if tag == 'tr' and pending_row is None and self._row_kind(el):
+                    pending_row = el
+                elif tag == 'div' and not pagination_seen and el.get('id') == 'reviewPagination':
+                    pagination, pagination_seen = el, True
+                elif tag == 'a':
+                    href = el.get('href')
+                    if pagination is not None and href is not None:
+                        pagination_hrefs.append(href)
+                    if SHELF_PAGE_HREF.search(href or ''):
+                        page_hrefs.append(href)
+                    if next_link_classes is None and 'next_page' in _classes(el):
+                        next_link_classes = _classes(el)
+                continue
+
+            depth -= 1
+            if el is pending_row:
+                pending_row, row_held = None, 0
+                entry = self._read_row(el, shelf)
+                (rows if self._row_kind(el) == 'primary' else fallback_rows).append(entry)
+            elif pending_row is not None:
+                row_held += 1
+                continue # part of the row being read
+            elif el is pagination:
+                pagination = None
+            _release(el)
+
+        if not has_content:
+            return {'books': [], 'has_rows': False, 'next_disabled': False, 'last_page': None}
+
+        rows = rows or fallback_rows
+        missing = [(key, fields) for key, book, fields in rows if book is _MISSING]
+        built = self._build_books([fields for key, fields in missing])
+        if self.row_memo is not None:
+            self.row_memo.store(shelf, {key: book for (key, fields), book in zip(missing, built)})
+        built = iter(built)
+        books = [next(built) if book is _MISSING else book for key, book, fields in rows]
+
+        page_numbers = [int(match.group(1)) for match in map(PAGE_PARAM.search,
+                        pagination_hrefs if pagination_seen else page_hrefs) if match]
+        return {
+            'books': [book for book in books if book],
+            'has_rows': bool(rows),
+            'next_disabled': bool(next_link_classes is not None and 'disabled' in next_link_classes),
+            'last_page': max(page_numbers) if page_numbers else None,
+            'peak_elements': peak_elements
+        }
+
+    @staticmethod
+    def _row_kind(tr) -> Optional[str]:
+        """'primary' for a `bookalike review` row, 'fallback' for one only matched by id."""
+        if _class_string(tr) == 'bookalike review':
+            return 'primary'
+        if REVIEW_ROW_ID.search(tr.get('id', '')):
+            return 'fallback'
+        return None
+
+    def _read_row(self, row, shelf: str) -> Tuple[Optional[str], Any, Optional[Dict]]:
+        if self.row_memo is None:
+            return None, _MISSING, self._extract_book_row(row, shelf)
+        key = self.row_memo.key(self._row_html(row))
+        memoized = self.row_memo.lookup(shelf, [key])
+        if key in memoized:
+            return key, memoized[key], None
+        return key, _MISSING, self._extract_book_row(row, shelf)
+
+# lxml helpers that mirror the bs4 lookups used by the reference parser
+
+def _release(el):
+    """Drop a finished element, and its finished earlier siblings, from a streamed tree."""
+    el.clear()
+    parent = el.getparent()
+    if parent is not None:
+        while el.getprevious() is not None:
+            del parent[0]
+
+def _classes(el) -> List[str]:
+    return (el.get('class') or '').split()
+
+def _class_string(el) -> str:
+    return ' '.join(_classes(el))
+
+def _find(el, tag: str, cls: Optional[str] = None, id: Optional[str] = None):
+    """First descendant like bs4's `find(tag, class_=cls, id=id)`."""
+    for child in el.iterdescendants(tag):
+        if cls is not None and cls not in _classes(child):
+            continue
+        if id is not None and child.get('id') != id:
+            continue
+        return child
+    return None
+
+def _cell_value(td):
+    return _find(td, 'div', cls='value') if td is not None else None
+
+def _strings(el, strip: bool = False):
+    """Text nodes under `el` in document order, skipping comments and the like."""
+    if el.text:
+        text = el.text.strip() if strip else el.text
+        if text:
+            yield text
+    for child in el:
+        if isinstance(child.tag, str):
+            yield from _strings(child, strip)
+        if child.tail:
+            text = child.tail.strip() if strip else child.tail
+            if text:
+                yield text
+
+def _text(el) -> str:
+    return ''.join(_strings(el))
+
+def _titled_date_text(td, value_class: str) -> str:
+    """Date text from a span's title, then a `*_value` span, then the cell text."""
+    date_text = ''
+    for span in td.iterdescendants('span'):
+        if span.get('title') is not None:
+            date_text = span.get('title')
+            break
+    if not date_text:
+        span = _find(td, 'span', cls=value_class)
+        if span is not None:
+            date_text = _text(span).strip()
+    if not date_text:
+        date_text = ''.join(_strings(td, strip=True))
+    return date_text
+
+PARSERS = {
+    'bs4': Bs4ShelfParser,
+    'lxml': LxmlShelfParser,
+    'lxml-stream': StreamingShelfParser,
+}
+
+def get_shelf_parser(name: str, base_url: str, parse_dates: Callable[[List[str]], List[Optional[str]]],
+                     row_memo=None) -> ShelfPageParser:
+    """
+    Build the shelf parser for `name` ('auto', 'lxml', 'lxml-stream' or
+    'bs4'). 'auto' uses lxml when it is installed.
+    """
+    if name == 'auto':
+        name = 'lxml' if lxml_html is not None else 'bs4'
+    if name in ('lxml', 'lxml-stream') and lxml_html is None:
+        logger.warning("lxml is not installed, falling back to the bs4 shelf parser.")
+        name = 'bs4'
+    if name not in PARSERS:
+        raise ValueError(f"Unknown shelf parser: {name}")
+    return PARSERS[name](base_url, parse_dates, row_memo)
@@ -0,0 +1,128 @@
+import logging
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Statuses that mean "slow down" rather than "something is broken"
+BACKOFF_STATUSES = (429, 503)
+
+class AdaptiveRateLimiter:
+    """
+    Thread-safe token bucket shared by every request to a host.
+
+    The refill rate adapts AIMD-style: it grows by `increase_step` requests/s
+    after every successful (2xx) or redirect/not-modified (3xx) response and
+    is multiplied by `decrease_factor` on a 429 or 503. Other errors leave it
+    unchanged. A `Retry-After` header pauses the whole bucket until it expires.
+    """
+
+    def __init__(
+        self,
+        rate: float = 2.0,
+        min_rate: float = 0.5,
+        max_rate: float = 8.0,
+        burst: float = 2.0,
+        increase_step: float = 0.25,
+        decrease_factor: float = 0.5,
+        max_pause: float = 300.0
+    ):
+        self.min_rate = min_rate
+        self.max_rate = max(max_rate, min_rate)
+        self.rate = min(max(rate, self.min_rate), self.max_rate)
+        self.burst = max(burst, 1.0)
+        self.increase_step = increase_step
+        self.decrease_factor = decrease_factor
+        self.max_pause = max_pause
+
+        self._lock = threading.Lock()
+        self._tokens = self.burst
+        self._last_refill = time.monotonic()
+        self._paused_until = 0.0
+
+        # Counters
+        self.requests = 0
+        self.throttled = 0
+        self.retried = 0
+        self.backoffs = 0
+        self.total_wait = 0.0
+
+    def _refill(self, now: float):
+        elapsed = now - self._last_refill
+        if elapsed > 0:
+            self._tokens = min(self.burst, self._tokens + elapsed * self.rate)
+            self._last_refill = now
+
+    def acquire(self) -> float:
+        """Block until a request may be sent. Returns the seconds spent waiting."""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now < self._paused_until:
+                    wait = self._paused_until - now
+                elif self._tokens >= 1:
+                    self._tokens -= 1
+                    self.requests += 1
+                    if waited > 0:
+                        self.throttled += 1
+                        self.total_wait += waited
+                    return waited
+                else:
+                    wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+            waited += wait
+
+    def record_response(self, status_code: int, retry_after: Optional[str] = None):
+        """Feed a response status back into the limiter to adapt the rate."""
+        with self._lock:
+            if status_code in BACKOFF_STATUSES:
+                self.backoffs += 1
+                self.rate = max(self.min_rate, self.rate * self.decrease_factor)
+                self._tokens = 0.0
+
+                delay = parse_retry_after(retry_after)
+                if delay:
+                    delay = min(delay, self.max_pause)
+                    self._paused_until = max(self._paused_until, time.monotonic() + delay)
+                logger.warning(
+                    "Got HTTP %s, backing off to %.2f req/s%s", status_code, self.rate,
+                    f" and pausing {delay:.1f}s (Retry-After)" if delay else ""
+                )
+            elif 200 <= status_code < 400:
+                self.rate = min(self.max_rate, self.rate + self.increase_step)
+
+    def record_retry(self):
+        with self._lock:
+            self.retried += 1
+
+    def stats(self) -> Dict:
+        """Snapshot of the limiter counters."""
+        with self._lock:
+            return {
+                'requests': self.requests,
+                'throttled': self.throttled,
+                'retried': self.retried,
+                'backoffs': self.backoffs,
+                'total_wait_seconds': round(self.total_wait, 2),
+                'current_rate': round(self.rate, 2)
+            }
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Parse a Retry-After header given either as seconds or as an HTTP date."""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
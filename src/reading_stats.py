@@ -0,0 +1,370 @@
+import logging
+import re
+from collections import Counter
+from datetime import date
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from schemas import Book, same_content
+
+logger = logging.getLogger(__name__)
+
+SHELF_KEYS = ('read', 'currently_reading', 'to_read')
+DATE_FIELDS = ('date_added', 'date_read', 'date_started')
+# Bump when the layout of StatisticsAggregator.to_dict changes
+STATE_VERSION = 1
+
+# The date shapes Katalog._parse_date produces, by the strptime-style format
+# pandas infers for them. Month and day may be a single digit.
+DATE_PATTERNS = {
+    '%Y-%m-%d': re.compile(r'^(\d{4})-(\d{1,2})-(\d{1,2})$'),
+    '%Y-%m': re.compile(r'^(\d{4})-(\d{1,2})$'),
+    '%Y': re.compile(r'^(\d{4})$'),
+}
+
+def parse_date(value: str, date_format: Optional[str] = None) -> Optional[date]:
+    """
+    Parse one date string in `date_format`, or in any of the known shapes
+    if no format is given. Returns None for anything that does not parse,
+    including impossible dates like 2024-02-30.
+    """
+    if date_format == '%Y-%m-%d' and len(value) == 10:
+        # Zero-padded dates, by far the most common, parse in C
+        try:
+            return date.fromisoformat(value)
+        except ValueError:
+            pass
+    patterns = [DATE_PATTERNS[date_format]] if date_format else DATE_PATTERNS.values()
+    for pattern in patterns:
+        match = pattern.match(value)
+        if match:
+            parts = [int(part) for part in match.groups()]
+            try:
+                return date(*parts, *[1] * (3 - len(parts)))
+            except ValueError:
+                return None
+    return None
+
+def guess_date_format(value: str) -> Optional[str]:
+    """The format of `value`, if it is one of the known shapes and a real date."""
+    for date_format in DATE_PATTERNS:
+        if DATE_PATTERNS[date_format].match(value):
+            return date_format if parse_date(value, date_format) else None
+    return None
+
+def round_half_even(value: float, ndigits: int) -> float:
+    """Round the way numpy does (scale, round half to even, unscale), not like round() on a float."""
+    scale = 10.0 ** ndigits
+    return round(value * scale) / scale
+
+def median(values: Counter) -> float:
+    """Median of a multiset of numbers given as value -> count."""
+    total = sum(values.values())
+    lower, upper = (total - 1) // 2, total // 2
+    seen = 0
+    low = None
+    for value in sorted(values):
+        seen += values[value]
+        if low is None and seen > lower:
+            low = value
+        if seen > upper:
+            return (low + value) / 2
+    raise ValueError("median of an empty collection")
+
+class StatisticsAggregator:
+    """
+    Builds the reading statistics in a single pass over `Book` objects.
+
+    Produces the same dict as the pandas implementation it replaces. That
+    includes pandas' date handling: each date column is parsed with the
+    format of its first non-empty value, and values in another shape count
+    as missing. If no format can be inferred from that first value, every
+    value is parsed on its own instead.
+
+        aggregator = StatisticsAggregator()
+        aggregator.add_all(books)
+        stats = aggregator.result()
+
+    Books can be taken back out with `remove`, and the aggregates saved with
+    `to_dict` and restored with `from_dict`. A stored state can so be brought
+    up to date with just the books that changed since it was saved. The
+    locked date formats are saved along with it.
+    """
+
+    def __init__(self):
+        # None until the first non-empty value of the column is seen, then
+        # the locked format, or '' when it could not be inferred
+        self.date_formats: Dict[str, Optional[str]] = {field: None for field in DATE_FIELDS}
+        # Parsed dates and their month keys, per field and raw value. The same
+        # dates come up again and again in a library.
+        self._parsed: Dict[str, Dict[str, Tuple[Optional[date], Optional[str]]]] = {field: {} for field in DATE_FIELDS}
+
+        self.total_books = 0
+        self.shelf_counts = Counter()
+        self.rating_sum = 0
+        self.rating_count = 0
+        self.pages_sum = 0
+        self.pages_count = 0
+        self.read_pages_sum = 0
+
+        self.read_per_month = Counter()
+        self.read_per_year = Counter()
+        self.added_per_month = Counter()
+        self.added_per_year = Counter()
+        self.shelf_added_per_month = {shelf: Counter() for shelf in SHELF_KEYS}
+        self.shelf_added_per_year = {shelf: Counter() for shelf in SHELF_KEYS}
+        self.days_to_read = Counter()
+
+    def _date(self, field: str, value: Optional[str]) -> Tuple[Optional[date], Optional[str]]:
+        """The parsed date and its YYYY-MM month key, or (None, None)."""
+        if not value:
+            return None, None
+        parsed = self._parsed[field].get(value)
+        if parsed is None:
+            date_format = self.date_formats[field]
+            if date_format is None:
+                date_format = self.date_formats[field] = guess_date_format(value) or ''
+            day = parse_date(value, date_format)
+            parsed = self._parsed[field][value] = (day, _month(day) if day else None)
+        return parsed
+
+    def add(self, book: Book):
+        """Fold one book into the statistics."""
+        self._fold(book, 1)
+
+    def remove(self, book: Book):
+        """Take back a book that was added before, e.g. the stored copy of a changed book."""
+        self._fold(book, -1)
+
+    def add_all(self, books: Iterable[Book]):
+        for book in books:
+            self._fold(book, 1)
+
+    def _fold(self, book: Book, step: int):
+        shelf = book.shelf
+        date_added, month_added = self._date('date_added', book.date_added)
+        date_read, month_read = self._date('date_read', book.date_read)
+        if self.date_formats['date_started'] is None:
+            # Not used by any metric, only its first value matters
+            self._date('date_started', book.date_started)
+
+        self.total_books += step
+        if shelf is not None:
+            self.shelf_counts[shelf] += step
+        if book.rating is not None:
+            self.rating_sum += step * book.rating
+            self.rating_count += step
+        num_pages = book.num_pages
+        if num_pages is not None:
+            self.pages_sum += step * num_pages
+            self.pages_count += step
+            if shelf == 'read':
+                self.read_pages_sum += step * num_pages
+
+        if date_added:
+            self.added_per_month[month_added] += step
+            self.added_per_year[date_added.year] += step
+            if shelf in self.shelf_added_per_month:
+                self.shelf_added_per_month[shelf][month_added] += step
+                self.shelf_added_per_year[shelf][date_added.year] += step
+        if shelf == 'read' and date_read:
+            self.read_per_month[month_read] += step
+            self.read_per_year[date_read.year] += step
+            if date_added:
+                days = (date_read - date_added).days
+                if days >= 0:
+                    self.days_to_read[days] += step
+
+    def apply_changes(self, changed: Iterable[Tuple[Optional[Book], Optional[Book]]]):
+        """
+        Apply `(old, new)` pairs: `old` is taken back and `new` added, either
+        may be None for an added or removed book.
+        """
+        for old, new in changed:
+            if old is not None:
+                self._fold(old, -1)
+            if new is not None:
+                self._fold(new, 1)
+
+    def to_dict(self) -> Dict:
+        """JSON-ready snapshot of the aggregates, see `from_dict`."""
+        return {
+            'version': STATE_VERSION,
+            'date_formats': dict(self.date_formats),
+            'total_books': self.total_books,
+            'shelf_counts': _positive(self.shelf_counts),
+            'rating_sum': self.rating_sum, 'rating_count': self.rating_count,
+            'pages_sum': self.pages_sum, 'pages_count': self.pages_count,
+            'read_pages_sum': self.read_pages_sum,
+            'read_per_month': _positive(self.read_per_month),
+            'read_per_year': _positive(self.read_per_year),
+            'added_per_month': _positive(self.added_per_month),
+            'added_per_year': _positive(self.added_per_year),
+            'shelf_added_per_month': {shelf: _positive(self.shelf_added_per_month[shelf]) for shelf in SHELF_KEYS},
+            'shelf_added_per_year': {shelf: _positive(self.shelf_added_per_year[shelf]) for shelf in SHELF_KEYS},
+            'days_to_read': _positive(self.days_to_read)
+        }
+
+    @classmethod
+    def from_dict(cls, state: Dict) -> 'StatisticsAggregator':
+        """
+        Restore an aggregator saved with `to_dict`. Raises ValueError if the
+        state was written by an incompatible version.
+        """
+        if state.get('version') != STATE_VERSION:
+            raise ValueError(f"Unsupported statistics state version {state.get('version')}")
+
+        aggregator = cls()
+        aggregator.date_formats.update(state['date_formats'])
+        for name in ('total_books', 'rating_sum', 'rating_count', 'pages_sum', 'pages_count', 'read_pages_sum'):
+            setattr(aggregator, name, state[name])
+        # JSON object keys are strings, years and day counts go back to ints
+        aggregator.shelf_counts = Counter(state['shelf_counts'])
+        aggregator.read_per_month = Counter(state['read_per_month'])
+        aggregator.read_per_year = _int_keys(state['read_per_year'])
+        aggregator.added_per_month = Counter(state['added_per_month'])
+        aggregator.added_per_year = _int_keys(state['added_per_year'])
+        for shelf in SHELF_KEYS:
+            aggregator.shelf_added_per_month[shelf] = Counter(state['shelf_added_per_month'].get(shelf, {}))
+            aggregator.shelf_added_per_year[shelf] = _int_keys(state['shelf_added_per_year'].get(shelf, {}))
+        aggregator.days_to_read = _int_keys(state['days_to_read'])
+        return aggregator
+
+    def result(self) -> Dict:
+        """The statistics dict, in the same shape Katalog.calculate_statistics has always returned."""
+        stats = {
+            'books_per_month': {}, 'books_per_year': {}, 'books_read_per_month': {},
+            'books_read_per_year': {}, 'overall_stats': {}, 'status_change_frequency': {},
+            'shelf_additions_per_month': {}, 'shelf_additions_per_year': {}, 'reading_pace': {}
+        }
+        if not self.total_books:
+            return stats
+
+        stats['books_read_per_month'] = _sorted_counts(self.read_per_month)
+        stats['books_read_per_year'] = _sorted_counts(self.read_per_year)
+        stats['books_per_month'] = _sorted_counts(self.added_per_month)
+        stats['books_per_year'] = _sorted_counts(self.added_per_year)
+        stats['overall_stats'] = {
+            'total_books': self.total_books, 'read': self.shelf_counts['read'],
+            'currently_reading': self.shelf_counts['currently_reading'],
+            'want_to_read': self.shelf_counts['to_read'],
+            'average_rating': round_half_even(self.rating_sum / self.rating_count, 2) if self.rating_count else None,
+            'total_pages_read': self.read_pages_sum,
+            'average_pages_per_book': round_half_even(self.pages_sum / self.pages_count, 1) if self.pages_count else None
+        }
+        for shelf in SHELF_KEYS:
+            if _positive(self.shelf_added_per_month[shelf]):
+                stats['shelf_additions_per_month'][shelf] = _sorted_counts(self.shelf_added_per_month[shelf])
+                stats['shelf_additions_per_year'][shelf] = _sorted_counts(self.shelf_added_per_year[shelf])
+        days_to_read = _positive(self.days_to_read)
+        if days_to_read:
+            total_days = sum(days * count for days, count in days_to_read.items())
+            stats['status_change_frequency']['avg_days_to_read'] = round_half_even(
+                total_days / sum(days_to_read.values()), 1
+            )
+            stats['status_change_frequency']['median_days_to_read'] = round_half_even(median(days_to_read), 1)
+        return stats
+
+def _month(day: date) -> str:
+    return f'{day.year:04d}-{day.month:02d}'
+
+def _sorted_counts(counts: Counter) -> Dict:
+    return {key: counts[key] for key in sorted(counts) if counts[key] > 0}
+
+def _positive(counts: Counter) -> Counter:
+    """Drop the keys that removals brought down to zero."""
+    return Counter({key: count for key, count in counts.items() if count > 0})
+
+def _int_keys(counts: Dict[str, int]) -> Counter:
+    return Counter({int(key): count for key, count in counts.items()})
+
+def book_changes(known_books: Dict[str, Book], books: Iterable[Book]) -> List[Tuple[Optional[Book], Optional[Book]]]:
+    """
+    The `(old, new)` pairs that turn the library `known_books` (keyed by
+    book_url) into `books`, for `StatisticsAggregator.apply_changes`. Books
+    carried over from `known_books` as the very same object are skipped
+    without comparing them.
+    """
+    seen = set()
+    changes = list(_changed_books(known_books, books, seen))
+    changes.extend(_removed_books(known_books, seen))
+    return changes
+
+def _changed_books(known_books: Dict[str, Book], books: Iterable[Book], seen: set):
+    """The added and changed `(old, new)` pairs of `books`, adding their URLs to `seen`."""
+    for book in books:
+        seen.add(book.book_url)
+        known = known_books.get(book.book_url)
+        if known is book:
+            continue
+        if known is None:
+            yield None, book
+        elif not same_content(known, book):
+            yield known, book
+
+def _removed_books(known_books: Dict[str, Book], seen: set):
+    return ((known, None) for url, known in known_books.items() if url not in seen)
+
+class StatisticsBuilder:
+    """
+    The statistics of a library fed in with `add_all` a batch at a time, in
+    library order, so it never has to be held whole. `finish` returns the
+    `StatisticsAggregator`.
+
+    With the stored `known_books` and their saved `state`, only the books
+    that differ from `known_books` are applied to that state. Otherwise, or
+    if the state cannot be used, every book is aggregated from scratch. With
+    `verify`, an updated state is checked against a full rebuild and the
+    rebuild is used if they disagree.
+    """
+
+    def __init__(self, known_books: Optional[Dict[str, Book]] = None, state: Optional[Dict] = None,
+                 verify: bool = False):
+        self.known_books = known_books
+        self.aggregator = StatisticsAggregator()
+        self.rebuilt = None
+        self._seen = None
+        if known_books is not None and state:
+            try:
+                aggregator = StatisticsAggregator.from_dict(state)
+                # Surfaces malformed counts before any book is applied to them
+                aggregator.result()
+            except (KeyError, TypeError, ValueError) as e:
+                logger.warning("Could not update the stored statistics, rebuilding them: %s", e)
+            else:
+                self.aggregator = aggregator
+                self._seen = set()
+                self.changed = 0
+                if verify:
+                    self.rebuilt = StatisticsAggregator()
+
+    def add_all(self, books: Iterable[Book]):
+        if self._seen is None:
+            self.aggregator.add_all(books)
+            return
+        if self.rebuilt is not None:
+            books = list(books)
+            self.rebuilt.add_all(books)
+        for change in _changed_books(self.known_books, books, self._seen):
+            self.aggregator.apply_changes([change])
+            self.changed += 1
+
+    def finish(self) -> StatisticsAggregator:
+        if self._seen is None:
+            return self.aggregator
+        for change in _removed_books(self.known_books, self._seen):
+            self.aggregator.apply_changes([change])
+            self.changed += 1
+        logger.info("Updated stored statistics with %s changed books", self.changed)
+        if self.rebuilt is None:
+            return self.aggregator
+        if self.rebuilt.result() != self.aggregator.result():
+            logger.warning("Stored statistics drifted from a full rebuild. Using the rebuild.")
+            return self.rebuilt
+        logger.info("Stored statistics match a full rebuild.")
+        return self.aggregator
+
+def calculate_statistics(books: List[Book]) -> Dict:
+    """One-shot helper: the statistics of a list of books."""
+    aggregator = StatisticsAggregator()
+    aggregator.add_all(books)
+    return aggregator.result()
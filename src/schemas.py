@@ -1,5 +1,10 @@
-from pydantic import BaseModel
-from typing import Optional
+import logging
+from pydantic import BaseModel, TypeAdapter, ValidationError
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Type, TypeVar
+
+logger = logging.getLogger(__name__)
+
+Model = TypeVar('Model', bound=BaseModel)
 
 class Book(BaseModel):
     """
@@ -20,6 +25,10 @@ class Book(BaseModel):
     shelf: Optional[str] = None
     user_id: Optional[str] = None
 
+# The Book fields the user's own actions change. Changing one moves the book
+# up the date_updated sort, unlike the community avg_rating drifting.
+BOOK_USER_FIELDS = frozenset({'shelf', 'rating', 'review', 'date_added', 'date_started', 'date_read'})
+
 class FeedActivity(BaseModel):
     """
     Pydantic schema for a single feed activity item.
@@ -36,6 +45,8 @@ class FeedActivity(BaseModel):
     time_ago: Optional[str] = None
     rating: Optional[int] = None
     book_description: Optional[str] = None
+    # The account whose home feed this is. Only set in batch mode.
+    user_id: Optional[str] = None
 
 class ReadingChallenge(BaseModel):
     """
@@ -48,4 +59,59 @@ class ReadingChallenge(BaseModel):
     percentage: Optional[float] = None
     books_ahead: Optional[float] = None
     books_behind: Optional[float] = None
-    updated_at: Optional[str] = None
\ No newline at end of file
+    updated_at: Optional[str] = None
+
+# Bulk construction and serialization. A list TypeAdapter validates or
+# dumps a whole page of objects in one call into pydantic's core, instead
+# of one Python-level call per object. model_construct is no shortcut in
+# pydantic 2, it is slower than validating.
+
+_list_adapters: Dict[type, TypeAdapter] = {}
+
+def _list_adapter(model: type) -> TypeAdapter:
+    adapter = _list_adapters.get(model)
+    if adapter is None:
+        adapter = _list_adapters[model] = TypeAdapter(List[model])
+    return adapter
+
+def validate_many(model: Type[Model], rows: List[Dict[str, Any]]) -> List[Optional[Model]]:
+    """
+    Validate `rows` into `model` instances at once. Rows that fail validation
+    are logged and come back as None, in place, so the rest of the page is
+    kept and results line up with `rows`.
+    """
+    try:
+        return _list_adapter(model).validate_python(rows)
+    except ValidationError:
+        pass
+
+    # Some row is invalid, fall back to one by one to keep the others
+    results: List[Optional[Model]] = []
+    for row in rows:
+        try:
+            results.append(model.model_validate(row))
+        except ValidationError as e:
+            logger.warning("Skipping %s, failed validation: %s. Data: %s", model.__name__, e, row)
+            results.append(None)
+    return results
+
+def dump_many(instances: Iterable[BaseModel], **kwargs) -> List[Dict[str, Any]]:
+    """
+    `model_dump(**kwargs)` of every instance, in one call. The instances
+    must all be of the same model.
+    """
+    instances = list(instances)
+    if not instances:
+        return []
+    return _list_adapter(type(instances[0])).dump_python(instances, **kwargs)
+
+def same_content(a: BaseModel, b: BaseModel, exclude: FrozenSet[str] = frozenset({'user_id'})) -> bool:
+    """
+    Whether two models hold the same values outside `exclude`. Same as
+    comparing their `model_dump(exclude=exclude)`, for flat models, without
+    building the dicts.
+    """
+    if type(a) is not type(b):
+        return False
+    other = b.__dict__
+    return all(value == other[name] for name, value in a.__dict__.items() if name not in exclude)
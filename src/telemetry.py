@@ -0,0 +1,273 @@
+import contextvars
+import functools
+import json
+import logging
+import os
+import secrets
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, Optional
+
+try:
+    import resource
+except ImportError: # Not available on Windows
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+# Bump when the run report layout changes
+REPORT_VERSION = 1
+
+# What each span counts. Counts roll up into every enclosing span.
+COUNTERS = ('requests', 'bytes', 'pages', 'rows', 'retries')
+
+_current_span: contextvars.ContextVar[Optional['Span']] = contextvars.ContextVar('current_span', default=None)
+_lock = threading.Lock()
+_finished: List['Span'] = []
+
+def peak_rss_kib() -> Optional[int]:
+    """The process's peak resident set size so far, or None where it can't be read."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return peak // 1024 if sys.platform == 'darwin' else peak
+
+class Span:
+    """
+    One timed unit of work, e.g. a scrape phase or a database call.
+
+    Spans nest through a context variable, so work started inside a span,
+    including asyncio tasks and `asyncio.to_thread` calls, counts towards
+    it. Plain thread pools don't carry the context along, count before
+    handing work to them or after it comes back.
+    """
+
+    def __init__(self, name: str, parent: Optional['Span'] = None, attributes: Optional[Dict[str, Any]] = None):
+        self.name = name
+        self.parent = parent
+        self.trace_id = parent.trace_id if parent else secrets.token_hex(16)
+        self.span_id = secrets.token_hex(8)
+        self.attributes = dict(attributes or {})
+        self.counts = dict.fromkeys(COUNTERS, 0)
+        self.started_at = datetime.now(timezone.utc)
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.duration = 0.0
+        self.error: Optional[str] = None
+        self.peak_rss_kib: Optional[int] = None
+        self._started = time.perf_counter()
+        self._sentry_span = None
+
+    def to_dict(self) -> Dict:
+        rows_per_second = self.counts['rows'] / self.duration if self.duration > 0 else None
+        return {
+            'name': self.name,
+            'span_id': self.span_id,
+            'parent_id': self.parent.span_id if self.parent else None,
+            'started_at': self.started_at.isoformat(),
+            'duration_seconds': round(self.duration, 4),
+            'status': 'error' if self.error else 'ok',
+            'error': self.error,
+            **self.counts,
+            'rows_per_second': round(rows_per_second, 1) if rows_per_second is not None else None,
+            'peak_rss_kib': self.peak_rss_kib,
+            'attributes': self.attributes
+        }
+
+@contextmanager
+def span(name: str, **attributes) -> Iterator[Span]:
+    """Time the enclosed block as a child of the current span."""
+    parent = _current_span.get()
+    current = Span(name, parent, attributes)
+    current._sentry_span = _start_sentry_span(current)
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        # sys.exit(0) is a normal way to end a run
+        if not (isinstance(e, SystemExit) and not e.code):
+            current.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        _current_span.reset(token)
+        current.duration = time.perf_counter() - current._started
+        current.end_ns = current.start_ns + int(current.duration * 1e9)
+        current.peak_rss_kib = peak_rss_kib()
+        _finish_sentry_span(current)
+        with _lock:
+            _finished.append(current)
+
+def traced(name: str):
+    """Decorator running each call of a function in a `span` called `name`."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def count(**amounts: int):
+    """Add to the counters of the current span and every span enclosing it."""
+    current = _current_span.get()
+    with _lock:
+        while current is not None:
+            for counter, amount in amounts.items():
+                current.counts[counter] += amount
+            current = current.parent
+
+def set_attribute(key: str, value: Any):
+    current = _current_span.get()
+    if current is not None:
+        current.attributes[key] = value
+
+def finished_spans() -> List[Span]:
+    with _lock:
+        return list(_finished)
+
+def reset():
+    """Forget the finished spans, e.g. between runs in one process."""
+    with _lock:
+        _finished.clear()
+
+# Sentry, only when the run already set it up. Spans are started from their
+# parent explicitly, since concurrent phases share Sentry's scope.
+
+def _start_sentry_span(current: Span):
+    sentry_sdk = sys.modules.get('sentry_sdk')
+    if sentry_sdk is None or not sentry_sdk.get_client().is_active():
+        return None
+    try:
+        if current.parent is None:
+            return sentry_sdk.start_transaction(op='job', name=current.name)
+        if current.parent._sentry_span is not None:
+            return current.parent._sentry_span.start_child(op=current.name.split('.')[0], name=current.name)
+    except Exception as e:
+        logger.debug("Could not start Sentry span %s: %s", current.name, e)
+    return None
+
+def _finish_sentry_span(current: Span):
+    sentry_span = current._sentry_span
+    if sentry_span is None:
+        return
+    try:
+        for counter, amount in current.counts.items():
+            sentry_span.set_data(counter, amount)
+        sentry_span.set_status('internal_error' if current.error else 'ok')
+        sentry_span.finish()
+    except Exception as e:
+        logger.debug("Could not finish Sentry span %s: %s", current.name, e)
+
+def build_report(spans: List[Span], **attributes) -> Dict:
+    """The machine-readable run report: every span, in the order they started."""
+    spans = sorted(spans, key=lambda s: s.start_ns)
+    roots = [s for s in spans if s.parent is None]
+    return {
+        'version': REPORT_VERSION,
+        'trace_id': roots[0].trace_id if roots else None,
+        'started_at': roots[0].started_at.isoformat() if roots else None,
+        'duration_seconds': round(sum(s.duration for s in roots), 4),
+        'status': 'error' if any(s.error for s in roots) else 'ok',
+        'peak_rss_kib': peak_rss_kib(),
+        **attributes,
+        'spans': [s.to_dict() for s in spans]
+    }
+
+def _otlp_value(value: Any) -> Dict:
+    if isinstance(value, bool):
+        return {'boolValue': value}
+    if isinstance(value, int):
+        # OTLP JSON carries 64-bit integers as strings
+        return {'intValue': str(value)}
+    if isinstance(value, float):
+        return {'doubleValue': value}
+    return {'stringValue': str(value)}
+
+def build_otlp(spans: List[Span], service_name: str = 'katalog-scraper', **resource_attributes) -> Dict:
+    """The spans as an OTLP/JSON ExportTraceServiceRequest, for OpenTelemetry collectors."""
+    otlp_spans = []
+    for s in sorted(spans, key=lambda s: s.start_ns):
+        attributes = {**s.counts, **s.attributes}
+        if s.peak_rss_kib is not None:
+            attributes['peak_rss_kib'] = s.peak_rss_kib
+        otlp_span = {
+            'traceId': s.trace_id,
+            'spanId': s.span_id,
+            'name': s.name,
+            'kind': 1, # SPAN_KIND_INTERNAL
+            'startTimeUnixNano': str(s.start_ns),
+            'endTimeUnixNano': str(s.end_ns or s.start_ns),
+            'attributes': [{'key': key, 'value': _otlp_value(value)} for key, value in attributes.items() if value is not None],
+            'status': {'code': 2, 'message': s.error} if s.error else {'code': 1}
+        }
+        if s.parent:
+            otlp_span['parentSpanId'] = s.parent.span_id
+        otlp_spans.append(otlp_span)
+
+    resource_attributes = {'service.name': service_name, **resource_attributes}
+    return {'resourceSpans': [{
+        'resource': {'attributes': [{'key': key, 'value': _otlp_value(value)} for key, value in resource_attributes.items()]},
+        'scopeSpans': [{'scope': {'name': 'katalog.telemetry'}, 'spans': otlp_spans}]
+    }]}
+
+def _log_spans(spans: List[Span]):
+    for s in sorted(spans, key=lambda s: s.start_ns):
+        rows = f", {s.counts['rows']} rows ({s.counts['rows'] / s.duration:.0f}/s)" if s.counts['rows'] and s.duration > 0 else ""
+        logger.info(
+            "%s: %.2fs, %s requests, %.1f KiB, %s pages%s, %s retries, peak RSS %s KiB%s",
+            f"{s.name}[{s.attributes['user_id']}]" if 'user_id' in s.attributes else s.name, s.duration, s.counts['requests'], s.counts['bytes'] / 1024, s.counts['pages'],
+            rows, s.counts['retries'], s.peak_rss_kib, f" [{s.error}]" if s.error else ""
+        )
+
+def _parse_otlp_headers(value: Optional[str]) -> Dict[str, str]:
+    """OTEL_EXPORTER_OTLP_HEADERS style `key=value,key2=value2`."""
+    headers = {}
+    for pair in (value or '').split(','):
+        key, sep, header_value = pair.partition('=')
+        if sep:
+            headers[key.strip()] = header_value.strip()
+    return headers
+
+def emit_report(report_path: Optional[str] = None, otlp_path: Optional[str] = None,
+                otlp_endpoint: Optional[str] = None, otlp_headers: Optional[str] = None, **attributes):
+    """
+    Log a line per span and write the run report to `report_path`. With
+    `otlp_path` the spans are also written as OTLP/JSON, and with
+    `otlp_endpoint` sent to an OTLP/HTTP collector. Failures are logged,
+    never raised, so reporting can't fail a run.
+    """
+    spans = finished_spans()
+    if not spans:
+        return
+    _log_spans(spans)
+
+    outputs = []
+    if report_path:
+        outputs.append((report_path, build_report(spans, **attributes)))
+    if otlp_path or otlp_endpoint:
+        otlp = build_otlp(spans, **attributes)
+        if otlp_path:
+            outputs.append((otlp_path, otlp))
+        if otlp_endpoint:
+            try:
+                import requests
+                response = requests.post(otlp_endpoint, json=otlp, headers=_parse_otlp_headers(otlp_headers), timeout=10)
+                response.raise_for_status()
+                logger.info("Sent %s spans to %s", len(spans), otlp_endpoint)
+            except Exception as e:
+                logger.warning("Could not send spans to %s: %s", otlp_endpoint, e)
+
+    for path, data in outputs:
+        try:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(path, 'w') as f:
+                json.dump(data, f, indent=2, default=str)
+            logger.info("Run report written to %s", path)
+        except Exception as e:
+            logger.warning("Could not write run report to %s: %s", path, e)
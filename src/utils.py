@@ -1,23 +1,25 @@
-import pandas as pd
 import os
 import logging
 import sys
 from datetime import datetime
 import json
-import sentry_sdk
+from typing import Optional
 
-from config import SENTRY_DSN, ENVIRONMENT, IS_DOCKER
+from config import SENTRY_DSN, SENTRY_TRACES_SAMPLE_RATE, ENVIRONMENT, IS_DOCKER
 
-if SENTRY_DSN and ENVIRONMENT == 'production':
-    sentry_sdk.init(
-        dsn=SENTRY_DSN,
-        environment=ENVIRONMENT,
-        enable_logs=True,
-        traces_sample_rate=1.0
-    )
-    print("Sentry initialized for production.")
-else:
-    print("Sentry not initialized (DSN not found or not in production env).")
+def init_sentry():
+    """Initializes Sentry in production. sentry_sdk is only imported when it is used."""
+    if SENTRY_DSN and ENVIRONMENT == 'production':
+        import sentry_sdk
+        sentry_sdk.init(
+            dsn=SENTRY_DSN,
+            environment=ENVIRONMENT,
+            enable_logs=True,
+            traces_sample_rate=SENTRY_TRACES_SAMPLE_RATE
+        )
+        print("Sentry initialized for production.")
+    else:
+        print("Sentry not initialized (DSN not found or not in production env).")
 
 def setup_logging():
     """Configures the root logger based on the environment."""
@@ -55,16 +57,27 @@ def setup_logging():
     
     logger.info(f"Logging configured for {ENVIRONMENT} environment.")
 
-def save_output_files_locally(data):
-    """Saves all scraped data to CSV/JSON files in the local /app/output dir."""
+def get_output_dir() -> str:
+    """Where local output files go, /app/output in Docker."""
+    return '/app/output' if IS_DOCKER else 'output/'
+
+def save_output_files_locally(data, name: Optional[str] = None):
+    """
+    Saves all scraped data to CSV/JSON files in the local /app/output dir.
+    `name`, e.g. the user ID in batch mode, keeps the files of several
+    accounts apart.
+    """
+    # Only needed for local runs, so production never pays for the import
+    import pandas as pd
+
     try:
-        output_dir = 'output/'
-        if IS_DOCKER:
-            output_dir = '/app/output'
+        output_dir = get_output_dir()
         os.makedirs(output_dir, exist_ok=True)
         logging.info(f"Saving output files to {output_dir}...")
 
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        if name:
+            timestamp = f'{name}_{timestamp}'
         
         # Save all data to JSON
         json_filename = os.path.join(output_dir, f'goodreads_data_{timestamp}.json')
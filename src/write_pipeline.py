@@ -0,0 +1,134 @@
+import json
+import logging
+import random
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Postgres error classes that will fail the same way on every retry:
+# 22 data exception, 23 integrity constraint violation, 42 syntax error or missing column
+NON_RETRYABLE_SQLSTATE_CLASSES = ('22', '23', '42')
+
+@dataclass
+class BatchResult:
+    """Outcome of writing one batch."""
+    index: int
+    rows: int
+    bytes: int
+    attempts: int = 0
+    ok: bool = False
+    error: Optional[str] = None
+
+@dataclass
+class WriteResult:
+    """Per-batch outcome of one write to a table."""
+    table: str
+    batches: List[BatchResult] = field(default_factory=list)
+    # Operation-specific counters, e.g. inserted/updated/unchanged for books
+    stats: Dict[str, int] = field(default_factory=dict)
+    error: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None and all(batch.ok for batch in self.batches)
+
+    @property
+    def rows_written(self) -> int:
+        return sum(batch.rows for batch in self.batches if batch.ok)
+
+    @property
+    def failed_batches(self) -> List[BatchResult]:
+        return [batch for batch in self.batches if not batch.ok]
+
+    def summary(self) -> str:
+        if self.error:
+            return f"{self.table}: {self.error}"
+        return (f"{self.table}: {self.rows_written} rows in {len(self.batches)} batches, "
+                f"{len(self.failed_batches)} failed")
+
+def is_retryable(error: Exception) -> bool:
+    """Network errors and server errors are retried, bad requests are not."""
+    code = str(getattr(error, 'code', '') or '')
+    if code[:2] in NON_RETRYABLE_SQLSTATE_CLASSES:
+        return False
+    return 'duplicate key value' not in str(error)
+
+def iter_batches(records: Iterable[Any], max_rows: int, max_bytes: int) -> Iterator[Tuple[List[Any], int]]:
+    """
+    Group records into batches of at most `max_rows` records and roughly
+    `max_bytes` of JSON, yielded with their size. Records are consumed
+    lazily, so only one batch is held here at a time. A record larger than
+    `max_bytes` goes out alone.
+    """
+    batch: List[Any] = []
+    batch_bytes = 0
+    for record in records:
+        record_bytes = len(json.dumps(record, default=str))
+        if batch and (len(batch) >= max_rows or batch_bytes + record_bytes > max_bytes):
+            yield batch, batch_bytes
+            batch, batch_bytes = [], 0
+        if record_bytes > max_bytes:
+            logger.warning("Single record of %s bytes exceeds the %s byte batch limit.", record_bytes, max_bytes)
+        batch.append(record)
+        batch_bytes += record_bytes
+    if batch:
+        yield batch, batch_bytes
+
+def write_batches(
+    table: str,
+    records: Iterable[Any],
+    send: Callable[[List[Any]], Any],
+    max_rows: int = 500,
+    max_bytes: int = 1_000_000,
+    concurrency: int = 4,
+    max_retries: int = 3,
+    base_delay: float = 1.0,
+    retryable: Callable[[Exception], bool] = is_retryable
+) -> WriteResult:
+    """
+    Send `records` to `send` in size-bounded batches, up to `concurrency`
+    at a time. Failed batches are retried with jittered exponential backoff.
+
+    At most `concurrency` batches are in flight and only one more is built
+    ahead of them, so memory use does not grow with the number of records
+    as long as `records` is itself lazy.
+    """
+    result = WriteResult(table=table)
+
+    def run(batch_result: BatchResult, batch: List[Any]) -> BatchResult:
+        while True:
+            batch_result.attempts += 1
+            try:
+                send(batch)
+                batch_result.ok = True
+                batch_result.error = None
+                return batch_result
+            except Exception as e:
+                batch_result.error = str(e)
+                if batch_result.attempts > max_retries or not retryable(e):
+                    logger.error(
+                        "Batch %s of %s rows to %s failed after %s attempts: %s",
+                        batch_result.index, batch_result.rows, table, batch_result.attempts, e
+                    )
+                    return batch_result
+                delay = base_delay * (2 ** (batch_result.attempts - 1)) * random.uniform(0.5, 1.5)
+                logger.warning(
+                    "Batch %s to %s failed (%s), retrying in %.1fs...", batch_result.index, table, e, delay
+                )
+                time.sleep(delay)
+
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+        in_flight = set()
+        for index, (batch, batch_bytes) in enumerate(iter_batches(records, max_rows, max_bytes)):
+            batch_result = BatchResult(index=index, rows=len(batch), bytes=batch_bytes)
+            result.batches.append(batch_result)
+            in_flight.add(executor.submit(run, batch_result, batch))
+            if len(in_flight) >= concurrency:
+                _, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+        wait(in_flight)
+
+    logger.info("Write to %s: %s", table, result.summary())
+    return result
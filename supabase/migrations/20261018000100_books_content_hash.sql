@@ -0,0 +1,4 @@
+-- Hash of each book's content, written by the scraper so unchanged books are not rewritten.
+-- Existing rows start out without one and are rewritten once on the next run.
+alter table if exists books add column if not exists content_hash text;
+alter table if exists books_dev add column if not exists content_hash text;
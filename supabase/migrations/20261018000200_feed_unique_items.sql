@@ -0,0 +1,14 @@
+-- Feed items are inserted with ON CONFLICT DO NOTHING on this key, so items already stored are skipped.
+-- Remove existing duplicates first, keeping one row of each. Rows are told apart by their physical
+-- ctid, so this works whatever other columns the table has.
+delete from feed a using feed b
+  where a.ctid > b.ctid
+    and a.user_url is not distinct from b.user_url and a.action is not distinct from b.action
+    and a.book_url is not distinct from b.book_url and a.timestamp is not distinct from b.timestamp;
+create unique index if not exists feed_item_key on feed (user_url, action, book_url, timestamp) nulls not distinct;
+
+delete from feed_dev a using feed_dev b
+  where a.ctid > b.ctid
+    and a.user_url is not distinct from b.user_url and a.action is not distinct from b.action
+    and a.book_url is not distinct from b.book_url and a.timestamp is not distinct from b.timestamp;
+create unique index if not exists feed_dev_item_key on feed_dev (user_url, action, book_url, timestamp) nulls not distinct;
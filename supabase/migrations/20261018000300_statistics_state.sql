@@ -0,0 +1,7 @@
+-- Reading statistics aggregates, updated from the changed books each run and rebuilt on full sweeps.
+create table if not exists statistics_state (
+  user_id text primary key,
+  state jsonb not null,
+  updated_at timestamptz not null default now()
+);
+create table if not exists statistics_state_dev (like statistics_state including all);
@@ -0,0 +1,8 @@
+-- Dashboard chart aggregates precomputed by the scraper, one versioned row per user.
+create table if not exists dashboard_aggregates (
+  user_id text primary key,
+  version integer not null,
+  data jsonb not null,
+  updated_at timestamptz not null default now()
+);
+create table if not exists dashboard_aggregates_dev (like dashboard_aggregates including all);
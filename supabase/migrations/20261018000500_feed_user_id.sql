@@ -0,0 +1,9 @@
+-- The account whose home feed an item came from, set in batch mode. Two accounts can see the same
+-- item, so the feed's unique key now includes it.
+alter table if exists feed add column if not exists user_id text;
+drop index if exists feed_item_key;
+create unique index if not exists feed_user_item_key on feed (user_id, user_url, action, book_url, timestamp) nulls not distinct;
+
+alter table if exists feed_dev add column if not exists user_id text;
+drop index if exists feed_dev_item_key;
+create unique index if not exists feed_dev_user_item_key on feed_dev (user_id, user_url, action, book_url, timestamp) nulls not distinct;